@@ -10,7 +10,7 @@ import os
 import importlib
 import threading
 from socket import gethostname
-from db import db
+from db import db, get_engine_options, get_catalog_uri, init_sqlite_tuning
 import base64
 import logging
 import subprocess
@@ -37,9 +37,17 @@ app.config["SECRET_KEY"] = os.getenv("FLASK_SECRET_KEY")
 DATABASE_PATH = f"sqlite:///{os.path.join(BASE_DIR, 'Data.db')}"
 app.config["SQLALCHEMY_DATABASE_URI"] = DATABASE_PATH 
 app.config["SQLALCHEMY_TRACK_MODIFICATIONS"] = os.getenv("SQLALCHEMY_TRACK_MODIFICATIONS") == "True"
+app.config["SQLALCHEMY_ENGINE_OPTIONS"] = get_engine_options()
+
+# Catalogue tables live in their own read-only database once utility/splitCatalog.py has
+# been run, so star map and search reads never wait on user/telescope writes to Data.db
+CATALOG_PATH = os.path.join(BASE_DIR, 'Catalog.db')
+CATALOG_SPLIT = os.path.exists(CATALOG_PATH)
+app.config["SQLALCHEMY_BINDS"] = {"catalog": get_catalog_uri(CATALOG_PATH) if CATALOG_SPLIT else DATABASE_PATH}
 app.config["ENCRYPTION_KEY"] = os.getenv("ENCRYPTION_KEY")
 
 db.init_app(app)
+init_sqlite_tuning(app)  # WAL, mmap, cache and busy timeout on every connection
 
 # Email Configuration
 app.config["MAIL_SERVER"] = "smtp.zoho.eu"
@@ -100,7 +108,8 @@ def load_user(user_id):
 
 # Ensure Tables Exist in the Database
 with app.app_context():
-    db.create_all()
+    # The split catalogue is read-only, only create the user/telemetry tables then
+    db.create_all(bind_key=None if CATALOG_SPLIT else "__all__")
     
     # Add night_mode column to user table if it doesn't exist
     from sqlalchemy import text
@@ -121,6 +130,13 @@ with app.app_context():
         print(f"Error updating user table: {e}")
         db.session.rollback()
 
+# Check the cached model schema against the live database once, on the first request
+from models import schemaSnapshot
+
+@app.before_request
+def verify_schema_snapshot():
+    schemaSnapshot.verify_once(db.engine, db.engines["catalog"])
+
 # Homepage Redirection
 @app.route("/")
 def index():
@@ -130,8 +146,16 @@ def index():
 from WebsocketServer import (
     start_websocket_servers,
     send_command_handler,
+    send_batch_handler,
+    send_command_async_handler,
+    command_status_handler,
+    cancel_command_handler,
     liveview_handler,
-    register_client_handler
+    liveview_stats_handler,
+    liveview_snapshot_handler,
+    liveview_clip_handler,
+    register_client_handler,
+    client_metrics_handler
 )
 
 # Flask routes that interface with websocket servers
@@ -139,14 +163,46 @@ from WebsocketServer import (
 def send_command():
     return send_command_handler()
 
+@app.route('/sendBatch', methods=['POST'])
+def send_batch():
+    return send_batch_handler()
+
+@app.route('/sendCommand/async', methods=['POST'])
+def send_command_async():
+    return send_command_async_handler()
+
+@app.route('/command/<job_id>')
+def command_status(job_id):
+    return command_status_handler(job_id)
+
+@app.route('/command/<job_id>/cancel', methods=['POST'])
+def cancel_command(job_id):
+    return cancel_command_handler(job_id)
+
 @app.route('/liveview/<client_id>')
 def liveview(client_id):
     return liveview_handler(client_id)
 
+@app.route('/liveview/<client_id>/stats')
+def liveview_stats(client_id):
+    return liveview_stats_handler(client_id)
+
+@app.route('/liveview/<client_id>/snapshot')
+def liveview_snapshot(client_id):
+    return liveview_snapshot_handler(client_id)
+
+@app.route('/liveview/<client_id>/clip')
+def liveview_clip(client_id):
+    return liveview_clip_handler(client_id)
+
 @app.route('/client/register', methods=['POST'])
 def register_client():
     return register_client_handler()
 
+@app.route('/clients/metrics')
+def client_metrics():
+    return client_metrics_handler()
+
 # Run Flask and WebSocket Server
 if __name__ == '__main__':
 
@@ -3,10 +3,21 @@ import websockets
 import uuid
 import ujson as json  # Faster JSON serialization
 import time
-import tempfile
-import os
 import threading
+import struct
+import signal
+import atexit
+import concurrent.futures
+from urllib.parse import parse_qs, unquote, urlsplit
 from flask import jsonify, request, Response
+from rpcProtocol import JsonCodec, negotiate_codec
+from liveViewHub import get_hub, hubs
+from liveViewSnapshots import snapshot_writer
+from liveViewRecorder import get_recorder, recorders
+from liveViewTranscoder import FULL_TIER, TIER_ORDER, AdaptiveTier, get_transcoder, transcoders, transcoding_available
+from config.liveview import LIVEVIEW_RECORDING, SNAPSHOT_PERSIST
+from config.commands import (DEFAULT_COMMAND_TIMEOUT, COMMAND_TIMEOUTS, COMMAND_JOB_RETENTION, COMMAND_POLL_MAX_WAIT,
+                             CLIENT_PING_INTERVAL, CLIENT_PING_TIMEOUT, CLIENT_SEND_QUEUE_SIZE, REGISTRATION_LEASE)
 
 # WebSocket Configuration - using the same ports as defined in Server.py
 commandPort = 4000
@@ -15,85 +26,377 @@ WS_IP = "0.0.0.0"
 WS_PORT = commandPort
 LIVEVIEW_WS_PORT = LiveViewPort
 
+# Seconds a Flask thread waits for the websocket loop to start or for a coroutine without
+# its own timeout. Commands are bounded by COMMAND_TIMEOUTS (config/commands.py) instead.
+BRIDGE_TIMEOUT = 5
+
+# Seconds shutdown waits for commands in progress before closing every connection
+SHUTDOWN_DRAIN_TIMEOUT = 10
+
+# Optional protocol features. A client that opens with a JSON hello listing the ones it
+# supports gets the common subset back in a welcome message; a client that opens with a
+# plain client_id gets none of them and the server falls back to single calls.
+# "stream" clients may send {"id", "progress"} frames for a call before its reply and are
+# sent {"type": "cancel", "id"} when the server gives up on a call.
+# The hello can also list "codecs" (see rpcProtocol.py); JSON is used unless another is agreed.
+SERVER_CAPABILITIES = {"batch", "stream"}
+
+# Browsers watch a telescope's live view with a websocket to /view/<client_id>[?tier=<name>] on
+# the live view port. Every frame is one binary message: this header, then the JPEG.
+#   version u8, header length u8, reserved u16, seq u32, timestamp f64 (Unix), exposure f64 (s, NaN if unknown)
+# all little-endian, so in JavaScript: new DataView(buffer).getUint32(4, true), getFloat64(8, true), ...
+# and the image is buffer.slice(headerLength). Telescopes connect to any other path.
+VIEWER_PROTOCOL_VERSION = 1
+VIEWER_FRAME_HEADER = struct.Struct("<BBHIdd")
+VIEWER_PATH_PREFIX = "/view/"
+
 # Global variables
-pending = {}
-latest_frames = {}
+command_jobs = {}  # job id -> CommandJob, commands started with /sendCommand/async
 last_frame_log_time = {}
-clients = []
+
+class PendingCall:
+    """A call waiting for its reply, with any progress the client has reported so far"""
+    def __init__(self, message, on_progress=None):
+        self.id = message["id"]
+        self.function = message["function"]
+        self.timeout = COMMAND_TIMEOUTS.get(self.function, DEFAULT_COMMAND_TIMEOUT)
+        self.loop = asyncio.get_running_loop()
+        self.future = self.loop.create_future()
+        self.last_activity = self.loop.time()
+        self.on_progress = on_progress
+
+    def add_progress(self, progress):
+        self.last_activity = self.loop.time()
+        if self.on_progress:
+            self.on_progress(progress)
+
+    async def wait(self):
+        """The reply, waiting up to the command's timeout since the last reply or progress frame"""
+        while True:
+            remaining = self.last_activity + self.timeout - self.loop.time()
+            if remaining <= 0:
+                raise asyncio.TimeoutError()
+            try:
+                return await asyncio.wait_for(asyncio.shield(self.future), remaining)
+            except asyncio.TimeoutError:
+                continue  # Progress may have arrived meanwhile and moved the deadline
+
+def _discard(waits):
+    """Cancel unfinished wait tasks and mark failed ones as seen, once their results no longer matter"""
+    for wait in waits:
+        if not wait.done():
+            wait.cancel()
+        elif not wait.cancelled():
+            wait.exception()
 
 class Client:
-    def __init__(self, client_id, ws):
+    """
+    One connected telescope. Created on the websocket loop: its calls wait in its own pending table,
+    and everything sent to it goes through a bounded queue drained by a single writer task, so a
+    slow telescope only holds up callers of that telescope.
+    """
+    def __init__(self, client_id, ws, capabilities=None, codec=JsonCodec):
         self.client_id = client_id
         self.ws = ws
+        self.capabilities = capabilities or set()
+        self.codec = codec
+        self.pending = {}  # call id -> PendingCall
+        self.outbox = asyncio.Queue(CLIENT_SEND_QUEUE_SIZE)
+        self.closed = False
+        self.connected_at = time.time()
+        self.last_seen = self.connected_at
+        self.messages_sent = 0
+        self.messages_received = 0
+        self.bytes_sent = 0
+        self.bytes_received = 0
+        self.calls_failed_on_disconnect = 0
+        self.writer = asyncio.ensure_future(self._write())
+
+    async def send(self, message):
+        """Queue a message for the writer; fails at once rather than waiting on a full queue"""
+        if self.closed:
+            raise ConnectionError(f"Client '{self.client_id}' disconnected")
+        try:
+            self.outbox.put_nowait(self.codec.encode(message))
+        except asyncio.QueueFull:
+            raise ConnectionError(f"Client '{self.client_id}' is not keeping up, its send queue is full")
+
+    async def _write(self):
+        try:
+            while True:
+                frame = await self.outbox.get()
+                await self.ws.send(frame)
+                self.messages_sent += 1
+                self.bytes_sent += len(frame)
+        except websockets.exceptions.ConnectionClosed:
+            pass  # handle_client sees the close too and removes the client
+        except asyncio.CancelledError:
+            raise
+        except Exception as e:
+            # Nothing more can be sent, so drop the connection and let handle_client fail its calls
+            print(f"[{self.client_id}] Writer failed, closing the connection: {e!r}")
+            await self.ws.close(1011)
+
+    def received(self, message):
+        self.last_seen = time.time()
+        self.messages_received += 1
+        self.bytes_received += len(message)
+
+    def resolve_reply(self, data):
+        """Resolve the pending call(s) a reply answers, returns False if nothing was waiting for it"""
+        if "results" in data:
+            # Batch reply: one entry per call, each carrying its own call id
+            resolved = [self.resolve_reply(result) for result in data["results"]]
+            return any(resolved)
+        if "progress" in data:
+            call = self.pending.get(data.get("id"))
+            if call is None:
+                return False
+            call.add_progress(data["progress"])
+            return True
+        call = self.pending.pop(data.get("id"), None)
+        if call is None:
+            return False
+        if not call.future.done():
+            call.future.set_result(data)
+        return True
 
-    async def execute(self, function_name, args=None, kwargs=None):
-        message_id = str(uuid.uuid4())
-        message = json.dumps({
+    def close(self, reason):
+        """Stop sending and fail every call still waiting, so callers hear now rather than at their timeout"""
+        self.closed = True
+        self.writer.cancel()
+        while not self.outbox.empty():
+            self.outbox.get_nowait()  # Never sent, their calls fail below
+        failed = 0
+        for call in self.pending.values():
+            if not call.future.done():
+                call.future.set_exception(ConnectionError(f"Client '{self.client_id}' {reason}"))
+                failed += 1
+        self.pending.clear()
+        self.calls_failed_on_disconnect += failed
+        return failed
+
+    def metrics(self):
+        return {
+            "clientId": self.client_id,
+            "connectedAt": self.connected_at,
+            "lastSeen": self.last_seen,
+            "latency": getattr(self.ws, "latency", None),  # Round trip of the last ping
+            "codec": self.codec.name,
+            "capabilities": sorted(self.capabilities),
+            "pendingCalls": len(self.pending),
+            "queued": self.outbox.qsize(),
+            "messagesSent": self.messages_sent,
+            "messagesReceived": self.messages_received,
+            "bytesSent": self.bytes_sent,
+            "bytesReceived": self.bytes_received,
+            "callsFailedOnDisconnect": self.calls_failed_on_disconnect,
+        }
+
+    def _call(self, function_name, args=None, kwargs=None, on_progress=None):
+        """A call message, registered so its reply can be matched by id, in any order"""
+        message = {
             "type": "call",
             "function": function_name,
             "args": args or [],
             "kwargs": kwargs or {},
-            "id": message_id
-        })
+            "id": self.codec.new_id()
+        }
+        self.pending[message["id"]] = PendingCall(message, on_progress)
+        return message
 
-        future = asyncio.get_event_loop().create_future()
-        pending[message_id] = future
-        await self.ws.send(message)
+    async def cancel(self, message_id):
+        """Stop waiting for a call and, if the client supports it, tell it to abort"""
+        if self.pending.pop(message_id, None) is None or "stream" not in self.capabilities:
+            return
+        try:
+            await self.send({"type": "cancel", "id": message_id})
+        except ConnectionError:
+            pass
 
+    async def _wait(self, message_ids):
+        waits = [asyncio.ensure_future(self.pending[message_id].wait()) for message_id in message_ids]
         try:
-            response = await asyncio.wait_for(future, timeout=3)
-        except asyncio.TimeoutError:
-            pending.pop(message_id, None)
+            return await asyncio.gather(*waits)
+        except ConnectionError:
+            _discard(waits)  # The client went away, every call has already failed
+            raise
+        except (asyncio.TimeoutError, asyncio.CancelledError) as e:
+            # A call went quiet for too long, or the caller gave up (bridge timeout or a
+            # cancelled job): stop waiting for the rest and pass it on to the device
+            _discard(waits)
+            for message_id in message_ids:
+                await self.cancel(message_id)
+            if isinstance(e, asyncio.CancelledError):
+                raise
             raise Exception("Timeout waiting for client response")
 
+    async def _send_calls(self, message, message_ids):
+        """Send a message carrying calls; if it cannot be queued the calls are no longer pending"""
+        try:
+            await self.send(message)
+        except ConnectionError:
+            for message_id in message_ids:
+                self.pending.pop(message_id, None)
+            raise
+
+    async def execute(self, function_name, args=None, kwargs=None, on_progress=None):
+        call = self._call(function_name, args, kwargs, on_progress)
+        await self._send_calls(call, [call["id"]])
+        response, = await self._wait([call["id"]])
+
         return response.get("result") if "result" in response else Exception(response.get("error"))
 
+    async def execute_batch(self, calls):
+        """
+        Run several calls in one round trip. calls is a list of {"function", "args", "kwargs"};
+        returns one {"status", "result"/"error"} per call, in the same order.
+        """
+        messages = [self._call(call["function"], call.get("args"), call.get("kwargs")) for call in calls]
+        message_ids = [message["id"] for message in messages]
+        if "batch" in self.capabilities:
+            await self._send_calls({"type": "batch", "id": self.codec.new_id(), "calls": messages}, message_ids)
+        else:
+            # Older clients: pipeline the calls without waiting between them
+            for message in messages:
+                await self._send_calls(message, message_ids)
+        responses = await self._wait(message_ids)
+
+        return [
+            {"status": "success", "result": response["result"]} if "result" in response
+            else {"status": "error", "error": response.get("error")}
+            for response in responses
+        ]
+
 class ClientManager:
+    """
+    Connected telescopes by client_id, plus the ids handed out by /client/register. An id is
+    leased: it is renewed whenever its telescope connects or disconnects, and forgotten once it
+    has been unused for REGISTRATION_LEASE seconds.
+    """
     def __init__(self):
         self.clients = {}
+        self.leases = {}  # client_id -> expiry time
+        self.connections = 0
+        self.disconnections = 0
+        self.replaced = 0
+        self.calls_failed_on_disconnect = 0
 
-    def add_client(self, client_id, ws):
-        self.clients[client_id] = Client(client_id, ws)
+    def add_client(self, client_id, ws, capabilities=None, codec=JsonCodec):
+        previous = self.clients.get(client_id)
+        if previous is not None:
+            # The telescope reconnected before its old connection timed out
+            self.calls_failed_on_disconnect += previous.close("reconnected")
+            asyncio.ensure_future(previous.ws.close())
+            self.replaced += 1
+        client = self.clients[client_id] = Client(client_id, ws, capabilities, codec)
+        self.connections += 1
+        self.renew_lease(client_id)
+        return client
 
-    def remove_client(self, client_id):
-        self.clients.pop(client_id, None)
+    def remove_client(self, client):
+        if self.clients.get(client.client_id) is client:
+            del self.clients[client.client_id]
+        self.calls_failed_on_disconnect += client.close("disconnected")
+        self.disconnections += 1
+        self.renew_lease(client.client_id)
 
-    async def command(self, client_id, function_name, args=None):
+    def register(self):
+        """A new client_id for a telescope, reserved for REGISTRATION_LEASE seconds"""
+        self.expire_leases()
+        client_id = str(uuid.uuid4())
+        self.leases[client_id] = time.time() + REGISTRATION_LEASE
+        return client_id
+
+    def renew_lease(self, client_id):
+        if client_id in self.leases:
+            self.leases[client_id] = time.time() + REGISTRATION_LEASE
+
+    def expire_leases(self):
+        now = time.time()
+        for client_id, expires in list(self.leases.items()):
+            if expires < now and client_id not in self.clients:
+                self.leases.pop(client_id, None)
+
+    def metrics(self):
+        clients = list(self.clients.values())
+        return {
+            "connected": len(clients),
+            "connections": self.connections,
+            "disconnections": self.disconnections,
+            "replaced": self.replaced,
+            "registrations": len(self.leases),
+            "pendingCalls": sum(len(client.pending) for client in clients),
+            "callsFailedOnDisconnect": self.calls_failed_on_disconnect,
+            "clients": [client.metrics() for client in clients],
+        }
+
+    async def command(self, client_id, function_name, args=None, on_progress=None):
         if client_id not in self.clients:
             raise Exception(f"Client '{client_id}' not found")
-        return await self.clients[client_id].execute(function_name, args)
+        return await self.clients[client_id].execute(function_name, args, on_progress=on_progress)
+
+    async def command_batch(self, client_id, calls):
+        if client_id not in self.clients:
+            raise Exception(f"Client '{client_id}' not found")
+        return await self.clients[client_id].execute_batch(calls)
 
 # Global client manager instance
 client_manager = ClientManager()
 
+def parse_hello(message):
+    """(client_id, capabilities, codec) from the first message: a JSON hello or just the client_id"""
+    try:
+        hello = json.loads(message)
+    except ValueError:
+        hello = None
+    if isinstance(hello, dict) and hello.get("type") == "hello" and hello.get("client_id"):
+        capabilities = SERVER_CAPABILITIES.intersection(hello.get("capabilities") or [])
+        return str(hello["client_id"]), capabilities, negotiate_codec(hello.get("codecs"))
+    return message, None, JsonCodec
+
 async def handle_client(ws):
-    client_id = await ws.recv()
-    client_manager.add_client(client_id, ws)
-    print(f"[+] {client_id} connected.")
+    client_id, capabilities, codec = parse_hello(await ws.recv())
+    if capabilities is not None:
+        # The welcome is always JSON, the agreed codec applies from the next message on
+        await ws.send(json.dumps({"type": "welcome", "capabilities": sorted(capabilities), "codec": codec.name}))
+    client = client_manager.add_client(client_id, ws, capabilities, codec)
+    print(f"[+] {client_id} connected." + (f" Capabilities: {sorted(capabilities)}, codec: {codec.name}" if capabilities is not None else ""))
 
     try:
         async for message in ws:
-            data = json.loads(message)
-            msg_id = data.get("id")
-            if msg_id in pending:
-                future = pending.pop(msg_id)
-                future.set_result(data)
-            else:
-                print(f"[{client_id}] -> {data}")
+            client.received(message)
+            # One malformed frame is logged and skipped, it does not end the connection
+            try:
+                data = codec.decode(message)
+                if not client.resolve_reply(data):
+                    print(f"[{client_id}] -> {data}")
+            except Exception as e:
+                print(f"[{client_id}] Ignoring malformed {codec.name} message: {e!r}")
     except websockets.exceptions.ConnectionClosed:
         print(f"[-] {client_id} disconnected")
     finally:
-        client_manager.remove_client(client_id)
+        # Calls still waiting on this telescope fail now instead of at their timeout
+        client_manager.remove_client(client)
 
-# WebSocket handler for live view frames from client
+# WebSocket handler for live view frames from client. Binary messages are frames, text messages
+# are JSON metadata for the frames that follow, e.g. {"exposure": 0.033}
 async def handle_liveview_client(ws):
+    client_id = None
     try:
         client_id = await ws.recv()
+        hub = get_hub(client_id)
+        hub.connected = True
+        if LIVEVIEW_RECORDING:
+            get_recorder(client_id)  # Records every frame the hub publishes from now on
         print(f"[LiveView] {client_id} connected for live view.")
         while True:
             try:
                 message = await ws.recv()
-                latest_frames[client_id] = message
+                if isinstance(message, str):
+                    hub.exposure = json.loads(message).get("exposure", hub.exposure)
+                    continue
+                hub.publish(message)  # Once, however many viewers are watching
                 now = time.time()
                 # Only log every 2 seconds per client
                 if (client_id not in last_frame_log_time) or (now - last_frame_log_time[client_id] > 2):
@@ -107,63 +410,327 @@ async def handle_liveview_client(ws):
     except Exception as e:
         print(f"[LiveView] Error in connection: {e}")
     finally:
-        latest_frames.pop(client_id, None)
+        if client_id is not None:
+            get_hub(client_id).disconnected()
         last_frame_log_time.pop(client_id, None)
 
-def save_latest_frame(client_id):
-    frame = latest_frames.get(client_id)
-    if frame:
+def pack_viewer_frame(frame):
+    exposure = float("nan") if frame.exposure is None else frame.exposure
+    header = VIEWER_FRAME_HEADER.pack(VIEWER_PROTOCOL_VERSION, VIEWER_FRAME_HEADER.size, 0,
+                                      frame.seq & 0xFFFFFFFF, frame.timestamp, exposure)
+    return header + frame.data
+
+# WebSocket handler for browsers watching a telescope, on the same loop that receives its frames
+async def handle_liveview_viewer(ws, client_id, tier=FULL_TIER):
+    # Hubs are only created by telescopes connecting, never for whatever id a browser asks for
+    if client_id not in hubs:
+        await ws.close(4404, "Unknown live view")
+        return
+    if transcoding_available() and tier in TIER_ORDER:
+        hub = get_transcoder(client_id).hub(tier)
+    else:
+        hub = hubs[client_id]
+    viewer = hub.subscribe(asynchronous=True)
+    print(f"[LiveView] Browser viewer connected to {client_id} ({tier}).")
+
+    async def close_with_browser():
+        # Browsers send nothing; this ends when they disconnect, even while no frames arrive
+        try:
+            async for _ in ws:
+                pass
+        finally:
+            hub.unsubscribe(viewer)
+
+    watcher = asyncio.ensure_future(close_with_browser())
+    try:
+        while True:
+            frame = await viewer.get_async()
+            if frame is None:
+                break
+            await ws.send(pack_viewer_frame(frame))  # Waits while this browser is slow, its queue drops frames
+    except websockets.exceptions.ConnectionClosed:
+        pass
+    finally:
+        watcher.cancel()
+        hub.unsubscribe(viewer)
+        print(f"[LiveView] Browser viewer disconnected from {client_id}.")
+
+async def route_liveview(ws):
+    """Browsers on /view/<client_id> watch, everything else is a telescope sending frames"""
+    # websockets 14+ has the handshake request, older versions only the path
+    handshake = getattr(ws, "request", None)
+    url = urlsplit(handshake.path if handshake is not None else getattr(ws, "path", ""))
+    if url.path.startswith(VIEWER_PATH_PREFIX):
+        client_id = unquote(url.path[len(VIEWER_PATH_PREFIX):])
+        tier = parse_qs(url.query).get("tier", [FULL_TIER])[0]
+        await handle_liveview_viewer(ws, client_id, tier)
+    else:
+        await handle_liveview_client(ws)
+
+# Thread-safe bridge from Flask (or any other) threads to the websocket loop. Client websockets
+# and pending futures belong to it (see WebsocketRuntime), so coroutines must run there.
+def wait_until_accepting():
+    """Wait at most BRIDGE_TIMEOUT for the websocket loop to take work, whatever the caller's own timeout"""
+    if not runtime.ready.wait(BRIDGE_TIMEOUT) or not runtime.accepting:
+        raise Exception("WebSocket server is shutting down" if runtime.ready.is_set() else "WebSocket server is not running")
+
+def run_on_ws_loop(coro, timeout=BRIDGE_TIMEOUT):
+    """Run a coroutine on the websocket event loop and wait up to timeout seconds (None for no limit) for its result"""
+    try:
+        wait_until_accepting()
+    except Exception:
+        coro.close()
+        raise
+    future = asyncio.run_coroutine_threadsafe(coro, runtime.loop)
+    try:
+        return future.result(timeout)
+    except concurrent.futures.TimeoutError:
+        future.cancel()
+        raise Exception("Timeout waiting for client response")
+
+def submit_command(client_id, function_name, args=None, timeout=None):
+    """
+    Send a command to a connected client from any thread, any number can be in flight at once.
+    Waits as long as the command's own timeout allows unless a timeout is given.
+    """
+    return run_on_ws_loop(client_manager.command(client_id, function_name, args), timeout)
+
+def submit_batch(client_id, calls, timeout=None):
+    """Send several commands to a connected client in one round trip from any thread"""
+    return run_on_ws_loop(client_manager.command_batch(client_id, calls), timeout)
+
+class CommandJob:
+    """
+    A command running in the background for /sendCommand/async. The websocket loop
+    records progress and the outcome; Flask threads poll or wait on the condition.
+    """
+    def __init__(self, client_id, function_name, args):
+        self.id = str(uuid.uuid4())
+        self.client_id = client_id
+        self.function = function_name
+        self.args = args
+        self.state = "running"  # running, success, error or cancelled
+        self.result = None
+        self.error = None
+        self.progress = []
+        self.started = time.time()
+        self.finished = None
+        self.task = None
+        self.condition = threading.Condition()
+
+    def add_progress(self, progress):
+        with self.condition:
+            self.progress.append(progress)
+            self.condition.notify_all()
+
+    def finish(self, state, result=None, error=None):
+        with self.condition:
+            self.state, self.result, self.error = state, result, error
+            self.finished = time.time()
+            self.condition.notify_all()
+
+    def wait(self, seen_progress, timeout):
+        """Wait until there is progress past seen_progress or the command has finished"""
+        with self.condition:
+            self.condition.wait_for(lambda: self.state != "running" or len(self.progress) > seen_progress, timeout)
+
+    def snapshot(self, seen_progress=0):
+        with self.condition:
+            return {
+                "jobId": self.id,
+                "clientId": self.client_id,
+                "command": self.function,
+                "state": self.state,
+                "result": self.result,
+                "error": self.error,
+                "progress": self.progress[seen_progress:],
+                "progressCount": len(self.progress),
+                "started": self.started,
+                "finished": self.finished
+            }
+
+    async def run(self):
         try:
-            tmp_dir = tempfile.gettempdir()
-            file_path = os.path.join(tmp_dir, f"{client_id}_latest.jpg")
-            with open(file_path, "wb") as f:
-                f.write(frame)
-            print(f"[DEBUG] Saved {file_path}")
+            result = await client_manager.command(self.client_id, self.function, self.args, on_progress=self.add_progress)
+            if isinstance(result, Exception):
+                self.finish("error", error=str(result))
+            else:
+                self.finish("success", result=result)
+        except asyncio.CancelledError:
+            self.finish("cancelled", error="Cancelled")
         except Exception as e:
-            print(f"[DEBUG] Failed to save frame for {client_id}: {e}")
+            self.finish("error", error=str(e))
+
+def start_command_job(client_id, function_name, args=None):
+    """Start a command on the websocket loop without waiting for it, returns its CommandJob"""
+    wait_until_accepting()
+    now = time.time()
+    for job_id, job in list(command_jobs.items()):
+        if job.finished and now - job.finished > COMMAND_JOB_RETENTION:
+            command_jobs.pop(job_id, None)
+
+    job = CommandJob(client_id, function_name, args or [])
+    command_jobs[job.id] = job
+
+    def create_task():
+        job.task = runtime.loop.create_task(job.run())
+
+    runtime.loop.call_soon_threadsafe(create_task)
+    return job
 
-# Start WebSocket Server in Background
-def start_ws_server():
-    loop = asyncio.new_event_loop()
-    asyncio.set_event_loop(loop)
-    async def run_server():
+def cancel_command_job(job_id):
+    job = command_jobs.get(job_id)
+    if job is None:
+        return False
+    if job.state == "running":
+        runtime.loop.call_soon_threadsafe(lambda: job.task and job.task.cancel())
+    return True
+
+class WebsocketRuntime:
+    """
+    Both websocket servers, telescope commands and live view, on one event loop. The client
+    manager, command jobs and live view hubs all live on it, so a command to a telescope and
+    the frames it sends back can be handled together without crossing threads.
+
+    start() serves on a daemon thread next to Flask and drains when the process exits; run()
+    serves in the foreground until SIGINT/SIGTERM (python WebsocketServer.py). Hooks added
+    with on_startup/on_shutdown run on the loop and may be plain functions or coroutines.
+    """
+    def __init__(self):
+        self.loop = None
+        self.ready = threading.Event()
+        self.accepting = False
+        self.servers = []
+        self.startup_hooks = []
+        self.shutdown_hooks = []
+        self.thread = None
+        self._stop = None
+
+    def on_startup(self, hook):
+        self.startup_hooks.append(hook)
+        return hook
+
+    def on_shutdown(self, hook):
+        self.shutdown_hooks.append(hook)
+        return hook
+
+    async def _run_hooks(self, hooks):
+        for hook in hooks:
+            try:
+                result = hook()
+                if asyncio.iscoroutine(result):
+                    await result
+            except Exception as e:
+                print(f"[Runtime] {getattr(hook, '__name__', hook)} failed: {e}")
+
+    async def serve(self, handle_signals=False):
+        self.loop = asyncio.get_running_loop()
+        self._stop = asyncio.Event()
+        if handle_signals:
+            for sig in (signal.SIGINT, signal.SIGTERM):
+                try:
+                    self.loop.add_signal_handler(sig, self._stop.set)
+                except (NotImplementedError, RuntimeError):
+                    pass  # Windows: Ctrl+C cancels serve() instead, which still drains
+        # Each server is kept as soon as it listens, so a failure to bind the next one closes it again
+        self.servers = []
         try:
-            async with websockets.serve(handle_client, WS_IP, WS_PORT):
-                print(f"WebSocket server running at ws://{WS_IP}:{WS_PORT}")
-                await asyncio.Future()
+            # websockets pings every telescope and closes connections that stop answering
+            self.servers.append(await websockets.serve(handle_client, WS_IP, WS_PORT,
+                                                       ping_interval=CLIENT_PING_INTERVAL,
+                                                       ping_timeout=CLIENT_PING_TIMEOUT))
+            self.servers.append(await websockets.serve(route_liveview, WS_IP, LIVEVIEW_WS_PORT,
+                                                       max_size=2*1024*1024))
         except Exception as e:
-            print(f"[CommandWS] WebSocket server failed to start: {e}")
-    try:
-        loop.run_until_complete(run_server())
-        loop.run_forever()
-    except Exception as e:
-        print(f"[CommandWS] Event loop error: {e}")
+            print(f"[Runtime] WebSocket servers failed to start: {e}")
+            for server in self.servers:
+                server.close()
+                await server.wait_closed()
+            self.servers = []
+            return
+        print(f"WebSocket server running at ws://{WS_IP}:{WS_PORT}")
+        print(f"LiveView WebSocket server running at ws://{WS_IP}:{LIVEVIEW_WS_PORT}")
+
+        await self._run_hooks(self.startup_hooks)
+        self.accepting = True
+        self.ready.set()
+        try:
+            await self._stop.wait()
+        finally:
+            await self.drain()
 
-# Start a separate WebSocket server for live view frames
-def start_liveview_ws_server():
-    loop = asyncio.new_event_loop()
-    asyncio.set_event_loop(loop)
-    async def run_server():
+    def _in_progress(self):
+        calls = sum(len(client.pending) for client in list(client_manager.clients.values()))
+        return calls + sum(1 for job in list(command_jobs.values()) if job.state == "running")
+
+    async def drain(self, timeout=SHUTDOWN_DRAIN_TIMEOUT):
+        """Refuse new work, give calls in progress up to timeout seconds to finish, then close every connection"""
+        self.accepting = False
+        deadline = self.loop.time() + timeout
+        while self._in_progress() and self.loop.time() < deadline:
+            await asyncio.sleep(0.1)
+        if self._in_progress():
+            print(f"[Runtime] Shutting down with {self._in_progress()} calls still in progress")
+        for job in list(command_jobs.values()):
+            if job.task and not job.task.done():
+                job.task.cancel()
+
+        await self._run_hooks(self.shutdown_hooks)
+        for server in self.servers:
+            server.close()  # Closes every connection with 1001 Going Away
+        for server in self.servers:
+            await server.wait_closed()
+        self.ready.clear()
+        print("[Runtime] WebSocket servers stopped")
+
+    def _run_thread(self):
         try:
-            async with websockets.serve(handle_liveview_client, WS_IP, LIVEVIEW_WS_PORT, max_size=2*1024*1024):
-                print(f"LiveView WebSocket server running at ws://{WS_IP}:{LIVEVIEW_WS_PORT}")
-                await asyncio.Future()
+            asyncio.run(self.serve())
         except Exception as e:
-            print(f"[LiveView] WebSocket server failed to start: {e}")
-    try:
-        loop.run_until_complete(run_server())
-        loop.run_forever()
-    except Exception as e:
-        print(f"[LiveView] Event loop error: {e}")
+            print(f"[Runtime] Event loop error: {e}")
+
+    def start(self):
+        """Serve on a daemon thread; the servers are drained when the process exits"""
+        self.thread = threading.Thread(target=self._run_thread, name="websockets", daemon=True)
+        self.thread.start()
+        atexit.register(self.stop)
+
+    def stop(self, timeout=SHUTDOWN_DRAIN_TIMEOUT + 5):
+        """Drain and stop from any other thread, waiting until the servers have closed"""
+        if self.loop is None or self._stop is None or self.loop.is_closed():
+            return
+        try:
+            self.loop.call_soon_threadsafe(self._stop.set)
+        except RuntimeError:
+            return  # The loop has already finished
+        if self.thread is not None and self.thread is not threading.current_thread():
+            self.thread.join(timeout)
+
+    def run(self):
+        """Serve in the foreground until SIGINT/SIGTERM, then drain"""
+        try:
+            asyncio.run(self.serve(handle_signals=True))
+        except KeyboardInterrupt:
+            pass
+
+# The one runtime both servers run on
+runtime = WebsocketRuntime()
+
+@runtime.on_startup
+def start_snapshot_writer():
+    if SNAPSHOT_PERSIST:
+        snapshot_writer.start()
+
+@runtime.on_shutdown
+def stop_snapshot_writer():
+    snapshot_writer.stop()
 
 def start_websocket_servers():
-    """Start both websocket servers in daemon threads"""
+    """Start both websocket servers on one event loop in a daemon thread"""
     from socket import gethostname
-    
-    threading.Thread(target=start_ws_server, daemon=True).start()
-    print(f"Starting websocket command server on {gethostname()} at port: {commandPort}")
 
-    threading.Thread(target=start_liveview_ws_server, daemon=True).start()
+    runtime.start()
+    print(f"Starting websocket command server on {gethostname()} at port: {commandPort}")
     print(f"Starting liveView server on {gethostname()} at port: {LiveViewPort}")
 
 # Flask route functions that interface with the websocket servers
@@ -175,45 +742,200 @@ def send_command_handler():
     args = data.get('args', [])
 
     try:
-        result = asyncio.run(client_manager.command(client_id, command, args))
+        result = submit_command(client_id, command, args)
         return jsonify({"status": "success", "result": result})
     except Exception as e:
         return jsonify({"status": "error", "error": str(e)}), 500
 
+def send_batch_handler():
+    """Handler for /sendBatch route: {"client_id", "calls": [{"command", "args"}, ...]}"""
+    data = request.get_json()
+    client_id = data.get('client_id')
+    calls = data.get('calls')
+
+    if not isinstance(calls, list) or not calls:
+        return jsonify({"status": "error", "error": "calls must be a non-empty list"}), 400
+
+    try:
+        results = submit_batch(client_id, [
+            {"function": call.get('command'), "args": call.get('args', []), "kwargs": call.get('kwargs', {})}
+            for call in calls
+        ])
+        return jsonify({"status": "success", "results": results})
+    except Exception as e:
+        return jsonify({"status": "error", "error": str(e)}), 500
+
+def send_command_async_handler():
+    """Handler for /sendCommand/async route: start a command and return a job id to poll"""
+    data = request.get_json()
+    client_id = data.get('client_id')
+    command = data.get('command')
+    args = data.get('args', [])
+
+    if client_id not in client_manager.clients:
+        return jsonify({"status": "error", "error": f"Client '{client_id}' not found"}), 404
+
+    try:
+        job = start_command_job(client_id, command, args)
+        return jsonify({"status": "success", "jobId": job.id}), 202
+    except Exception as e:
+        return jsonify({"status": "error", "error": str(e)}), 500
+
+def command_status_handler(job_id):
+    """
+    Handler for /command/<job_id> route. ?since=<progressCount> returns only newer progress and
+    ?wait=<seconds> holds the request until there is some (or the command finishes).
+    """
+    job = command_jobs.get(job_id)
+    if job is None:
+        return jsonify({"status": "error", "error": "Unknown job"}), 404
+
+    since = request.args.get('since', 0, type=int)
+    wait = min(request.args.get('wait', 0, type=float), COMMAND_POLL_MAX_WAIT)
+    if wait > 0:
+        job.wait(since, wait)
+    return jsonify({"status": "success", "job": job.snapshot(since)})
+
+def cancel_command_handler(job_id):
+    """Handler for /command/<job_id>/cancel route"""
+    if not cancel_command_job(job_id):
+        return jsonify({"status": "error", "error": "Unknown job"}), 404
+    return jsonify({"status": "success", "job": command_jobs[job_id].snapshot()})
+
 def liveview_handler(client_id):
-    """Handler for /liveview/<client_id> route"""
+    """
+    Handler for /liveview/<client_id> route. ?tier=<name> picks a reduced quality tier from
+    config/liveview.py and ?tier=auto adjusts it to how fast the viewer takes frames; without
+    transcoding (no OpenCV) every viewer gets full frames.
+    """
+    # Hubs are only created by telescopes connecting, never for whatever id a viewer asks for
+    source = hubs.get(client_id)
+    if source is None:
+        return unknown_liveview(client_id)
+    # ?after=<seq> lets a reconnecting viewer skip the frame it already has. Sequence numbers
+    # start again from 1 when the server restarts, so a seq from before then is ignored.
+    after_seq = request.args.get('after', 0, type=int)
+    if after_seq > source.seq:
+        after_seq = 0
+    tier = request.args.get('tier', FULL_TIER)
+    adaptive = None
+    if not transcoding_available() or (tier != 'auto' and tier not in TIER_ORDER):
+        tier = FULL_TIER
+    elif tier == 'auto':
+        adaptive = AdaptiveTier()
+        tier = adaptive.tier
+    transcoder = get_transcoder(client_id) if transcoding_available() else None
+
     def generate():
-        last_save = 0
-        while True:
-            try:
-                frame = latest_frames.get(client_id)
-                if frame:
-                    yield (b'--frame\r\nContent-Type: image/jpeg\r\n\r\n' + frame + b'\r\n')
-                    now = time.time()
-                    if now - last_save > 5:
-                        save_latest_frame(client_id)
-                        last_save = now
-                time.sleep(1/10)
-            except Exception as e:
-                print(f"[MJPEG] Error streaming frame for {client_id}: {e}")
-                break
+        # Sleep until the hub has a newer frame than the last one sent, then send only the newest:
+        # nothing is sent while the camera is idle and no frame is ever sent twice. Tiers share
+        # the telescope's sequence numbers, so this holds across adaptive tier changes too.
+        current = tier
+        hub = transcoder.hub(current) if transcoder else source
+        last_seq = after_seq
+        last_timestamp = None
+        hub.watching(1)
+        try:
+            while True:
+                frame = hub.wait_for_frame(last_seq, timeout=5)
+                if frame is None:
+                    continue
+                last_seq = frame.seq
+                # Content-Length lets the browser show the frame as soon as it has arrived,
+                # instead of waiting for the next boundary
+                started = time.perf_counter()
+                yield (b'--frame\r\nContent-Type: image/jpeg\r\n'
+                       b'Content-Length: %d\r\nX-Frame-Seq: %d\r\nX-Timestamp: %.3f\r\nX-Tier: %s\r\n\r\n'
+                       % (len(frame.data), frame.seq, frame.timestamp, current.encode()) + frame.data + b'\r\n')
+                if adaptive is not None:
+                    # The generator resumes once the part has been written, so this is the time
+                    # the viewer's connection took to accept it
+                    if last_timestamp is not None:
+                        chosen = adaptive.sent(time.perf_counter() - started, frame.timestamp - last_timestamp)
+                        if chosen != current:
+                            hub.watching(-1)
+                            current, hub = chosen, transcoder.hub(chosen)
+                            hub.watching(1)
+                    last_timestamp = frame.timestamp
+        except Exception as e:
+            print(f"[MJPEG] Error streaming frame for {client_id}: {e}")
+        finally:
+            hub.watching(-1)
     try:
-        return Response(generate(), mimetype='multipart/x-mixed-replace; boundary=frame')
+        return Response(generate(), mimetype='multipart/x-mixed-replace; boundary=frame',
+                        headers={'Cache-Control': 'no-cache', 'X-Accel-Buffering': 'no'})
     except Exception as e:
         print(f"[MJPEG] Error creating response for {client_id}: {e}")
         return Response("Error streaming live view", status=500)
 
+def unknown_liveview(client_id):
+    return jsonify({"status": "error", "error": f"No live view for '{client_id}'"}), 404
+
+def liveview_stats_handler(client_id):
+    """Handler for /liveview/<client_id>/stats route"""
+    hub = hubs.get(client_id)
+    if hub is None:
+        return unknown_liveview(client_id)
+    stats = hub.stats()
+    if client_id in transcoders:
+        stats["transcoding"] = transcoders[client_id].stats()
+    if client_id in recorders:
+        stats["recording"] = recorders[client_id].stats()
+    return jsonify({"status": "success", "stats": stats})
+
+def liveview_snapshot_handler(client_id):
+    """
+    Handler for /liveview/<client_id>/snapshot route: the latest frame, straight from memory.
+    The ETag names the frame, so polling clients get 304 Not Modified until a new one arrives.
+    """
+    hub = hubs.get(client_id)
+    if hub is None:
+        return unknown_liveview(client_id)
+    frame = hub.latest
+    if frame is None:
+        return jsonify({"status": "error", "error": "No live view frame available"}), 404
+
+    response = Response(frame.data, mimetype='image/jpeg',
+                        headers={'Cache-Control': 'no-cache', 'X-Frame-Seq': str(frame.seq)})
+    # The timestamp keeps tags unique across server restarts, when seq starts again from 1
+    response.set_etag(f"{frame.seq}-{int(frame.timestamp * 1000)}")
+    response.last_modified = frame.timestamp
+    return response.make_conditional(request)
+
+def liveview_clip_handler(client_id):
+    """
+    Handler for /liveview/<client_id>/clip route: the recorded frames between ?start= and ?end=
+    (Unix timestamps), or the last ?seconds= (default 30), as an MJPEG file
+    """
+    recorder = recorders.get(client_id)
+    if recorder is None:
+        return jsonify({"status": "error", "error": "Live view is not being recorded"}), 404
+
+    end = request.args.get('end', time.time(), type=float)
+    start = request.args.get('start', end - request.args.get('seconds', 30, type=float), type=float)
+    if start >= end:
+        return jsonify({"status": "error", "error": "start must be before end"}), 400
+
+    filename = f"{client_id}_{time.strftime('%Y%m%d-%H%M%S', time.localtime(start))}.mjpeg"
+    return Response(recorder.clip(start, end), mimetype='video/x-motion-jpeg',
+                    headers={'Content-Disposition': f'attachment; filename="{filename}"'})
+
 def register_client_handler():
     """Handler for /client/register route"""
     # Generate a unique client_id
     print("Client requesting client ID")
-    client_id = str(uuid.uuid4())
+    client_id = client_manager.register()
 
-    clients.append(client_id)
-    
-    # Optionally, store the client_id in a database or in-memory structure
-    # For example: registered_clients[client_id] = {"timestamp": time.time()}
-    
     print(f"[+] New client registered: {client_id}")
 
-    return jsonify({"client_id": client_id})
+    return jsonify({"client_id": client_id, "lease": REGISTRATION_LEASE})
+
+def client_metrics_handler():
+    """Handler for /clients/metrics route"""
+    return jsonify({"status": "success", "metrics": client_manager.metrics()})
+
+if __name__ == '__main__':
+    # Standalone: telescopes and browser live view without the website. The Flask routes that
+    # go through the websocket loop (/sendCommand, /liveview/<client_id>, ...) need the runtime
+    # in the Flask process, which start_websocket_servers() provides.
+    runtime.run()
@@ -121,3 +121,24 @@ class convert:
     def HrMinSecToDegrees(hours, minutes, seconds):
         sign = -1 if hours < 0 or minutes < 0 or seconds < 0 else 1
         return sign * (abs(hours) + abs(minutes) / 60 + abs(seconds) / 3600)
+
+    @staticmethod
+    def EquatorialToHorizonArrays(LA_RA, LA_DEC, LR_latitude, LR_LST):
+        # Vectorised form of EquatorialToHorizon for whole catalogues.
+        # RA and DEC are arrays in decimal degrees, LST in decimal hours.
+        # Returns (azimuth, elevation) arrays in decimal degrees.
+        import numpy as np
+
+        LR_latitude_RAD = np.radians(LR_latitude)
+        LA_H_RAD = np.radians((LR_LST * 15 - np.asarray(LA_RA, dtype=np.float64)) % 360)
+        LA_DEC_RAD = np.radians(np.asarray(LA_DEC, dtype=np.float64))
+
+        LA_sinELV = np.sin(LA_DEC_RAD) * np.sin(LR_latitude_RAD) + np.cos(LA_DEC_RAD) * np.cos(LR_latitude_RAD) * np.cos(LA_H_RAD)
+        LA_ELV_RAD = np.arcsin(np.clip(LA_sinELV, -1.0, 1.0))
+
+        # atan2 keeps the azimuth quadrant without the sin(H) > 0 correction
+        LA_Y = -np.cos(LA_DEC_RAD) * np.sin(LA_H_RAD)
+        LA_X = np.sin(LA_DEC_RAD) * np.cos(LR_latitude_RAD) - np.cos(LA_DEC_RAD) * np.sin(LR_latitude_RAD) * np.cos(LA_H_RAD)
+        LA_AZ_DEG = np.degrees(np.arctan2(LA_Y, LA_X)) % 360
+
+        return LA_AZ_DEG, np.degrees(LA_ELV_RAD)
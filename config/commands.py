@@ -0,0 +1,25 @@
+"""
+Telescope command configuration for the Telescope project
+"""
+
+# Seconds to wait for a telescope to answer a command it has gone quiet on. Every progress
+# frame the telescope sends for a call restarts the wait, so an exposure that reports
+# progress can run past its timeout; one that goes silent is cancelled.
+DEFAULT_COMMAND_TIMEOUT = 3
+
+COMMAND_TIMEOUTS = {
+    'capturePhoto': 120,       # Long exposures plus download from the camera
+    'getCameraChoices': 10,    # gphoto2 enumerates every setting
+    'startLiveView': 10,
+    'stopLiveView': 10,
+}
+
+# Background commands started over HTTP (/sendCommand/async)
+COMMAND_JOB_RETENTION = 600    # Seconds a finished command's result can still be polled
+COMMAND_POLL_MAX_WAIT = 25     # Longest a status poll may wait for news before answering
+
+# Telescope connections on the command channel (WebsocketServer.ClientManager)
+CLIENT_PING_INTERVAL = 20      # Seconds between websocket pings to each telescope
+CLIENT_PING_TIMEOUT = 20       # A telescope that has not answered a ping by then is disconnected
+CLIENT_SEND_QUEUE_SIZE = 256   # Messages queued for one telescope before senders wait for it
+REGISTRATION_LEASE = 7 * 24 * 3600  # Seconds an id from /client/register is kept while its telescope is away
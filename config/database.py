@@ -0,0 +1,34 @@
+"""
+SQLite Configuration for Telescope Project
+"""
+
+# PRAGMAs applied to every new SQLite connection (see db.py)
+# WAL lets the star map/search readers run while heartbeat and 2FA writes commit,
+# instead of every reader and writer serialising on the rollback journal.
+SQLITE_PRAGMAS = {
+    'journal_mode': 'WAL',
+    'synchronous': 'NORMAL',   # Safe with WAL; only the last commits can be lost on power failure
+    'mmap_size': 268435456,    # Map up to 256MB of the database file instead of read() calls
+    'cache_size': -65536,      # Negative values are KiB, so a 64MB page cache per connection
+    'busy_timeout': 5000,      # Wait up to 5s for a lock rather than failing with "database is locked"
+    'temp_store': 'MEMORY',
+}
+
+# SQLAlchemy connection pool for the SQLite engine
+SQLITE_POOL = {
+    'pool_size': 10,           # Connections kept open (one per busy Flask worker thread)
+    'max_overflow': 20,        # Extra connections allowed under burst load
+    'pool_timeout': 10,        # Seconds to wait for a free connection
+    'pool_recycle': 3600,
+    'pool_pre_ping': False,    # Local file, connections do not go stale
+}
+
+# PRAGMAs for the read-only catalogue database (Catalog.db, see utility/splitCatalog.py).
+# It is opened with mode=ro&immutable=1, so SQLite takes no locks and never checks for
+# changes; there is no journal to configure because nothing is ever written to it.
+CATALOG_PRAGMAS = {
+    'mmap_size': 1073741824,   # Map the whole catalogue (up to 1GB), pages are shared between connections
+    'cache_size': -16384,      # 16MB per connection, most reads come straight from the mapping
+    'query_only': 1,           # Refuse writes even if a bug tries one
+    'temp_store': 'MEMORY',
+}
@@ -0,0 +1,56 @@
+"""
+Live view configuration for the Telescope project
+"""
+
+# Reduced quality tiers a viewer can ask for with /liveview/<client_id>?tier=<name>, best first.
+# 'full' is always available and is the telescope's own frame, untouched. Each tier is
+# encoded at most once per frame (and at most fps times a second), only while someone is
+# watching it, and the result is shared by everyone on that tier (see liveViewTranscoder.py).
+LIVEVIEW_TIERS = {
+    'high':   {'width': 1280, 'quality': 80, 'fps': 15},
+    'medium': {'width': 800,  'quality': 70, 'fps': 10},
+    'low':    {'width': 480,  'quality': 55, 'fps': 5},
+}
+
+LIVEVIEW_TRANSCODING = True    # Needs OpenCV; without it every viewer gets 'full'
+TRANSCODE_WORKERS = 2          # Threads shared by all telescopes (OpenCV releases the GIL)
+
+# ?tier=auto starts here and moves one tier at a time based on how long each frame takes
+# to write to the viewer, compared with how often the telescope sends one
+ADAPTIVE_START_TIER = 'medium'
+ADAPTIVE_SLOW_FRACTION = 0.5   # Writing took more than half the frame interval: too slow
+ADAPTIVE_FAST_FRACTION = 0.1   # Writing took under a tenth of it: room to spare
+ADAPTIVE_DOWN_AFTER = 3        # Consecutive slow frames before dropping a tier
+ADAPTIVE_UP_AFTER = 30         # Consecutive fast frames before trying the next tier up
+
+# Live view recorder (liveViewRecorder.py): the last few minutes of each telescope's live view,
+# kept in fixed-size memory-mapped segment files so an event can be exported as a clip
+LIVEVIEW_RECORDING = False
+RECORDING_DIR = 'recordings'                # Under the project root, one directory per telescope
+RECORDING_MINUTES = 10                      # Frames older than this are dropped a segment at a time
+RECORDING_SEGMENT_SIZE = 64 * 1024 * 1024   # Bytes per segment file, allocated up front
+RECORDING_MAX_SEGMENTS = 32                 # Disk cap per telescope, whatever the age of the frames
+RECORDING_MAX_CLIP = 300                    # Longest clip in seconds that can be exported in one request
+
+# /liveview/<client_id>/snapshot is served from memory. Optionally a background thread also
+# keeps <client_id>_latest.jpg on disk for tools that read the file, rewriting it only when
+# the telescope has sent a new frame since the last write
+SNAPSHOT_PERSIST = False
+SNAPSHOT_DIR = None                         # None for the system temp directory
+SNAPSHOT_PERSIST_INTERVAL = 5               # Seconds between checks for a new frame
+
+# Live stacking (liveStacking.py). Frames are aligned on their stars and averaged; a stretched
+# preview is published to the live view hub "<client_id>_stack" for any viewer to watch
+STACK_MODE = 'sigma'           # 'mean' or 'sigma' (running mean that rejects outlying pixels)
+STACK_SIGMA = 3.0              # Pixels further than this many standard deviations from the mean are rejected
+STACK_SIGMA_MIN_FRAMES = 5     # Frames a pixel needs before anything is rejected there
+STACK_WORKERS = 3              # Threads that decode, detect and align frames (OpenCV releases the GIL)
+STACK_MAX_IN_FLIGHT = 6        # Frames waiting for or in the workers; newer frames are dropped beyond this
+STACK_MIN_STARS = 8            # Frames with fewer detected stars are rejected
+STACK_MATCH_STARS = 30         # Largest stars used to match a frame to the reference frame
+STACK_MATCH_TOLERANCE = 3.0    # Pixels between matching stars after alignment
+STACK_MIN_MATCHES = 6          # Matched stars needed to accept an alignment
+STACK_PREVIEW_INTERVAL = 2.0   # Seconds between preview frames
+STACK_PREVIEW_WIDTH = 1280
+STACK_PREVIEW_QUALITY = 85
+STACK_STRETCH = 8.0            # Strength of the asinh stretch that brings out faint detail
@@ -0,0 +1,29 @@
+"""
+Observing site configuration for the Telescope project
+"""
+
+# Site used when no telescope is selected or the selected telescope has no entry
+DEFAULT_SITE = 'default'
+
+# Telescope sites keyed by telescopeId
+# horizon_mask is a list of (azimuth, minimum altitude) points in degrees, used to
+# hide objects behind trees/buildings. Altitudes between points are interpolated.
+SITES = {
+    'default': {
+        'latitude': 51.5,
+        'longitude': -0.13,
+        'horizon_mask': [],
+    },
+    'pi-001': {
+        'latitude': 51.5,
+        'longitude': -0.13,
+        'horizon_mask': [],
+    },
+}
+
+# Horizon view caching
+HORIZON_CONFIG = {
+    'lst_bucket_hours': 0.05,   # Sky rotates ~0.75 degrees per bucket
+    'max_cached_buckets': 64,   # Per-process LRU size across all sites
+    'min_altitude': 0.0,        # Geometric horizon used when a site has no mask
+}
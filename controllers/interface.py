@@ -28,23 +28,26 @@ def update_camera():
     iso = data.get("iso")
 
     print(shutter_speed, iso)
+    settings = []
     if shutter_speed:
-        try:
-            # Set the shutter speed using Camera class
-            print("Changing shutterspeed")
-            Cameralink.setSettings(["/main/capturesettings/shutterspeed", shutter_speed])
-        except Exception as e:
-            response = {"status": "error", "message": f"Failed to set shutter speed: {e}"}
-            print(response)
-            return jsonify(response)
-
-    # Handling ISO
+        settings.append(("shutter speed", ["/main/capturesettings/shutterspeed", shutter_speed]))
     if iso:
-        try:
-            print("Changing iso")
-            Cameralink.setSettings(["/main/imgsettings/iso", iso])
-        except Exception as e:
-            response = {"status": "error", "message": f"Failed to set ISO: {e}"}
+        settings.append(("ISO", ["/main/imgsettings/iso", iso]))
+    if not settings:
+        return jsonify(response)
+
+    # All settings go to the camera in one round trip
+    try:
+        print(f"Changing {', '.join(label for label, _ in settings)}")
+        results = Cameralink.setSettingsBatch([args for _, args in settings])
+    except Exception as e:
+        response = {"status": "error", "message": f"Failed to update camera settings: {e}"}
+        print(response)
+        return jsonify(response)
+
+    for (label, _), result in zip(settings, results):
+        if result["status"] != "success":
+            response = {"status": "error", "message": f"Failed to set {label}: {result['error']}"}
             print(response)
             return jsonify(response)
 
@@ -53,7 +56,7 @@ def update_camera():
 @interface_bp.route("/search_object", methods=["POST"])
 def search_object():
     from algorithms2 import getAllCelestialData
-    from models.tables import HDSTARtable, IndexTable, NGCtable
+    from models.tables import CrossIdTable, HDSTARtable, IndexTable, NGCtable
     data = request.json
     search_value = data.get("searchValue", "").strip()
 
@@ -64,7 +67,14 @@ def search_object():
     searchableCelestials = ["sun", "moon", "mercury", "venus", "mars", "jupiter", "saturn", "uranus", "neptune"]
     try:
         # Determine the table based on prefix or content
-        if search_value.startswith("HD"):
+        cross_id = None if search_value.lower() in searchableCelestials else CrossIdTable.resolve(search_value)
+
+        if cross_id:
+            # Any catalogue alias resolves with one indexed read when cross-IDs are built
+            print(f"Resolved {search_value} to {cross_id['Name']} via cross-identifications")
+            result = cross_id
+
+        elif search_value.startswith("HD"):
             # search_value = "HD" + search_value[2:]  # Ensure full name format
             print(f"Querying HDSTARtable for {search_value}")
             result = HDSTARtable.query_by_name(search_value)
@@ -103,7 +113,7 @@ def search_object():
             
             if not result:
                 print("Object not found by common name")
-                return jsonify({"status": "error", "message": "Object not found"})
+                return jsonify({"status": "error", "message": "Object not found", "suggestions": get_suggestions(search_value)})
 
     except ValueError as e:
         print(f"Error during search: {e}")
@@ -120,8 +130,8 @@ def search_object():
             result_data = {column: getattr(result, column) for column in result.__table__.columns.keys()}
 
         name = result_data.get('Name', "Null")
-        ra = float(result_data.get('RA', 0))  # Default to 0 if RA is missing or None
-        dec = float(result_data.get('DEC', 0))  # Default to 0 if DEC is missing or None
+        ra = float(result_data.get('RA') or 0)  # Default to 0 if RA is missing or None
+        dec = float(result_data.get('DEC') or 0)  # Default to 0 if DEC is missing or None
         mag = result_data.get('V-Mag', 0)  # Default to 0 if V-Mag is missing or None
 
         # print(f"\n[TRACKING] {name} at RA: {ra}°, DEC: {dec}° with magnitude {mag}.\n", flush=True)
@@ -136,8 +146,107 @@ def search_object():
         return jsonify({"status": "success", "data": result_data})
     else:
         print("Object not found")
-        return jsonify({"status": "error", "message": "Object not found"})
-    
+        return jsonify({"status": "error", "message": "Object not found", "suggestions": get_suggestions(search_value)})
+
+def get_suggestions(search_value, limit=5):
+    from models.catalogIndex import catalog_index
+    try:
+        return [match["name"] for match in catalog_index.search(search_value, limit)]
+    except Exception as e:
+        print(f"Error getting suggestions: {e}")
+        return []
+
+MAX_BATCH_NAMES = 1000
+
+def to_float(value):
+    try:
+        return float(value)
+    except (TypeError, ValueError):
+        return None
+
+@interface_bp.route("/resolve_objects", methods=["POST"])
+def resolve_objects():
+    """
+    Resolve a whole observing list in one pass against the catalogue index.
+    Each name gets its own result, so one bad name does not fail the list.
+    """
+    from models.catalogIndex import catalog_index
+    data = request.json or {}
+    names = data.get("names")
+
+    if not isinstance(names, list):
+        return jsonify({"status": "error", "message": "names must be a list"})
+    if len(names) > MAX_BATCH_NAMES:
+        return jsonify({"status": "error", "message": f"At most {MAX_BATCH_NAMES} names can be resolved at once"})
+
+    try:
+        catalog_index.ensureBuilt()
+    except Exception as e:
+        return jsonify({"status": "error", "message": f"Catalogue index unavailable: {str(e)}"})
+
+    planets = None
+    results = []
+    unresolved = []
+    for query in names:
+        query = str(query).strip() if query is not None else ""
+        if not query:
+            unresolved.append(query)
+            results.append({"query": query, "status": "error", "message": "Empty name"})
+            continue
+
+        match = catalog_index.lookup(query)
+        if match is None:
+            unresolved.append(query)
+            results.append({"query": query, "status": "error", "message": "Object not found", "suggestions": get_suggestions(query, 3)})
+            continue
+
+        if match["type"] == "planet":
+            if planets is None:
+                # Solar-system positions are computed once for the whole list
+                from controllers.star_map import celestialDataToObjects, getCurrentCelestialData
+                planets = {obj["name"].lower(): obj for obj in celestialDataToObjects(getCurrentCelestialData())}
+            planet = planets.get(match["name"].lower())
+            if planet is None:
+                unresolved.append(query)
+                results.append({"query": query, "status": "error", "message": "Position unavailable"})
+                continue
+            match = dict(match, ra=planet["ra"], dec=planet["dec"], mag=planet["mag"])
+
+        results.append({
+            "query": query,
+            "status": "success",
+            "name": match["name"],
+            "table": match["table"],
+            "type": match["type"],
+            "ra": to_float(match["ra"]),
+            "dec": to_float(match["dec"]),
+            "mag": to_float(match["mag"])
+        })
+
+    return jsonify({
+        "status": "success",
+        "resolved": sum(1 for result in results if result["status"] == "success"),
+        "unresolved": unresolved,
+        "results": results
+    })
+
+MAX_AUTOCOMPLETE_RESULTS = 50
+
+@interface_bp.route("/autocomplete", methods=["GET"])
+def autocomplete():
+    """
+    Ranked typeahead over every designation and common name
+    """
+    from models.catalogIndex import catalog_index
+    query = request.args.get("q", "").strip()
+    limit = max(1, min(request.args.get("limit", 10, type=int), MAX_AUTOCOMPLETE_RESULTS))
+    if not query:
+        return jsonify({"status": "success", "results": []})
+
+    try:
+        return jsonify({"status": "success", "results": catalog_index.search(query, limit)})
+    except Exception as e:
+        return jsonify({"status": "error", "message": f"Search failed: {str(e)}"})
 
 
 def format_celestial_data(name, data):
@@ -177,9 +286,10 @@ def take_photo():
             print(f"User ID: {currentId}")
 
             try:
-                print(Cameralink.capturePhoto(currentId))
+                # Exposures can take minutes, so start the capture and let the page poll for it
+                job_id = Cameralink.capturePhotoAsync(currentId)
 
-                return jsonify({"status": "success"})
+                return jsonify({"status": "success", "jobId": job_id})
             except Exception as e:
                 return jsonify({"status": "error", "message": str(e)})
         else:
@@ -192,21 +302,11 @@ def take_photo():
 @interface_bp.route("/get_telescopes", methods=["GET"])
 def get_telescopes():
     """
-    Get all available telescopes from the database
+    Get all available telescopes, with online status, from the in-memory registry
     """
     try:
-        from models.tables import Telescope
-        telescopes = Telescope.get_all_telescopes()
-        
-        telescope_list = []
-        for telescope in telescopes:
-            telescope_data = {column: getattr(telescope, column) for column in telescope.__table__.columns.keys()}
-            
-            # Add online status
-            telescope_data['online'] = Telescope.is_telescope_online(telescope_data.get('telescopeId', ''))
-            telescope_list.append(telescope_data)
-        
-        return jsonify({"status": "success", "telescopes": telescope_list})
+        from models.telescopeRegistry import telescope_registry
+        return jsonify({"status": "success", "telescopes": telescope_registry.getAll()})
     except Exception as e:
         return jsonify({"status": "error", "message": f"Failed to get telescopes: {str(e)}"})
 
@@ -222,8 +322,8 @@ def select_telescope():
         if not telescope_id:
             return jsonify({"status": "error", "message": "Telescope ID is required"})
         
-        from models.tables import Telescope
-        telescope = Telescope.get_telescope_by_id(telescope_id)
+        from models.telescopeRegistry import telescope_registry
+        telescope = telescope_registry.get(telescope_id)
         
         if not telescope:
             return jsonify({"status": "error", "message": "Telescope not found"})
@@ -234,7 +334,7 @@ def select_telescope():
             'ipAddress': telescope.get('ipAddress'),
             'firmwareVersion': telescope.get('firmwareVersion'),
             'capabilities': telescope.get('capabilities'),
-            'online': Telescope.is_telescope_online(telescope.get('telescopeId', ''))
+            'online': telescope['online']
         }
         
         return jsonify({
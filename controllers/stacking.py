@@ -0,0 +1,90 @@
+from flask import Blueprint, Response, jsonify, request
+
+# Define the blueprint for live stacking routes
+stacking_bp = Blueprint("stacking", __name__)
+
+# liveStacking needs OpenCV, so it is imported per request like the star map tile renderer
+
+
+@stacking_bp.route("/stack/<client_id>/start", methods=["POST"])
+def start_stacking(client_id):
+    """Start stacking a telescope's live view: {"mode": "mean"|"sigma", "reset": bool, "liveView": bool}"""
+    from liveStacking import STACK_MODES, get_stacker, stacking_available
+
+    if not stacking_available():
+        return jsonify({"status": "error", "error": "Live stacking needs OpenCV"}), 503
+
+    data = request.get_json(silent=True) or {}
+    mode = data.get("mode")
+    if mode is not None and mode not in STACK_MODES:
+        return jsonify({"status": "error", "error": f"mode must be one of {', '.join(STACK_MODES)}"}), 400
+
+    stacker = get_stacker(client_id)
+    if data.get("reset"):
+        stacker.reset()
+    stacker.start(mode, live_view=data.get("liveView", True))
+    return jsonify({"status": "success", "stack": stacker.stats()})
+
+
+@stacking_bp.route("/stack/<client_id>/stop", methods=["POST"])
+def stop_stacking(client_id):
+    from liveStacking import stackers
+
+    stacker = stackers.get(client_id)
+    if stacker is None:
+        return jsonify({"status": "error", "error": "Not stacking"}), 404
+    stacker.stop()
+    return jsonify({"status": "success", "stack": stacker.stats()})
+
+
+@stacking_bp.route("/stack/<client_id>/reset", methods=["POST"])
+def reset_stacking(client_id):
+    from liveStacking import stackers
+
+    stacker = stackers.get(client_id)
+    if stacker is None:
+        return jsonify({"status": "error", "error": "Not stacking"}), 404
+    stacker.reset()
+    return jsonify({"status": "success", "stack": stacker.stats()})
+
+
+@stacking_bp.route("/stack/<client_id>/frame", methods=["POST"])
+def add_stacking_frame(client_id):
+    """Add one capture (JPEG in the body or as a file upload) to a telescope's stack"""
+    from liveStacking import get_stacker, stacking_available
+
+    if not stacking_available():
+        return jsonify({"status": "error", "error": "Live stacking needs OpenCV"}), 503
+
+    data = next(iter(request.files.values())).read() if request.files else request.get_data()
+    if not data:
+        return jsonify({"status": "error", "error": "No image provided"}), 400
+
+    stacker = get_stacker(client_id)
+    if not stacker.submit(data):
+        return jsonify({"status": "error", "error": "Stacker is busy, try again"}), 503
+    return jsonify({"status": "success", "stack": stacker.stats()}), 202
+
+
+@stacking_bp.route("/stack/<client_id>")
+def stacking_status(client_id):
+    """Stack progress; the preview is live view '<client_id>_stack' (/liveview/<client_id>_stack)"""
+    from liveStacking import stackers
+
+    stacker = stackers.get(client_id)
+    if stacker is None:
+        return jsonify({"status": "error", "error": "Not stacking"}), 404
+    return jsonify({"status": "success", "stack": stacker.stats()})
+
+
+@stacking_bp.route("/stack/<client_id>/image")
+def stacking_image(client_id):
+    """The linear stack as a 16-bit PNG"""
+    from liveStacking import stackers
+
+    stacker = stackers.get(client_id)
+    png = stacker.export_png() if stacker else None
+    if png is None:
+        return jsonify({"status": "error", "error": "Nothing stacked yet"}), 404
+    return Response(png, mimetype="image/png",
+                    headers={"Content-Disposition": f'attachment; filename="{client_id}_stack.png"'})
@@ -1,13 +1,44 @@
-from flask import Blueprint, jsonify, render_template, request, session
+from flask import Blueprint, Response, jsonify, render_template, request, session
 from datetime import datetime
-from models.tables import HDSTARtable, IndexTable, NGCtable
+import time
+from models.tables import CrossIdTable, HDSTARtable, IndexTable, NGCtable
 
 from algorithms.convert import convert
 from algorithms2 import getAllCelestialData
+from starMap.planetFeed import planet_feed
+from starMap.horizonView import horizon_view, getSite
 
 star_map_bp = Blueprint("star_map", __name__)
 
-now = datetime.utcnow()
+def getCurrentCelestialData():
+    # Evaluated per call so positions follow the clock instead of the import time
+    now = datetime.utcnow()
+    return getAllCelestialData(now.year, now.month, now.day)
+
+def celestialToDegrees(coords):
+    ra_h, ra_m, ra_s = coords["ra"]
+    dec_d, dec_m, dec_s = coords["dec"]
+
+    ra_deg = convert.HrMinSecToDegrees(ra_h, ra_m, ra_s) * 15
+    if dec_d < 0:
+        dec_deg = dec_d - dec_m / 60 - dec_s / 3600
+    else:
+        dec_deg = dec_d + dec_m / 60 + dec_s / 3600
+    return ra_deg, dec_deg
+
+def celestialDataToObjects(celestial_data):
+    objects = []
+    for obj_name, coords in celestial_data.items():
+        ra_deg, dec_deg = celestialToDegrees(coords)
+        objects.append({
+            "name": obj_name.capitalize(),
+            "ra": ra_deg,
+            "dec": dec_deg,
+            "mag": coords.get("vmag", 30),
+            "icon": f"/static/icons/planets/{obj_name.lower()}.png",
+            "type": "planet"
+        })
+    return objects
 
 def loadStarsFromTables(tables):
     all_stars = []
@@ -38,27 +69,7 @@ def get_all_celestial_objects():
 
 
     # Get celestial objects positions for current UTC date
-    celestial_data = getAllCelestialData(now.year, now.month, now.day)
-
-    for obj_name, coords in celestial_data.items():
-        ra_h, ra_m, ra_s = coords["ra"]
-        dec_d, dec_m, dec_s = coords["dec"]
-        mag = coords.get("vmag", 30)
-
-        ra_deg = convert.HrMinSecToDegrees(ra_h, ra_m, ra_s) * 15
-        if dec_d < 0:
-            dec_deg = dec_d - dec_m / 60 - dec_s / 3600
-        else:
-            dec_deg = dec_d + dec_m / 60 + dec_s / 3600
-
-        all_objects.append({
-            "name": obj_name.capitalize(),
-            "ra": ra_deg,
-            "dec": dec_deg,
-            "mag": mag,
-            "icon": f"/static/icons/planets/{obj_name.lower()}.png",
-            "type": "planet"
-        })
+    all_objects.extend(celestialDataToObjects(getCurrentCelestialData()))
 
     return all_objects
 
@@ -67,6 +78,38 @@ def get_stars():
     all_objects = get_all_celestial_objects()
     return jsonify(all_objects)
 
+def getRequestSite():
+    # Site of the telescope in the query string, else the one selected in the session
+    telescope_id = request.args.get("telescopeId") or session.get("selected_telescope", {}).get("telescopeId")
+    return getSite(telescope_id, request.args.get("lat", type=float), request.args.get("lon", type=float))
+
+def filterByMagnitude(objects, mag_limit):
+    if mag_limit is None:
+        return objects
+    filtered = []
+    for obj in objects:
+        try:
+            if float(obj["mag"]) <= mag_limit:
+                filtered.append(obj)
+        except (TypeError, ValueError):
+            continue
+    return filtered
+
+def get_horizon_objects(site, mag_limit=None):
+    stars = filterByMagnitude(horizon_view.getVisibleStars(site), mag_limit)
+    planets = horizon_view.getVisiblePlanets(site, celestialDataToObjects(getCurrentCelestialData()))
+    return stars + planets
+
+@star_map_bp.route("/api/stars/horizon")
+def get_horizon_stars():
+    """Only the objects above the selected site's horizon, with alt/az"""
+    site = getRequestSite()
+    objects = get_horizon_objects(site, request.args.get("magLimit", type=float))
+    return jsonify({
+        "site": {"id": site["id"], "latitude": site["latitude"], "longitude": site["longitude"]},
+        "objects": objects
+    })
+
 @star_map_bp.route("/StarMap")
 def star_map():
     all_stars = []
@@ -75,36 +118,63 @@ def star_map():
     RenderStars = True
     RenderPlanets = True
 
+    if request.args.get("mode") == "horizon":
+        all_stars = get_horizon_objects(getRequestSite(), request.args.get("magLimit", type=float))
+        return render_template("star_map.html", stars=all_stars)
+
     if RenderStars:
         all_stars = loadStarsFromTables(tables)
 
-    celestial_data = getAllCelestialData(now.year, now.month, now.day)
-
     if RenderPlanets:
-        for obj_name, coords in celestial_data.items():
-            ra_h, ra_m, ra_s = coords["ra"]
-            dec_d, dec_m, dec_s = coords["dec"]
-            mag = coords.get("vmag", 30)
-
-            ra_deg = convert.HrMinSecToDegrees(ra_h, ra_m, ra_s) * 15
-            if dec_d < 0:
-                dec_deg = dec_d - dec_m / 60 - dec_s / 3600
-            else:
-                dec_deg = dec_d + dec_m / 60 + dec_s / 3600
-
-            all_stars.append({
-                "name": obj_name.capitalize(),
-                "ra": ra_deg,
-                "dec": dec_deg,
-                "mag": mag,
-                "icon": f"/static/icons/planets/{obj_name.lower()}.png",
-                "type": "planet"
-            })
+        all_stars.extend(celestialDataToObjects(getCurrentCelestialData()))
 
     return render_template("star_map.html", stars=all_stars)
 
+@star_map_bp.route("/StarMap/lite")
+def star_map_lite():
+    """Image-tile star map for phones and the Pi touchscreen"""
+    from starMap.tileRenderer import TILE_SIZE, MAX_ZOOM
+    return render_template("star_map_lite.html", tile_size=TILE_SIZE, max_zoom=MAX_ZOOM)
+
+@star_map_bp.route("/tiles/<int:z>/<int:x>/<int:y>.<fmt>")
+def star_map_tile(z, x, y, fmt):
+    from starMap.tileRenderer import tile_renderer, TILE_TIME_BUCKET
+    try:
+        data, bucket = tile_renderer.getTile(
+            z, x, y, lambda: celestialDataToObjects(getCurrentCelestialData()), fmt
+        )
+    except ValueError:
+        return jsonify({"error": "Tile not found"}), 404
+
+    response = Response(data, mimetype=f"image/{fmt}")
+    # Browsers can keep the tile until planets are next redrawn
+    response.headers["Cache-Control"] = f"public, max-age={max((bucket + 1) * TILE_TIME_BUCKET - int(time.time()), 0)}"
+    # The format is part of the tag, the PNG and WebP versions of a tile are different bytes
+    response.set_etag(f"{bucket}-{z}-{x}-{y}-{fmt}")
+    return response.make_conditional(request)
+
+@star_map_bp.route("/api/planets/stream")
+def planet_stream():
+    """Server-Sent Events stream of live Sun, Moon and planet positions"""
+    response = Response(planet_feed.stream(), mimetype="text/event-stream")
+    response.headers["Cache-Control"] = "no-cache"
+    response.headers["X-Accel-Buffering"] = "no"
+    return response
+
 @star_map_bp.route("/star_info/<star_name>")
 def star_info(star_name):
+    # Any alias (M31, Andromeda Galaxy, an IC duplicate...) resolves with one indexed read
+    result = CrossIdTable.resolve(star_name)
+    if result:
+        return jsonify({
+            "name": result["Name"],
+            "ra": result["RA"] or 0,
+            "dec": result["DEC"] or 0,
+            "mag": result["V-Mag"] or 0,
+            "aliases": CrossIdTable.get_aliases(result["Name"]),
+            "type": "star"
+        })
+
     tables = [HDSTARtable, IndexTable, NGCtable]
 
     for table in tables:
@@ -118,19 +188,12 @@ def star_info(star_name):
                 "type": "star"
             })
 
-    celestial_data = getAllCelestialData(now.year, now.month, now.day)
+    celestial_data = getCurrentCelestialData()
     obj_name_lower = star_name.lower()
     if obj_name_lower in celestial_data:
         coords = celestial_data[obj_name_lower]
-        ra_h, ra_m, ra_s = coords["ra"]
-        dec_d, dec_m, dec_s = coords["dec"]
         mag = coords.get("vmag", 30)
-
-        ra_deg = convert.HrMinSecToDegrees(ra_h, ra_m, ra_s) * 15
-        if dec_d < 0:
-            dec_deg = dec_d - dec_m / 60 - dec_s / 3600
-        else:
-            dec_deg = dec_d + dec_m / 60 + dec_s / 3600
+        ra_deg, dec_deg = celestialToDegrees(coords)
 
         return jsonify({
             "name": star_name.capitalize(),
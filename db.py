@@ -1,3 +1,44 @@
+from pathlib import Path
+
 from flask_sqlalchemy import SQLAlchemy
+from sqlalchemy import event
+
+from config.database import SQLITE_PRAGMAS, SQLITE_POOL, CATALOG_PRAGMAS
 
 db = SQLAlchemy()
+
+
+def get_engine_options():
+    """SQLALCHEMY_ENGINE_OPTIONS for a pooled, thread-shared SQLite engine"""
+    return dict(SQLITE_POOL, connect_args={
+        'check_same_thread': False,  # Pooled connections are handed between Flask threads
+        'timeout': SQLITE_PRAGMAS['busy_timeout'] / 1000,
+    })
+
+
+def get_catalog_uri(path):
+    """SQLAlchemy URI that opens the catalogue database read-only and immutable"""
+    return f"sqlite:///file:{Path(path).resolve().as_posix()}?mode=ro&immutable=1&uri=true"
+
+
+def is_read_only(engine):
+    return engine.url.query.get("mode") == "ro"
+
+
+def apply_sqlite_pragmas(dbapi_connection, pragmas=SQLITE_PRAGMAS):
+    cursor = dbapi_connection.cursor()
+    try:
+        for name, value in pragmas.items():
+            cursor.execute(f"PRAGMA {name} = {value}")
+    finally:
+        cursor.close()
+
+
+def init_sqlite_tuning(app):
+    """Apply SQLITE_PRAGMAS (or CATALOG_PRAGMAS for the read-only catalogue) to every
+    connection the app's SQLite engines open"""
+    with app.app_context():
+        for engine in db.engines.values():
+            if engine.dialect.name == "sqlite":
+                pragmas = CATALOG_PRAGMAS if is_read_only(engine) else SQLITE_PRAGMAS
+                event.listen(engine, "connect", lambda dbapi_connection, record, pragmas=pragmas: apply_sqlite_pragmas(dbapi_connection, pragmas))
@@ -0,0 +1,322 @@
+"""
+Live stacking for electronically assisted astronomy.
+
+A LiveStacker takes a telescope's live view frames from its hub, or capture
+JPEGs posted to /stack/<client_id>/frame, and finds their stars with
+plateSolver/starDetection.py. The first frame with enough stars becomes the
+reference. Every later frame is matched to it by star centroids and warped
+onto it with a similarity transform (shift, rotation and scale, which covers
+drift and the field rotation of alt-az mounts). Aligned frames are added to a
+float32 running mean. In 'sigma' mode, the running variance is kept as well
+and pixels far from the mean so far, such as satellites, planes or hot pixels,
+are replaced with the mean before they are added.
+
+Every STACK_PREVIEW_INTERVAL seconds a stretched JPEG of the stack is
+published to the hub "<client_id>_stack". It can then be watched like any live
+view: MJPEG, the browser websocket or the snapshot route.
+
+Decoding, detection, matching and warping run in a thread pool, and only the
+addition to the stack is serialised. At most STACK_MAX_IN_FLIGHT frames are
+queued or being worked on. Newer frames are dropped beyond that, so stacking
+never holds up the live view.
+"""
+
+import threading
+import time
+from concurrent.futures import ThreadPoolExecutor
+
+from liveViewHub import get_hub
+from config.liveview import (STACK_MODE, STACK_SIGMA, STACK_SIGMA_MIN_FRAMES, STACK_WORKERS, STACK_MAX_IN_FLIGHT,
+                             STACK_MIN_STARS, STACK_MATCH_STARS, STACK_MATCH_TOLERANCE, STACK_MIN_MATCHES,
+                             STACK_PREVIEW_INTERVAL, STACK_PREVIEW_WIDTH, STACK_PREVIEW_QUALITY, STACK_STRETCH)
+
+try:
+    import cv2
+    import numpy as np
+    from plateSolver.starDetection import detectStars
+except ImportError:  # Optional, stacking is unavailable without OpenCV
+    cv2 = None
+
+STACK_MODES = ("mean", "sigma")
+STACK_HUB_SUFFIX = "_stack"  # Ends up in snapshot file names, so no characters Windows rejects
+
+_pool = None
+_pool_lock = threading.Lock()
+
+
+def stacking_available():
+    return cv2 is not None
+
+
+def _get_pool():
+    global _pool
+    if _pool is None:
+        with _pool_lock:
+            if _pool is None:
+                _pool = ThreadPoolExecutor(STACK_WORKERS, thread_name_prefix="live-stacking")
+    return _pool
+
+
+def identity_transform():
+    return np.float32([[1, 0, 0], [0, 1, 0]])
+
+
+def match_stars(points, reference, guess, tolerance=STACK_MATCH_TOLERANCE):
+    """
+    (frame points, reference points) that look like the same stars. The frame is first moved
+    by the previous frame's transform, then by the shift that the most star pairs agree on.
+    """
+    moved = cv2.transform(points[None], guess)[0]
+    offsets = (reference[None, :, :] - moved[:, None, :]).reshape(-1, 2)
+    votes = (np.abs(offsets[:, None, :] - offsets[None, :, :]) <= tolerance).all(axis=2).sum(axis=1)
+    shifted = moved + offsets[votes.argmax()]
+
+    distances = np.linalg.norm(reference[None, :, :] - shifted[:, None, :], axis=2)
+    nearest = distances.argmin(axis=1)
+    close = distances[np.arange(len(points)), nearest] <= tolerance
+    return points[close], reference[nearest[close]]
+
+
+def align(points, reference, guess):
+    """2x3 transform taking frame pixels onto the reference frame, or None if the stars do not match"""
+    source, target = match_stars(points, reference, guess)
+    if len(source) < STACK_MIN_MATCHES:
+        return None
+    transform, inliers = cv2.estimateAffinePartial2D(source, target, method=cv2.RANSAC,
+                                                     ransacReprojThreshold=STACK_MATCH_TOLERANCE)
+    if transform is None or inliers.sum() < STACK_MIN_MATCHES:
+        return None
+    return transform.astype(np.float32)
+
+
+def stretch(image, strength=STACK_STRETCH):
+    """8-bit view of a linear stack: black and white points from percentiles, then an asinh curve"""
+    low, high = np.percentile(image[::4, ::4], (0.5, 99.9))
+    scaled = np.clip((image - low) / max(high - low, 1e-6), 0, 1)
+    return (np.arcsinh(scaled * strength) * (255 / np.arcsinh(strength))).astype(np.uint8)
+
+
+class Stack:
+    """Per-pixel running mean of aligned frames, with the running variance for sigma clipping"""
+
+    def __init__(self, shape, mode=STACK_MODE, sigma=STACK_SIGMA):
+        self.mean = np.zeros(shape, np.float32)
+        self.m2 = np.zeros(shape, np.float32) if mode == "sigma" else None
+        self.count = np.zeros(shape[:2] + (1,), np.float32)  # Frames that covered each pixel
+        self.sigma = sigma
+        self.frames = 0
+        self.clipped = 0
+
+    def add(self, image, coverage):
+        """Add an aligned float32 frame; coverage is 1 where the frame has data after warping"""
+        if self.m2 is not None:
+            # Replace outliers with the mean so far, where there are enough frames to judge
+            std = np.maximum(np.sqrt(self.m2 / np.maximum(self.count - 1, 1)), 1.0)
+            outliers = (np.abs(image - self.mean) > self.sigma * std) & (self.count >= STACK_SIGMA_MIN_FRAMES)
+            self.clipped += int(np.count_nonzero(outliers))
+            image = np.where(outliers, self.mean, image)
+
+        self.count += coverage
+        delta = (image - self.mean) * coverage
+        self.mean += delta / np.maximum(self.count, 1)
+        if self.m2 is not None:
+            self.m2 += delta * (image - self.mean) * coverage
+        self.frames += 1
+
+
+class LiveStacker:
+    def __init__(self, client_id, mode=STACK_MODE):
+        self.client_id = client_id
+        self.mode = mode
+        self.preview_hub = get_hub(client_id + STACK_HUB_SUFFIX)
+        self.running = False
+        self.live_view = True
+        self.stack = None
+        self.reference = None
+        self.shape = None
+        self.last_transform = None
+        self.generation = 0  # Bumped by reset, so frames in flight for an old stack are discarded
+        self.in_flight = 0
+        self.last_preview = 0
+        self._preview_timer = None
+        self._listening = False
+        self._lock = threading.Lock()  # Counters
+        self._stack_lock = threading.Lock()  # Reference and stack
+        self._reset_counters()
+
+    def _reset_counters(self):
+        self.received = 0
+        self.stacked = 0
+        self.dropped = 0
+        self.rejected = 0
+
+    def start(self, mode=None, live_view=True):
+        """Stack frames as they arrive; a different mode starts a new stack"""
+        if mode and mode != self.mode:
+            self.mode = mode
+            self.reset()
+        if live_view and not self._listening:
+            get_hub(self.client_id).add_listener(self.frame_published)
+            self._listening = True
+        self.live_view = live_view
+        self.running = True
+
+    def stop(self):
+        """Stop taking live view frames, the stack and its preview stay"""
+        self.running = False
+
+    def reset(self):
+        with self._stack_lock:
+            self.stack = self.reference = self.shape = self.last_transform = None
+            self.generation += 1
+        with self._lock:
+            self._reset_counters()
+
+    def frame_published(self, frame):
+        """Hub listener, on the live view loop, so the frame is only handed to the pool"""
+        if self.running and self.live_view:
+            self.submit(frame.data)
+
+    def submit(self, data):
+        """Queue an encoded image for stacking; False if it was dropped because the workers are busy"""
+        with self._lock:
+            self.received += 1
+            if self.in_flight >= STACK_MAX_IN_FLIGHT:
+                self.dropped += 1
+                return False
+            self.in_flight += 1
+        _get_pool().submit(self._process, data, self.generation)
+        return True
+
+    def _process(self, data, generation):
+        try:
+            if self._stack_frame(data, generation):
+                with self._lock:
+                    self.stacked += 1
+            else:
+                with self._lock:
+                    self.rejected += 1
+            self._publish_preview()
+        except Exception as e:
+            print(f"[Stacking] Failed to stack a frame for {self.client_id}: {e}")
+        finally:
+            with self._lock:
+                self.in_flight -= 1
+
+    def _stack_frame(self, data, generation):
+        image = cv2.imdecode(np.frombuffer(data, np.uint8), cv2.IMREAD_COLOR)
+        if image is None:
+            raise ValueError("not an image")
+        stars = detectStars(cv2.cvtColor(image, cv2.COLOR_BGR2GRAY), annotate=False)["stars"]
+        if len(stars) < STACK_MIN_STARS:
+            return False
+        points = np.float32([(x, y) for x, y, _ in stars[:STACK_MATCH_STARS]])
+
+        transform = None
+        with self._stack_lock:
+            if generation != self.generation:
+                return False
+            if self.reference is None:
+                self.reference, self.shape = points, image.shape
+                self.stack = Stack(image.shape, self.mode)
+                transform = identity_transform()
+            elif image.shape != self.shape:
+                return False
+            reference = self.reference
+            guess = self.last_transform if self.last_transform is not None else identity_transform()
+
+        # Matching and warping run outside the lock, in parallel with other frames
+        if transform is None:
+            transform = align(points, reference, guess)
+            if transform is None:
+                return False
+        height, width = image.shape[:2]
+        aligned = cv2.warpAffine(image, transform, (width, height), flags=cv2.INTER_LINEAR).astype(np.float32)
+        coverage = cv2.warpAffine(np.ones((height, width), np.float32), transform, (width, height),
+                                  flags=cv2.INTER_NEAREST)[..., None]
+
+        with self._stack_lock:
+            if generation != self.generation:
+                return False
+            self.stack.add(aligned, coverage)
+            self.last_transform = transform
+        return True
+
+    def _publish_preview(self):
+        """Publish now if the interval has passed, otherwise once it has, so the latest frames always show"""
+        with self._lock:
+            wait = self.last_preview + STACK_PREVIEW_INTERVAL - time.time()
+            if wait > 0:
+                if self._preview_timer is None:
+                    self._preview_timer = threading.Timer(wait, self._publish_delayed_preview)
+                    self._preview_timer.daemon = True
+                    self._preview_timer.start()
+                return
+            self.last_preview = time.time()
+        self._render_preview()
+
+    def _publish_delayed_preview(self):
+        with self._lock:
+            self._preview_timer = None
+            self.last_preview = time.time()
+        self._render_preview()
+
+    def _render_preview(self):
+        with self._stack_lock:
+            if self.stack is None:
+                return
+            mean = self.stack.mean.copy()
+
+        preview = stretch(mean)
+        height, width = preview.shape[:2]
+        if width > STACK_PREVIEW_WIDTH:
+            size = (STACK_PREVIEW_WIDTH, round(height * STACK_PREVIEW_WIDTH / width))
+            preview = cv2.resize(preview, size, interpolation=cv2.INTER_AREA)
+        ok, jpeg = cv2.imencode(".jpg", preview, [cv2.IMWRITE_JPEG_QUALITY, STACK_PREVIEW_QUALITY])
+        if ok:
+            self.preview_hub.publish(jpeg.tobytes())
+
+    def export_png(self):
+        """The linear stack as a 16-bit PNG for processing elsewhere, or None if nothing is stacked yet"""
+        with self._stack_lock:
+            if self.stack is None:
+                return None
+            mean = self.stack.mean.copy()
+        ok, png = cv2.imencode(".png", np.clip(mean * 257, 0, 65535).astype(np.uint16))
+        return png.tobytes() if ok else None
+
+    def stats(self):
+        with self._stack_lock:
+            stack = self.stack
+            frames, clipped = (stack.frames, stack.clipped) if stack else (0, 0)
+            reference_stars = len(self.reference) if self.reference is not None else 0
+        with self._lock:
+            return {
+                "clientId": self.client_id,
+                "mode": self.mode,
+                "running": self.running,
+                "frames": frames,
+                "received": self.received,
+                "stacked": self.stacked,
+                "dropped": self.dropped,
+                "rejected": self.rejected,
+                "inFlight": self.in_flight,
+                "clippedPixels": clipped,
+                "referenceStars": reference_stars,
+                "previewHub": self.preview_hub.client_id,
+            }
+
+
+# One stacker per telescope, created when stacking is first started
+stackers = {}
+_stackers_lock = threading.Lock()
+
+
+def get_stacker(client_id):
+    stacker = stackers.get(client_id)
+    if stacker is None:
+        with _stackers_lock:
+            stacker = stackers.get(client_id)
+            if stacker is None:
+                stacker = stackers[client_id] = LiveStacker(client_id)
+    return stacker
@@ -0,0 +1,177 @@
+"""
+Live view fan-out: one hub per telescope, any number of viewers.
+
+handle_liveview_client publishes each frame from a telescope once, on the
+live view event loop. The hub numbers it and hands the same bytes to every
+viewer's queue. Queues are small and drop their oldest frame when a viewer
+falls behind, so a slow viewer never delays the telescope or other viewers,
+and publishing costs one append per viewer whatever the frame size.
+
+Viewers can wait from a Flask thread (get) or from a coroutine on the live
+view loop (get_async), and frames can be published from any thread. Viewers that only ever want the newest picture, like
+MJPEG streams, skip the queue and wait on the hub's frame version instead
+(wait_for_frame): they wake as soon as a newer frame is published, always get
+the newest one and never get the same frame twice.
+
+Listeners (add_listener) are called with every published frame, for stages
+that derive something from the stream such as the transcoder in
+liveViewTranscoder.py. They run on the publishing thread and must not block.
+"""
+
+import asyncio
+import threading
+import time
+from collections import deque, namedtuple
+
+VIEWER_QUEUE_SIZE = 2  # Frames buffered per viewer before the oldest is dropped
+
+Frame = namedtuple("Frame", ["seq", "timestamp", "data", "exposure"], defaults=(None,))
+
+
+class Viewer:
+    def __init__(self, hub, maxsize=VIEWER_QUEUE_SIZE, asynchronous=False):
+        self.hub = hub
+        self.frames = deque(maxlen=maxsize)
+        self.condition = threading.Condition()
+        # Created on the loop the viewer waits on, set through it so put() works from any thread
+        self.loop = asyncio.get_running_loop() if asynchronous else None
+        self.event = asyncio.Event() if asynchronous else None
+        self.dropped = 0
+        self.delivered = 0
+        self.closed = False
+
+    def put(self, frame):
+        """Queue a frame, dropping the oldest if the viewer is behind. Never blocks."""
+        with self.condition:
+            if len(self.frames) == self.frames.maxlen:
+                self.dropped += 1
+            self.frames.append(frame)
+            self.condition.notify()
+        if self.event is not None:
+            self.loop.call_soon_threadsafe(self.event.set)
+
+    def _pop(self):
+        frame = self.frames.popleft()
+        self.delivered += 1
+        return frame
+
+    def get(self, timeout=None):
+        """Next frame, waiting up to timeout seconds from a normal thread; None on timeout or close"""
+        with self.condition:
+            if not self.condition.wait_for(lambda: self.frames or self.closed, timeout) or not self.frames:
+                return None
+            return self._pop()
+
+    async def get_async(self):
+        """Next frame, for coroutines on the live view loop; None once closed"""
+        while True:
+            with self.condition:
+                if self.frames:
+                    return self._pop()
+                if self.closed:
+                    return None
+                self.event.clear()
+            await self.event.wait()
+
+    def close(self):
+        with self.condition:
+            self.closed = True
+            self.condition.notify_all()
+        if self.event is not None:
+            self.loop.call_soon_threadsafe(self.event.set)
+
+
+class LiveViewHub:
+    def __init__(self, client_id):
+        self.client_id = client_id
+        self.seq = 0
+        self.latest = None
+        self.connected = False
+        self.exposure = None  # Seconds, as last reported by the telescope
+        self.viewers = set()
+        self.watchers = 0  # Viewers following wait_for_frame instead of a queue
+        self.listeners = []
+        self._lock = threading.Lock()
+        self._frame_condition = threading.Condition()
+
+    def publish(self, data, seq=None, timestamp=None, exposure=None):
+        """
+        Number a frame from the telescope and hand it to every viewer. Derived streams pass
+        the seq, timestamp and exposure of the frame they were made from.
+        """
+        with self._frame_condition:
+            self.seq = self.seq + 1 if seq is None else seq
+            frame = Frame(self.seq, time.time() if timestamp is None else timestamp, data,
+                          self.exposure if exposure is None else exposure)
+            self.latest = frame
+            self._frame_condition.notify_all()
+        with self._lock:
+            viewers = tuple(self.viewers)
+        for viewer in viewers:
+            viewer.put(frame)
+        for listener in self.listeners:
+            try:
+                listener(frame)
+            except Exception as e:
+                print(f"[LiveView] Listener failed for {self.client_id}: {e}")
+        return frame
+
+    def add_listener(self, listener):
+        """Call listener(frame) for every frame published from now on"""
+        with self._lock:
+            self.listeners = self.listeners + [listener]
+
+    def wait_for_frame(self, after_seq=0, timeout=None):
+        """The latest frame once it is newer than after_seq, or None if none arrives in time"""
+        with self._frame_condition:
+            self._frame_condition.wait_for(lambda: self.latest is not None and self.latest.seq > after_seq, timeout)
+            frame = self.latest
+        return frame if frame is not None and frame.seq > after_seq else None
+
+    def watching(self, change):
+        """Count a viewer that starts (+1) or stops (-1) following wait_for_frame, for stats"""
+        with self._lock:
+            self.watchers += change
+
+    def subscribe(self, maxsize=VIEWER_QUEUE_SIZE, asynchronous=False):
+        """A new viewer, primed with the latest frame so it has a picture straight away"""
+        viewer = Viewer(self, maxsize, asynchronous)
+        if self.latest is not None:
+            viewer.put(self.latest)
+        with self._lock:
+            self.viewers.add(viewer)
+        return viewer
+
+    def unsubscribe(self, viewer):
+        with self._lock:
+            self.viewers.discard(viewer)
+        viewer.close()
+
+    def disconnected(self):
+        """The telescope went away: forget its last frame, viewers stay and wait for it to return"""
+        self.connected = False
+        self.latest = None
+
+    def stats(self):
+        with self._lock:
+            viewers = tuple(self.viewers)
+        return {
+            "clientId": self.client_id,
+            "connected": self.connected,
+            "seq": self.seq,
+            "viewers": len(viewers) + self.watchers,
+            "dropped": sum(viewer.dropped for viewer in viewers),
+        }
+
+
+# One hub per telescope, created by the first frame or viewer
+hubs = {}
+_hubs_lock = threading.Lock()
+
+
+def get_hub(client_id):
+    hub = hubs.get(client_id)
+    if hub is None:
+        with _hubs_lock:
+            hub = hubs.setdefault(client_id, LiveViewHub(client_id))
+    return hub
@@ -0,0 +1,250 @@
+"""
+Rolling live view recording, so an event (a meteor, a focus check) can be
+saved after it has happened.
+
+A Recorder listens to a telescope's hub and copies every frame into the
+current segment file: a fixed-size file mapped into memory, so recording a
+frame is a memory copy on the live view loop rather than a write() call.
+Each frame is stored behind a small header (magic, seq, timestamp, length)
+and its position is kept in an in-memory index. When a segment is full the
+next one is started, and whole segments are deleted once their newest frame
+is older than RECORDING_MINUTES or there are more than RECORDING_MAX_SEGMENTS.
+Recovering old segments, creating the next one ahead of time and deleting
+expired ones all happen on a worker thread, so the live view loop never
+waits on the disk.
+
+The headers make segments self-describing, so the index is rebuilt from the
+files when the server restarts. Clips are exported by copying the stored
+JPEGs back out in order, without decoding or re-encoding them.
+"""
+
+import mmap
+import os
+import re
+import struct
+import threading
+from collections import OrderedDict, deque, namedtuple
+from concurrent.futures import ThreadPoolExecutor
+
+from liveViewHub import get_hub
+from config.liveview import (RECORDING_DIR, RECORDING_MINUTES, RECORDING_SEGMENT_SIZE, RECORDING_MAX_SEGMENTS,
+                             RECORDING_MAX_CLIP)
+
+BASE_DIR = os.path.abspath(os.path.dirname(__file__))
+
+FRAME_MAGIC = b"LVF1"
+FRAME_HEADER = struct.Struct("<4sQdI")  # magic, seq, timestamp, length
+SEGMENT_NAME = re.compile(r"^segment-(\d+)\.bin$")
+
+IndexEntry = namedtuple("IndexEntry", ["seq", "timestamp", "segment", "offset", "length"])
+
+_pool = None
+_pool_lock = threading.Lock()
+
+
+def _get_pool():
+    """One thread for every recorder's file creation and deletion, so they happen in order"""
+    global _pool
+    if _pool is None:
+        with _pool_lock:
+            if _pool is None:
+                _pool = ThreadPoolExecutor(1, thread_name_prefix="liveview-recorder")
+    return _pool
+
+
+class Segment:
+    def __init__(self, path, number, size=RECORDING_SEGMENT_SIZE, create=False):
+        self.path = path
+        self.number = number
+        if create:
+            with open(path, "wb") as f:
+                f.truncate(size)
+        self.file = open(path, "r+b")
+        self.map = mmap.mmap(self.file.fileno(), 0)
+        self.position = 0
+        self.last_timestamp = 0
+
+    def append(self, frame):
+        """Offset of the stored frame, or None if the segment has no room for it"""
+        end = self.position + FRAME_HEADER.size + len(frame.data)
+        if end > len(self.map):
+            return None
+        offset = self.position
+        FRAME_HEADER.pack_into(self.map, offset, FRAME_MAGIC, frame.seq, frame.timestamp, len(frame.data))
+        self.map[offset + FRAME_HEADER.size:end] = frame.data
+        self.position = end
+        self.last_timestamp = frame.timestamp
+        return offset
+
+    def scan(self):
+        """Index entries for the frames already in the file, read from their headers"""
+        entries = []
+        while self.position + FRAME_HEADER.size <= len(self.map):
+            magic, seq, timestamp, length = FRAME_HEADER.unpack_from(self.map, self.position)
+            if magic != FRAME_MAGIC or self.position + FRAME_HEADER.size + length > len(self.map):
+                break
+            entries.append(IndexEntry(seq, timestamp, self.number, self.position, length))
+            self.position += FRAME_HEADER.size + length
+            self.last_timestamp = timestamp
+        return entries
+
+    def read(self, entry):
+        start = entry.offset + FRAME_HEADER.size
+        return self.map[start:start + entry.length]
+
+    def close(self):
+        self.map.close()
+        self.file.close()
+
+    def delete(self):
+        self.close()
+        os.remove(self.path)
+
+
+class Recorder:
+    def __init__(self, client_id, directory=None):
+        self.client_id = client_id
+        self.directory = directory or os.path.join(BASE_DIR, RECORDING_DIR, re.sub(r"[^\w.-]", "_", client_id))
+        self.segments = OrderedDict()  # number -> Segment, oldest first
+        self.index = deque()
+        self.current = None
+        self.spare = None  # The next segment, created ahead of time on the pool
+        self._preparing = True  # Until _load has run, frames are skipped
+        self.next_number = 0
+        self.skipped = 0
+        self._lock = threading.Lock()
+        # Recovery scans every segment left on disk, so it runs on the pool too
+        _get_pool().submit(self._load)
+
+    def _load(self):
+        """Pick up segments left by a previous run, then prepare the first segment for new frames"""
+        segments, index, next_number = OrderedDict(), [], 0
+        try:
+            os.makedirs(self.directory, exist_ok=True)
+            found = sorted((int(match.group(1)), name) for name in os.listdir(self.directory)
+                           if (match := SEGMENT_NAME.match(name)))
+            for number, name in found:
+                segment = Segment(os.path.join(self.directory, name), number)
+                entries = segment.scan()
+                if entries:
+                    segments[number] = segment
+                    index.extend(entries)
+                else:
+                    segment.delete()
+                next_number = number + 1
+        except Exception as e:
+            print(f"[Recorder] {self.client_id}: failed to recover recordings: {e}")
+        if index:
+            print(f"[Recorder] {self.client_id}: recovered {len(index)} frames from {len(segments)} segments")
+        with self._lock:
+            self.segments.update(segments)
+            self.index.extend(index)
+            self.next_number = next_number
+            self._preparing = False
+            self._prepare_segment()
+
+    def _prepare_segment(self):
+        """Have the pool create the next segment file, unless one is ready or on its way"""
+        if self.spare is None and not self._preparing:
+            self._preparing = True
+            number = self.next_number
+            self.next_number += 1
+            _get_pool().submit(self._create_segment, number)
+
+    def _create_segment(self, number):
+        try:
+            segment = Segment(os.path.join(self.directory, f"segment-{number}.bin"), number, create=True)
+        except Exception as e:
+            print(f"[Recorder] {self.client_id}: failed to create segment {number}: {e}")
+            segment = None
+        with self._lock:
+            self.spare = segment
+            self._preparing = False
+
+    def _start_segment(self):
+        """Switch to the spare segment, False if it is not ready yet"""
+        if self.spare is None:
+            self._prepare_segment()
+            return False
+        self.current, self.spare = self.spare, None
+        self.segments[self.current.number] = self.current
+        while len(self.segments) > RECORDING_MAX_SEGMENTS:
+            self._drop_oldest()
+        self._prepare_segment()
+        return True
+
+    def _drop_oldest(self):
+        number, segment = self.segments.popitem(last=False)
+        while self.index and self.index[0].segment == number:
+            self.index.popleft()
+        # Readers look segments up under the lock, so none can still be using it
+        _get_pool().submit(self._delete_segment, segment)
+
+    def _delete_segment(self, segment):
+        try:
+            segment.delete()
+        except OSError as e:
+            print(f"[Recorder] {self.client_id}: failed to delete segment {segment.number}: {e}")
+
+    def record(self, frame):
+        """Hub listener: store one frame, called on the live view loop"""
+        if FRAME_HEADER.size + len(frame.data) > RECORDING_SEGMENT_SIZE:
+            self.skipped += 1
+            return
+        with self._lock:
+            offset = self.current.append(frame) if self.current else None
+            if offset is None:
+                if not self._start_segment():
+                    self.skipped += 1  # The next segment is still being created
+                    return
+                offset = self.current.append(frame)
+            self.index.append(IndexEntry(frame.seq, frame.timestamp, self.current.number, offset, len(frame.data)))
+            expired = frame.timestamp - RECORDING_MINUTES * 60
+            while len(self.segments) > 1 and next(iter(self.segments.values())).last_timestamp < expired:
+                self._drop_oldest()
+
+    def frames(self, start, end):
+        """(seq, timestamp, jpeg) for every recorded frame between two timestamps, oldest first"""
+        with self._lock:
+            entries = [entry for entry in self.index if start <= entry.timestamp <= end]
+        for entry in entries:
+            with self._lock:  # The segment may have been dropped since the index was read
+                segment = self.segments.get(entry.segment)
+                data = segment.read(entry) if segment else None
+            if data is not None:
+                yield entry.seq, entry.timestamp, data
+
+    def clip(self, start, end):
+        """An MJPEG clip (JPEGs back to back, as ffmpeg and VLC read them) of a time range"""
+        end = min(end, start + RECORDING_MAX_CLIP)
+        for _, _, data in self.frames(start, end):
+            yield data
+
+    def stats(self):
+        with self._lock:
+            oldest = self.index[0].timestamp if self.index else None
+            newest = self.index[-1].timestamp if self.index else None
+            return {
+                "clientId": self.client_id,
+                "frames": len(self.index),
+                "segments": len(self.segments),
+                "oldest": oldest,
+                "newest": newest,
+                "skipped": self.skipped,
+            }
+
+
+# One recorder per telescope, started when its live view connects (config LIVEVIEW_RECORDING)
+recorders = {}
+_recorders_lock = threading.Lock()
+
+
+def get_recorder(client_id):
+    recorder = recorders.get(client_id)
+    if recorder is None:
+        with _recorders_lock:
+            recorder = recorders.get(client_id)
+            if recorder is None:
+                recorder = recorders[client_id] = Recorder(client_id)
+                get_hub(client_id).add_listener(recorder.record)
+    return recorder
@@ -0,0 +1,63 @@
+"""
+Optional on-disk copies of each telescope's latest live view frame.
+
+Snapshots are served from the hub's memory (/liveview/<client_id>/snapshot),
+so nothing on the streaming path touches the disk. For tools that expect a
+file, SnapshotWriter wakes every SNAPSHOT_PERSIST_INTERVAL seconds on its own
+thread and writes <client_id>_latest.jpg for each telescope whose latest
+frame has changed since it last wrote one, replacing the file atomically so
+readers never see half a frame.
+"""
+
+import os
+import tempfile
+import threading
+
+from liveViewHub import hubs
+from config.liveview import SNAPSHOT_DIR, SNAPSHOT_PERSIST_INTERVAL
+
+
+class SnapshotWriter:
+    def __init__(self, directory=None, interval=SNAPSHOT_PERSIST_INTERVAL):
+        self.directory = directory or SNAPSHOT_DIR or tempfile.gettempdir()
+        self.interval = interval
+        self.written = {}  # client_id -> seq of the frame on disk
+        self._stop = threading.Event()
+        self._thread = None
+
+    def path(self, client_id):
+        return os.path.join(self.directory, f"{client_id}_latest.jpg")
+
+    def write_changed(self):
+        """Write every telescope's latest frame that is not on disk yet; returns how many were written"""
+        count = 0
+        for client_id, hub in list(hubs.items()):
+            frame = hub.latest
+            if frame is None or self.written.get(client_id) == frame.seq:
+                continue
+            path = self.path(client_id)
+            try:
+                with open(path + ".tmp", "wb") as f:
+                    f.write(frame.data)
+                os.replace(path + ".tmp", path)
+                self.written[client_id] = frame.seq
+                count += 1
+            except OSError as e:
+                print(f"[Snapshot] Failed to save frame for {client_id}: {e}")
+        return count
+
+    def _run(self):
+        while not self._stop.wait(self.interval):
+            self.write_changed()
+
+    def start(self):
+        if self._thread is None:
+            self._thread = threading.Thread(target=self._run, name="liveview-snapshots", daemon=True)
+            self._thread.start()
+            print(f"[Snapshot] Saving live view frames to {self.directory} every {self.interval}s")
+
+    def stop(self):
+        self._stop.set()
+
+
+snapshot_writer = SnapshotWriter()
@@ -0,0 +1,182 @@
+"""
+Optional reduced-quality live view tiers for viewers on slow connections.
+
+Telescopes send full-size JPEGs, which can saturate a remote viewer's link.
+A Transcoder listens to one telescope's hub and, for every tier in
+config/liveview.py that has viewers, scales the frame down and re-encodes it
+in a small shared thread pool. Each tier has its own LiveViewHub, so a tier is
+encoded once per frame whatever the number of viewers on it, and those
+viewers wait on it exactly as they would on the telescope's own hub. Tier
+frames keep the sequence number, timestamp and exposure of their source frame,
+so a viewer can move between tiers without repeating a frame.
+
+Each telescope has at most one frame being transcoded. Frames that arrive
+meanwhile replace each other and only the newest is encoded next, so a slow
+encode delays the small tiers instead of building up a backlog.
+
+AdaptiveTier picks a tier for one viewer from how quickly it takes its
+frames (?tier=auto on /liveview/<client_id>).
+"""
+
+import threading
+import time
+from concurrent.futures import ThreadPoolExecutor
+
+from liveViewHub import LiveViewHub, get_hub
+from config.liveview import (LIVEVIEW_TIERS, LIVEVIEW_TRANSCODING, TRANSCODE_WORKERS, ADAPTIVE_START_TIER,
+                             ADAPTIVE_SLOW_FRACTION, ADAPTIVE_FAST_FRACTION, ADAPTIVE_DOWN_AFTER, ADAPTIVE_UP_AFTER)
+
+try:
+    import cv2
+    import numpy as np
+except ImportError:  # Optional, viewers fall back to full frames
+    cv2 = None
+
+FULL_TIER = "full"
+TIER_ORDER = [FULL_TIER] + list(LIVEVIEW_TIERS)  # Best first
+
+_pool = None
+_pool_lock = threading.Lock()
+
+
+def transcoding_available():
+    return LIVEVIEW_TRANSCODING and cv2 is not None
+
+
+def _get_pool():
+    global _pool
+    if _pool is None:
+        with _pool_lock:
+            if _pool is None:
+                _pool = ThreadPoolExecutor(TRANSCODE_WORKERS, thread_name_prefix="liveview-transcode")
+    return _pool
+
+
+def encode_tier(image, tier):
+    """JPEG bytes for a decoded frame scaled down to a tier's width"""
+    height, width = image.shape[:2]
+    if width > tier["width"]:
+        size = (tier["width"], max(1, round(height * tier["width"] / width)))
+        image = cv2.resize(image, size, interpolation=cv2.INTER_AREA)
+    ok, jpeg = cv2.imencode(".jpg", image, [cv2.IMWRITE_JPEG_QUALITY, tier["quality"]])
+    if not ok:
+        raise ValueError("JPEG encoding failed")
+    return jpeg.tobytes()
+
+
+class Transcoder:
+    def __init__(self, source):
+        self.source = source
+        self.tiers = {name: LiveViewHub(f"{source.client_id}/{name}") for name in LIVEVIEW_TIERS}
+        self.last_encoded = dict.fromkeys(LIVEVIEW_TIERS, 0)
+        self.pending = None
+        self.busy = False
+        self.encoded = 0
+        self.skipped = 0
+        self._lock = threading.Lock()
+        source.add_listener(self.frame_published)
+
+    def hub(self, tier):
+        """The hub to watch for a tier; 'full' is the telescope's own"""
+        return self.source if tier == FULL_TIER else self.tiers[tier]
+
+    def _watched(self):
+        return any(hub.viewers or hub.watchers for hub in self.tiers.values())
+
+    def frame_published(self, frame):
+        """Called by the source hub on the live view loop, so it only hands the frame on"""
+        if not self._watched():
+            return
+        with self._lock:
+            if self.busy:
+                if self.pending is not None:
+                    self.skipped += 1
+                self.pending = frame
+                return
+            self.busy = True
+        _get_pool().submit(self._run, frame)
+
+    def _run(self, frame):
+        while frame is not None:
+            try:
+                self.transcode(frame)
+            except Exception as e:
+                print(f"[Transcode] Failed to transcode frame {frame.seq} for {self.source.client_id}: {e}")
+            with self._lock:
+                frame, self.pending = self.pending, None
+                if frame is None:
+                    self.busy = False
+
+    def transcode(self, frame):
+        """Encode a frame for every tier that is watched and due, decoding it only once"""
+        now = time.time()
+        due = [name for name, hub in self.tiers.items()
+               if (hub.viewers or hub.watchers) and now - self.last_encoded[name] >= 1 / LIVEVIEW_TIERS[name]["fps"]]
+        if not due:
+            return
+        image = cv2.imdecode(np.frombuffer(frame.data, np.uint8), cv2.IMREAD_COLOR)
+        if image is None:
+            raise ValueError("not a JPEG image")
+        for name in due:
+            data = encode_tier(image, LIVEVIEW_TIERS[name])
+            self.tiers[name].publish(data, seq=frame.seq, timestamp=frame.timestamp, exposure=frame.exposure)
+            self.last_encoded[name] = now
+        self.encoded += 1
+
+    def stats(self):
+        tiers = {}
+        for name, hub in self.tiers.items():
+            latest = hub.latest
+            tiers[name] = dict(hub.stats(), bytes=len(latest.data) if latest else 0)
+        return {"encoded": self.encoded, "skipped": self.skipped, "tiers": tiers}
+
+
+class AdaptiveTier:
+    """
+    Tier choice for one viewer. After each frame the caller reports how long it took to
+    write and how long the telescope took to produce it; a viewer that keeps taking longer
+    than its share drops a tier, one that keeps keeping up easily tries the next one up.
+    """
+
+    def __init__(self, tier=ADAPTIVE_START_TIER):
+        self.index = TIER_ORDER.index(tier)
+        self.slow = 0
+        self.fast = 0
+
+    @property
+    def tier(self):
+        return TIER_ORDER[self.index]
+
+    def sent(self, write_seconds, frame_interval):
+        """Record one delivered frame and return the tier to use for the next one"""
+        if frame_interval <= 0:
+            return self.tier
+        if write_seconds > frame_interval * ADAPTIVE_SLOW_FRACTION:
+            self.slow, self.fast = self.slow + 1, 0
+        elif write_seconds < frame_interval * ADAPTIVE_FAST_FRACTION:
+            self.slow, self.fast = 0, self.fast + 1
+        else:
+            self.slow = self.fast = 0
+
+        if self.slow >= ADAPTIVE_DOWN_AFTER and self.index < len(TIER_ORDER) - 1:
+            self.index += 1
+            self.slow = 0
+        elif self.fast >= ADAPTIVE_UP_AFTER and self.index > 0:
+            self.index -= 1
+            self.fast = 0
+        return self.tier
+
+
+# One transcoder per telescope, created by the first viewer of a reduced tier
+transcoders = {}
+_transcoders_lock = threading.Lock()
+
+
+def get_transcoder(client_id):
+    transcoder = transcoders.get(client_id)
+    if transcoder is None:
+        with _transcoders_lock:
+            transcoder = transcoders.get(client_id)
+            if transcoder is None:
+                transcoder = transcoders[client_id] = Transcoder(get_hub(client_id))
+    return transcoder
@@ -0,0 +1,255 @@
+"""
+In-memory search index over every catalogue designation and common name.
+
+Used for typeahead and for resolving object names without a table probe per
+name. Prefix lookups bisect a sorted key list (the flat equivalent of a trie),
+and the best matches for short, very common prefixes such as "h" or "ngc" are
+precomputed so they never scan thousands of rows. Typos are handled by a
+trigram index over the named deep-sky objects.
+"""
+
+import bisect
+import re
+import threading
+import time
+
+# Keep the per-query work bounded so lookups stay in the low milliseconds
+SCAN_LIMIT = 512  # Prefix ranges larger than this use the precomputed top matches
+PRECOMPUTED_PREFIX_LENGTH = 4
+TOP_MATCHES = 20
+MAX_TRIGRAM_POSTINGS = 2000  # Trigrams shared by more entries than this are ignored
+MIN_FUZZY_SCORE = 0.35
+
+PLANET_NAMES = ["sun", "moon", "mercury", "venus", "mars", "jupiter", "saturn", "uranus", "neptune"]
+
+
+def normalizeKey(text):
+    """Lowercase and drop spaces/punctuation/zero padding so "NGC 224", "ngc224" and "NGC0224" match"""
+    key = re.sub(r"[^a-z0-9]", "", str(text).lower())
+    return re.sub(r"^([a-z]+)0+(?=\d)", r"\1", key)
+
+
+def getTrigrams(text):
+    padded = f"  {text} "
+    return {padded[i:i + 3] for i in range(len(padded) - 2)}
+
+
+def splitCommonNames(value):
+    if not value:
+        return []
+    return [name.strip() for name in str(value).split(",") if name.strip()]
+
+
+class CatalogIndex:
+    def __init__(self):
+        self.entries = []  # entry id -> dict describing the object an alias points to
+        self.keys = []  # sorted normalised aliases
+        self.key_entries = []  # entry id for each key in self.keys
+        self.exact = {}  # normalised alias -> [entry id]
+        self.top_by_prefix = {}
+        self.trigrams = {}  # trigram -> [entry id]
+        self.entry_trigrams = {}
+        self.built_at = None
+        self._lock = threading.Lock()
+
+    # Building
+
+    @staticmethod
+    def _rank(entry):
+        """Lower sorts first: brighter objects, then shorter names"""
+        mag = entry.get("mag")
+        try:
+            mag = float(mag)
+        except (TypeError, ValueError):
+            mag = 99.0
+        return (mag, len(entry["key"]))
+
+    def _addAlias(self, pairs, alias, obj, fuzzy):
+        key = normalizeKey(alias)
+        if not key:
+            return
+        entry = dict(obj, alias=alias, key=key)
+        entry_id = len(self.entries)
+        self.entries.append(entry)
+        pairs.append((key, entry_id))
+        if fuzzy:
+            self.entry_trigrams[entry_id] = getTrigrams(alias.lower())
+
+    def _loadCrossIds(self):
+        """Yield (aliases, object) from the prebuilt cross-identification table"""
+        from db import db
+        from models.tables import CrossIdTable
+
+        groups = {}
+        for row in db.session.query(CrossIdTable).order_by(CrossIdTable.id).all():
+            if row.canonicalId not in groups:
+                groups[row.canonicalId] = ([], {
+                    "name": row.canonicalId,
+                    "table": row.sourceTable,
+                    "ra": row.RA,
+                    "dec": row.DEC,
+                    "mag": row.VMag,
+                    "type": "star"
+                })
+            groups[row.canonicalId][0].append(row.displayName)
+        return groups.values()
+
+    def _loadObjects(self):
+        """Yield (aliases, object) for every catalogue row and planet"""
+        from models.tables import CrossIdTable, HDSTARtable, IndexTable, NGCtable, fetch_all
+
+        if CrossIdTable.has_entries():
+            yield from self._loadCrossIds()
+            tables = []
+        else:
+            tables = [HDSTARtable, IndexTable, NGCtable]
+
+        for table in tables:
+            for data in fetch_all(table.__table__):
+                name = data.get("Name")
+                if not name:
+                    continue
+                aliases = [name]
+                if data.get("Messier"):
+                    aliases.append(data["Messier"])
+                aliases.extend(splitCommonNames(data.get("Common names")))
+                yield aliases, {
+                    "name": name,
+                    "table": table.__tablename__,
+                    "ra": data.get("RA"),
+                    "dec": data.get("DEC", data.get("Dec")),
+                    "mag": data.get("V-Mag"),
+                    "type": "star"
+                }
+
+        for planet in PLANET_NAMES:
+            yield [planet.capitalize()], {"name": planet.capitalize(), "table": None, "ra": None, "dec": None, "mag": None, "type": "planet"}
+
+    def build(self, objects=None):
+        """Build the index from (aliases, object) pairs, reading the catalogue tables if none are given"""
+        start = time.time()
+        self.entries, self.exact, self.top_by_prefix, self.trigrams, self.entry_trigrams = [], {}, {}, {}, {}
+        pairs = []
+
+        for aliases, obj in (objects if objects is not None else self._loadObjects()):
+            for position, alias in enumerate(aliases):
+                # HD numbers are not worth typo matching, names and other designations are
+                fuzzy = obj.get("table") != "HDSTARTable" or position > 0
+                self._addAlias(pairs, alias, obj, fuzzy)
+
+        pairs.sort()
+        self.keys = [key for key, _ in pairs]
+        self.key_entries = [entry_id for _, entry_id in pairs]
+        for key, entry_id in pairs:
+            self.exact.setdefault(key, []).append(entry_id)
+
+        # Best matches for short prefixes, which can cover most of the catalogue
+        by_prefix = {}
+        for key, entry_id in pairs:
+            for length in range(1, min(len(key), PRECOMPUTED_PREFIX_LENGTH) + 1):
+                by_prefix.setdefault(key[:length], []).append(entry_id)
+        for prefix, entry_ids in by_prefix.items():
+            if len(entry_ids) > SCAN_LIMIT:
+                self.top_by_prefix[prefix] = sorted(entry_ids, key=lambda i: self._rank(self.entries[i]))[:TOP_MATCHES]
+
+        for entry_id, trigrams in self.entry_trigrams.items():
+            for trigram in trigrams:
+                self.trigrams.setdefault(trigram, []).append(entry_id)
+
+        self.built_at = time.time()
+        print(f"[CatalogIndex] Indexed {len(self.keys)} names in {self.built_at - start:.2f}s")
+        return self
+
+    def ensureBuilt(self):
+        if self.built_at is None:
+            with self._lock:
+                if self.built_at is None:
+                    self.build()
+        return self
+
+    # Lookups
+
+    def _prefixMatches(self, key):
+        lo = bisect.bisect_left(self.keys, key)
+        hi = bisect.bisect_left(self.keys, key + "\x7f", lo)
+        if hi - lo <= SCAN_LIMIT:
+            return sorted(self.key_entries[lo:hi], key=lambda i: self._rank(self.entries[i]))
+        cached = self.top_by_prefix.get(key)
+        if cached is None:
+            # Long but common prefix (e.g. "hd12"): rank once and remember it. The ranking is done
+            # outside the lock; if two requests race, the first one stored is kept.
+            ranked = sorted(self.key_entries[lo:hi], key=lambda i: self._rank(self.entries[i]))[:TOP_MATCHES]
+            with self._lock:
+                cached = self.top_by_prefix.setdefault(key, ranked)
+        return cached
+
+    def _fuzzyMatches(self, text, limit):
+        query = getTrigrams(text.lower())
+        counts = {}
+        for trigram in query:
+            posting = self.trigrams.get(trigram, ())
+            if len(posting) > MAX_TRIGRAM_POSTINGS:
+                continue
+            for entry_id in posting:
+                counts[entry_id] = counts.get(entry_id, 0) + 1
+
+        scored = []
+        for entry_id, shared in counts.items():
+            score = 2 * shared / (len(query) + len(self.entry_trigrams[entry_id]))
+            if score >= MIN_FUZZY_SCORE:
+                scored.append((score, entry_id))
+        scored.sort(key=lambda item: (-item[0], self._rank(self.entries[item[1]])))
+        return scored[:limit]
+
+    def lookup(self, name):
+        """Exact (normalised) alias lookup, returns the matching object or None"""
+        entry_ids = self.ensureBuilt().exact.get(normalizeKey(name))
+        if not entry_ids:
+            return None
+        return self._format(entry_ids[0], 1.0)
+
+    def search(self, text, limit=10):
+        """Ranked results: exact alias, then prefix matches, then trigram matches"""
+        self.ensureBuilt()
+        key = normalizeKey(text)
+        if not key:
+            return []
+
+        results, seen = [], set()
+
+        def add(entry_id, score):
+            entry = self.entries[entry_id]
+            identity = (entry["table"], entry["name"])
+            if identity not in seen:
+                seen.add(identity)
+                results.append(self._format(entry_id, score))
+
+        for entry_id in self.exact.get(key, []):
+            add(entry_id, 1.0)
+        for entry_id in self._prefixMatches(key):
+            if len(results) >= limit:
+                break
+            add(entry_id, round(len(key) / len(self.entries[entry_id]["key"]), 3))
+        if len(results) < limit and len(key) >= 3:
+            for score, entry_id in self._fuzzyMatches(text, limit):
+                if len(results) >= limit:
+                    break
+                add(entry_id, round(score * 0.5, 3))  # Typo matches rank below real prefixes
+        return results[:limit]
+
+    def _format(self, entry_id, score):
+        entry = self.entries[entry_id]
+        return {
+            "name": entry["name"],
+            "match": entry["alias"],
+            "table": entry["table"],
+            "ra": entry["ra"],
+            "dec": entry["dec"],
+            "mag": entry["mag"],
+            "type": entry["type"],
+            "score": score
+        }
+
+
+# Global catalogue index, built on first use
+catalog_index = CatalogIndex()
@@ -0,0 +1,175 @@
+"""
+Cached schema snapshot for the reflected tables in models/tables.py.
+
+Reflecting every table on import meant importing Server (and starting the
+whole app) just to import a model. Instead, the column layout of the
+reflected tables is written once to schema_snapshot.json and the models are
+built from that file without touching the database. The live database is
+compared against the snapshot lazily, on the first request, so drift is
+reported without slowing down imports.
+
+The catalogue tables are read from Catalog.db when the catalogue has been
+split out of Data.db (utility/splitCatalog.py), and the schema version is the
+catalogue's. Regenerate after changing the database schema (e.g.
+utility/migrateCatalog.py):
+
+    python -m models.schemaSnapshot [path/to/Data.db] [path/to/Catalog.db]
+"""
+
+import os
+import sqlite3
+import sys
+import threading
+import time
+
+import ujson as json
+from sqlalchemy import Table, Column, Integer, Boolean, String, REAL
+
+SNAPSHOT_FORMAT = 1
+SNAPSHOT_PATH = os.path.join(os.path.dirname(__file__), 'schema_snapshot.json')
+DATABASE_PATH = os.path.join(os.path.dirname(__file__), '..', 'Data.db')
+CATALOG_PATH = os.path.join(os.path.dirname(__file__), '..', 'Catalog.db')
+
+# Tables whose models are reflected rather than declared
+CATALOG_TABLES = ['HDSTARTable', 'IndexTable', 'NGCtable', 'PlanetsTable']
+REFLECTED_TABLES = CATALOG_TABLES + ['telescopes']
+
+_snapshot = None
+_snapshot_loaded = False
+_verified = False
+_verify_lock = threading.Lock()
+
+
+def _column_type(declared_type):
+    """Map an SQLite declared type to a SQLAlchemy type using SQLite's affinity rules"""
+    declared = (declared_type or '').upper()
+    if 'INT' in declared:
+        return Integer
+    if 'BOOL' in declared:
+        return Boolean
+    if any(name in declared for name in ('REAL', 'FLOA', 'DOUB', 'NUMERIC', 'DECIMAL')):
+        return REAL
+    return String
+
+
+def read_schema(connection, catalog_connection=None):
+    """Describe the reflected tables of open sqlite3 connections, reading the catalogue
+    tables and schema version from catalog_connection when the catalogue is separate"""
+    catalog_connection = catalog_connection or connection
+    tables = {}
+    for table in REFLECTED_TABLES:
+        source = catalog_connection if table in CATALOG_TABLES else connection
+        columns = source.execute(f'PRAGMA table_info("{table}")').fetchall()
+        if columns:
+            tables[table] = [
+                {'name': name, 'type': declared_type, 'notnull': bool(notnull), 'pk': pk}
+                for _, name, declared_type, notnull, _, pk in columns
+            ]
+    return {
+        'format': SNAPSHOT_FORMAT,
+        'schema_version': catalog_connection.execute('PRAGMA user_version').fetchone()[0],
+        'tables': tables
+    }
+
+
+def generate(database_path=DATABASE_PATH, catalog_path=CATALOG_PATH, snapshot_path=SNAPSHOT_PATH):
+    """Write a snapshot of the live database schema"""
+    connection = sqlite3.connect(os.path.abspath(database_path))
+    catalog_connection = None
+    if catalog_path and os.path.exists(catalog_path):
+        catalog_connection = sqlite3.connect(f'file:{os.path.abspath(catalog_path)}?mode=ro', uri=True)
+    try:
+        snapshot = read_schema(connection, catalog_connection)
+    finally:
+        connection.close()
+        if catalog_connection is not None:
+            catalog_connection.close()
+    snapshot['generated'] = int(time.time())
+    with open(snapshot_path, 'w') as f:
+        f.write(json.dumps(snapshot, indent=2))
+    return snapshot
+
+
+def load():
+    """The snapshot, or None if it has not been generated (models then fall back to reflection)"""
+    global _snapshot, _snapshot_loaded
+    if not _snapshot_loaded:
+        _snapshot_loaded = True
+        try:
+            with open(SNAPSHOT_PATH) as f:
+                snapshot = json.loads(f.read())
+            if snapshot.get('format') == SNAPSHOT_FORMAT:
+                _snapshot = snapshot
+            else:
+                print(f"[Schema] Ignoring snapshot with unsupported format {snapshot.get('format')}")
+        except FileNotFoundError:
+            print("[Schema] No schema snapshot, reflecting tables from the database")
+        except ValueError as e:
+            print(f"[Schema] Could not read schema snapshot: {e}")
+    return _snapshot
+
+
+def build_table(table_name, metadata):
+    """Build a Table from the snapshot, or return None if the table is not in it"""
+    snapshot = load()
+    if not snapshot or table_name not in snapshot['tables']:
+        return None
+    columns = [
+        Column(column['name'], _column_type(column['type']), primary_key=bool(column['pk']), nullable=not column['notnull'])
+        for column in snapshot['tables'][table_name]
+    ]
+    return Table(table_name, metadata, *columns, extend_existing=True)
+
+
+def verify(connection, catalog_connection=None):
+    """Compare the live schema with the snapshot and return a list of differences"""
+    snapshot = load()
+    if not snapshot:
+        return []
+    live = read_schema(connection, catalog_connection)
+    problems = []
+    if live['schema_version'] != snapshot['schema_version']:
+        problems.append(f"schema version is {live['schema_version']}, snapshot has {snapshot['schema_version']}")
+    for table, columns in snapshot['tables'].items():
+        live_columns = {column['name']: column for column in live['tables'].get(table, [])}
+        if not live_columns:
+            problems.append(f"table {table} is missing")
+            continue
+        for column in columns:
+            live_column = live_columns.get(column['name'])
+            if live_column is None:
+                problems.append(f"{table}.{column['name']} is missing")
+            elif _column_type(live_column['type']) is not _column_type(column['type']):
+                problems.append(f"{table}.{column['name']} is {live_column['type']}, snapshot has {column['type']}")
+    return problems
+
+
+def verify_once(engine, catalog_engine=None):
+    """Check the snapshot against the live databases the first time it is called"""
+    global _verified
+    if _verified or not load():
+        return
+    with _verify_lock:
+        if _verified:
+            return
+        _verified = True
+        raw = engine.raw_connection()
+        catalog_raw = catalog_engine.raw_connection() if catalog_engine is not None else None
+        try:
+            problems = verify(raw.driver_connection, catalog_raw.driver_connection if catalog_raw else None)
+        finally:
+            raw.close()
+            if catalog_raw is not None:
+                catalog_raw.close()
+        for problem in problems:
+            print(f"[Schema] Snapshot out of date: {problem}")
+        if problems:
+            print("[Schema] Regenerate it with: python -m models.schemaSnapshot")
+
+
+if __name__ == '__main__':
+    snapshot = generate(
+        sys.argv[1] if len(sys.argv) > 1 else DATABASE_PATH,
+        sys.argv[2] if len(sys.argv) > 2 else CATALOG_PATH
+    )
+    print(f"Wrote {SNAPSHOT_PATH}: {len(snapshot['tables'])} tables, schema version {snapshot['schema_version']}")
@@ -1,5 +1,72 @@
 from db import db
-from sqlalchemy import Table, MetaData, Column, String, REAL
+from sqlalchemy import Table, MetaData, Column, String, REAL, select, bindparam
+from models import schemaSnapshot
+
+# Bind key for the read-only catalogue database (see SQLALCHEMY_BINDS in Server.py)
+CATALOG_BIND = 'catalog'
+
+# Keys per IN (...) query, comfortably under SQLite's bound parameter limit
+MAX_KEYS_PER_QUERY = 500
+
+# Row lookups are built once per (table, column, kind) and reused, so repeated
+# lookups skip building the statement and hit SQLAlchemy's compiled cache
+_statements = {}
+
+
+def get_statement(table, column, many=False, collation=None):
+    key = (table, column, many, collation)
+    statement = _statements.get(key)
+    if statement is None:
+        target = table.c[column]
+        if collation:
+            target = target.collate(collation)
+        if many:
+            statement = select(table).where(target.in_(bindparam('values', expanding=True)))
+        else:
+            statement = select(table).where(target == bindparam('value')).limit(1)
+        _statements[key] = statement
+    return statement
+
+
+def get_bind_arguments(table):
+    # Core statements are not routed by bind key the way ORM queries are, so
+    # send them to the table's engine explicitly
+    return {'bind': db.engines[table.metadata.info.get('bind_key')]}
+
+
+def fetch_row(table, column, value, collation=None):
+    """
+    First row of table where column == value, as a plain dict (no ORM object is built)
+    """
+    statement = get_statement(table, column, collation=collation)
+    row = db.session.execute(statement, {'value': value}, bind_arguments=get_bind_arguments(table)).mappings().first()
+    return dict(row) if row else None
+
+
+def fetch_rows(table, column, values, collation=None):
+    """
+    Bulk lookup: {value: row dict} for every value that matches, using one IN (...) query per
+    MAX_KEYS_PER_QUERY values. NOCASE lookups are keyed by the lowercased value.
+    """
+    normalize = str.lower if collation == 'NOCASE' else (lambda value: value)
+    values = list(dict.fromkeys(value for value in values if value is not None))
+    statement = get_statement(table, column, many=True, collation=collation)
+    bind_arguments = get_bind_arguments(table)
+    rows = {}
+    for start in range(0, len(values), MAX_KEYS_PER_QUERY):
+        chunk = values[start:start + MAX_KEYS_PER_QUERY]
+        for row in db.session.execute(statement, {'values': chunk}, bind_arguments=bind_arguments).mappings():
+            key = row[column]
+            if key is not None:
+                rows.setdefault(normalize(key), dict(row))
+    return rows
+
+
+def fetch_all(table):
+    statement = _statements.get((table, None, True, None))
+    if statement is None:
+        statement = _statements[(table, None, True, None)] = select(table)
+    return [dict(row) for row in db.session.execute(statement, bind_arguments=get_bind_arguments(table)).mappings()]
 
 def get_app():
     from Server import app
@@ -14,11 +81,35 @@ class BaseTable(db.Model):
     def get_all_fields(cls):
         return {column.name: getattr(cls, column.name) for column in cls.__table__.columns}
 
+    @classmethod
+    def query_by_names(cls, names):
+        """
+        Look up many catalogue names in one go, returns {name: row dict} for the ones found
+        """
+        return fetch_rows(cls.__table__, 'Name', names)
+
+    @classmethod
+    def get_metadata(cls):
+        # Tables on another bind need a MetaData tagged with that bind key so the
+        # session sends their queries to the right engine
+        bind_key = getattr(cls, '__bind_key__', None)
+        if bind_key is None:
+            return db.metadata
+        return db.metadatas.setdefault(bind_key, MetaData(info={'bind_key': bind_key}))
+
     @classmethod
     def reflect_table(cls):
+        # Build from the cached schema snapshot when there is one, so importing a
+        # model does not need the app or a database connection
+        table = schemaSnapshot.build_table(cls.__tablename__, cls.get_metadata())
+        if table is not None:
+            cls.__table__ = table
+            return
+
         app = get_app()  # Get app inside the function
         with app.app_context():
-            cls.__table__ = Table(cls.__tablename__, db.metadata, autoload_with=db.engine)
+            engine = db.engines[getattr(cls, '__bind_key__', None)]
+            cls.__table__ = Table(cls.__tablename__, cls.get_metadata(), autoload_with=engine)
 
 
     @classmethod
@@ -30,49 +121,34 @@ class BaseTable(db.Model):
 # HDSTARtable: Define columns dynamically using reflection
 class HDSTARtable(BaseTable):
     __tablename__ = 'HDSTARTable'  # The actual table name in the database
+    __bind_key__ = CATALOG_BIND
 
     @staticmethod
     def query_by_name(name):
         print(f"Querying HDSTARtable for name: {name}")
-        result = db.session.query(HDSTARtable).filter_by(Name=name).first()
-        if result:
-            if isinstance(result, dict):
-                return result
-            result_data = {column: getattr(result, column) for column in result.__table__.columns.keys()}
-            return result_data
-        return None
+        return fetch_row(HDSTARtable.__table__, 'Name', name)
 
 
 # IndexTable: Define columns dynamically using reflection
 class IndexTable(BaseTable):
     __tablename__ = 'IndexTable'
+    __bind_key__ = CATALOG_BIND
 
     @staticmethod
     def query_by_name(name):
         print(f"Querying IndexTable for name: {name}")
-        result = db.session.query(IndexTable).filter_by(Name=name).first()
-        if result:
-            if isinstance(result, dict):
-                return result
-            result_data = {column: getattr(result, column) for column in result.__table__.columns.keys()}
-            return result_data
-        return None
+        return fetch_row(IndexTable.__table__, 'Name', name)
 
 
 # NGCtable: Define columns dynamically using reflection
 class NGCtable(BaseTable):
     __tablename__ = 'NGCtable'
+    __bind_key__ = CATALOG_BIND
 
     @staticmethod
     def query_by_name(name):
         print(f"Querying NGCtable for name: {name}")
-        result = db.session.query(NGCtable).filter_by(Name=name).first()
-        if result:
-            if isinstance(result, dict):
-                return result
-            result_data = {column: getattr(result, column) for column in result.__table__.columns.keys()}
-            return result_data
-        return None
+        return fetch_row(NGCtable.__table__, 'Name', name)
 
     @staticmethod
     def query_by_messier(messier_designation):
@@ -80,13 +156,7 @@ class NGCtable(BaseTable):
         Query NGCtable by Messier designation (e.g., 'M1', 'M31', 'M104')
         """
         print(f"Querying NGCtable for Messier: {messier_designation}")
-        result = db.session.query(NGCtable).filter_by(Messier=messier_designation).first()
-        if result:
-            if isinstance(result, dict):
-                return result
-            result_data = {column: getattr(result, column) for column in result.__table__.columns.keys()}
-            return result_data
-        return None
+        return fetch_row(NGCtable.__table__, 'Messier', messier_designation)
 
     @staticmethod
     def query_by_common_name(common_name):
@@ -94,32 +164,20 @@ class NGCtable(BaseTable):
         Query NGCtable by common name using case-insensitive exact matching
         """
         print(f"Querying NGCtable for common name: {common_name}")
-        # Use ilike for case-insensitive exact matching
-        result = db.session.query(NGCtable).filter(
-            NGCtable.__table__.c['Common names'].ilike(common_name)
-        ).first()
-        if result:
-            if isinstance(result, dict):
-                return result
-            result_data = {column: getattr(result, column) for column in result.__table__.columns.keys()}
-            return result_data
-        return None
+        # NOCASE equality is case-insensitive and, unlike ilike, can use the
+        # "Common names" COLLATE NOCASE index created by utility/migrateCatalog.py
+        return fetch_row(NGCtable.__table__, 'Common names', common_name, collation='NOCASE')
 
 
 # PlanetsTable: Define columns dynamically using reflection
 class PlanetsTable(BaseTable):
     __tablename__ = 'PlanetsTable'  # The actual table name in the database
+    __bind_key__ = CATALOG_BIND
 
     @staticmethod
     def query_by_name(name):
         print(f"Querying PlanetsTable for name: {name}")
-        result = db.session.query(PlanetsTable).filter_by(Name=name).first()
-        if result:
-            if isinstance(result, dict):
-                return result
-            result_data = {column: getattr(result, column) for column in result.__table__.columns.keys()}
-            return result_data
-        return None
+        return fetch_row(PlanetsTable.__table__, 'Name', name)
 
     @staticmethod
     def load_planets():
@@ -130,6 +188,80 @@ class PlanetsTable(BaseTable):
         return {row.name.lower(): row for row in planets if hasattr(row, 'name')}  # Assuming 'name' is a column
 
 
+# CrossIdTable: Every alias of a catalogue object mapped to one canonical object.
+# Built offline by utility/buildCrossIds.py, so it is declared rather than reflected.
+class CrossIdTable(db.Model):
+    __tablename__ = 'CrossIdTable'
+    __bind_key__ = CATALOG_BIND
+
+    id = Column(db.Integer, primary_key=True)
+    alias = Column(String, nullable=False, index=True)  # Normalised, e.g. "m31", "andromedagalaxy"
+    displayName = Column(String, nullable=False)  # Alias as written in the catalogue
+    canonicalId = Column(String, nullable=False, index=True)  # Name of the primary object, e.g. "NGC224"
+    sourceTable = Column(String, nullable=False)  # Table holding the primary object
+    RA = Column(REAL)
+    DEC = Column(REAL)
+    VMag = Column("V-Mag", REAL)
+
+    @staticmethod
+    def resolve(name):
+        """
+        Resolve any alias (Messier number, common name, IC/NGC duplicate...) with one indexed read.
+        """
+        from models.catalogIndex import normalizeKey
+        row = fetch_row(CrossIdTable.__table__, 'alias', normalizeKey(name))
+        return CrossIdTable.format_row(row) if row else None
+
+    @staticmethod
+    def resolve_many(names):
+        """
+        Resolve a list of names with one IN (...) query per MAX_KEYS_PER_QUERY names, returns {name: result}
+        """
+        from models.catalogIndex import normalizeKey
+        keys = {name: normalizeKey(name) for name in names}
+        rows = fetch_rows(CrossIdTable.__table__, 'alias', keys.values())
+        return {name: CrossIdTable.format_row(rows[key]) for name, key in keys.items() if key in rows}
+
+    @staticmethod
+    def format_row(row):
+        return {
+            'Name': row['canonicalId'],
+            'Alias': row['displayName'],
+            'Table': row['sourceTable'],
+            'RA': row['RA'],
+            'DEC': row['DEC'],
+            'V-Mag': row['V-Mag']
+        }
+
+    @staticmethod
+    def get_aliases(canonical_id):
+        """
+        All catalogue names for one object, e.g. ['NGC224', 'M31', 'Andromeda Galaxy'].
+        """
+        rows = db.session.query(CrossIdTable.displayName).filter_by(canonicalId=canonical_id).all()
+        return [row.displayName for row in rows]
+
+    @staticmethod
+    def get_aliases_many(canonical_ids):
+        """
+        Aliases for several objects with one IN (...) query per MAX_KEYS_PER_QUERY ids, returns {canonical_id: [names]}
+        """
+        canonical_ids = list(dict.fromkeys(canonical_ids))
+        aliases = {canonical_id: [] for canonical_id in canonical_ids}
+        for start in range(0, len(canonical_ids), MAX_KEYS_PER_QUERY):
+            chunk = canonical_ids[start:start + MAX_KEYS_PER_QUERY]
+            rows = db.session.query(CrossIdTable.canonicalId, CrossIdTable.displayName).filter(
+                CrossIdTable.canonicalId.in_(chunk)
+            ).all()
+            for row in rows:
+                aliases[row.canonicalId].append(row.displayName)
+        return aliases
+
+    @staticmethod
+    def has_entries():
+        return db.session.query(CrossIdTable.id).first() is not None
+
+
 # Telescope model: For managing connected telescopes
 class Telescope(BaseTable):
     __tablename__ = 'telescopes'  # The actual table name in the database
@@ -137,36 +269,25 @@ class Telescope(BaseTable):
     @staticmethod
     def get_all_telescopes():
         """
-        Get all telescopes from the database.
+        Get all telescopes from the database as row dicts.
         """
-        telescopes = db.session.query(Telescope).all()
-        return telescopes
+        return fetch_all(Telescope.__table__)
     
     @staticmethod
     def get_telescope_by_id(telescope_id):
         """
         Get a specific telescope by its telescopeId.
         """
-        result = db.session.query(Telescope).filter_by(telescopeId=telescope_id).first()
-        if result:
-            if isinstance(result, dict):
-                return result
-            result_data = {column: getattr(result, column) for column in result.__table__.columns.keys()}
-            return result_data
-        return None
+        return fetch_row(Telescope.__table__, 'telescopeId', telescope_id)
     
     @staticmethod
     def is_telescope_online(telescope_id):
         """
         Check if a telescope is considered online (seen within last 5 minutes).
+        Answered from the in-memory registry, no query is made.
         """
-        import time
-        current_time = time.time()
-        telescope = db.session.query(Telescope).filter_by(telescopeId=telescope_id).first()
-        if telescope and hasattr(telescope, 'lastSeen'):
-            # Consider telescope online if seen within last 5 minutes (300 seconds)
-            return (current_time - telescope.lastSeen) < 300
-        return False
+        from models.telescopeRegistry import telescope_registry
+        return telescope_registry.isOnline(telescope_id)
     
     @staticmethod
     def add_telescope(telescope_id, ip_address, firmware_version, capabilities, last_seen=None):
@@ -207,6 +328,15 @@ class Telescope(BaseTable):
                 }
             )
             db.session.commit()
+
+            from models.telescopeRegistry import telescope_registry
+            telescope_registry.added({
+                'telescopeId': telescope_id,
+                'ipAddress': ip_address,
+                'firmwareVersion': firmware_version,
+                'capabilities': capabilities,
+                'lastSeen': last_seen
+            })
             
             return {"status": "success", "message": f"Telescope '{telescope_id}' added successfully"}
             
@@ -234,6 +364,9 @@ class Telescope(BaseTable):
             # Delete the telescope
             db.session.delete(telescope)
             db.session.commit()
+
+            from models.telescopeRegistry import telescope_registry
+            telescope_registry.removed(telescope_id)
             
             return {"status": "success", "message": f"Telescope '{telescope_id}' removed successfully"}
             
@@ -245,6 +378,8 @@ class Telescope(BaseTable):
     def update_last_seen(telescope_id, last_seen=None):
         """
         Update the last seen timestamp for a telescope.
+        The timestamp is kept in memory and written to the database in periodic
+        batches by the telescope registry, so a heartbeat does not commit.
         
         Args:
             telescope_id (str): The telescope ID to update
@@ -254,23 +389,11 @@ class Telescope(BaseTable):
             dict: Success/error status and message
         """
         try:
-            import time
-            if last_seen is None:
-                last_seen = time.time()
-            
-            # Use raw SQL to update since we're using table reflection
-            from sqlalchemy import text
-            result = db.session.execute(
-                text("UPDATE telescopes SET lastSeen = :lastSeen WHERE telescopeId = :telescopeId"),
-                {'lastSeen': last_seen, 'telescopeId': telescope_id}
-            )
-            
-            if result.rowcount == 0:
+            from models.telescopeRegistry import telescope_registry
+            if not telescope_registry.heartbeat(telescope_id, last_seen):
                 return {"status": "error", "message": f"Telescope with ID '{telescope_id}' not found"}
             
-            db.session.commit()
             return {"status": "success", "message": f"Updated last seen for telescope '{telescope_id}'"}
             
         except Exception as e:
-            db.session.rollback()
             return {"status": "error", "message": f"Failed to update telescope: {str(e)}"}
@@ -0,0 +1,166 @@
+"""
+In-memory registry of the telescope fleet.
+
+Every telescope row is loaded once and kept in RAM together with its latest
+heartbeat, so listing the fleet or checking whether a scope is online is a
+dictionary read instead of a query per telescope. Heartbeats only update the
+in-memory lastSeen; a background thread writes the changed timestamps back to
+the telescopes table in one batched UPDATE every HEARTBEAT_FLUSH_INTERVAL
+seconds (and once more when the process exits).
+"""
+
+import atexit
+import threading
+import time
+
+ONLINE_TIMEOUT = 300  # Seconds since the last heartbeat before a telescope counts as offline
+HEARTBEAT_FLUSH_INTERVAL = 30  # Seconds between batched lastSeen writes
+
+
+class TelescopeRegistry:
+    def __init__(self, flush_interval=HEARTBEAT_FLUSH_INTERVAL):
+        self.flush_interval = flush_interval
+        self.telescopes = {}  # telescopeId -> row dict, lastSeen kept current in memory
+        self.dirty = {}  # telescopeId -> lastSeen not yet written to the database
+        self.loaded = False
+        self._lock = threading.Lock()
+        self._thread = None
+        self._stop = threading.Event()
+
+    # Loading
+
+    def ensureLoaded(self):
+        if not self.loaded:
+            with self._lock:
+                if not self.loaded:
+                    self._load()
+        return self
+
+    def _load(self):
+        from models.tables import Telescope, fetch_all
+        self.telescopes = {row['telescopeId']: row for row in fetch_all(Telescope.__table__)}
+        self.loaded = True
+        print(f"[Telescopes] Loaded {len(self.telescopes)} telescopes")
+
+    def reload(self):
+        """Re-read the table, keeping heartbeats that have not been flushed yet"""
+        with self._lock:
+            self._load()
+            for telescope_id, last_seen in self.dirty.items():
+                if telescope_id in self.telescopes:
+                    self.telescopes[telescope_id]['lastSeen'] = last_seen
+
+    # Reads
+
+    @staticmethod
+    def _isOnline(row, now):
+        last_seen = row.get('lastSeen')
+        return last_seen is not None and (now - last_seen) < ONLINE_TIMEOUT
+
+    def get(self, telescope_id):
+        """The telescope's row with an 'online' flag, or None"""
+        self.ensureLoaded()
+        row = self.telescopes.get(telescope_id)
+        if row is None:
+            return None
+        return dict(row, online=self._isOnline(row, time.time()))
+
+    def getAll(self):
+        """Every telescope with an 'online' flag, one pass over memory"""
+        self.ensureLoaded()
+        now = time.time()
+        with self._lock:
+            rows = list(self.telescopes.values())
+        return [dict(row, online=self._isOnline(row, now)) for row in rows]
+
+    def isOnline(self, telescope_id):
+        self.ensureLoaded()
+        row = self.telescopes.get(telescope_id)
+        return row is not None and self._isOnline(row, time.time())
+
+    # Writes
+
+    def heartbeat(self, telescope_id, last_seen=None):
+        """Record a heartbeat in memory, returns False for an unknown telescope"""
+        self.ensureLoaded()
+        last_seen = time.time() if last_seen is None else last_seen
+        with self._lock:
+            row = self.telescopes.get(telescope_id)
+            if row is None:
+                return False
+            row['lastSeen'] = last_seen
+            self.dirty[telescope_id] = last_seen
+        self.start()
+        return True
+
+    def added(self, row):
+        """Keep the registry in step after a telescope is inserted"""
+        if self.loaded:
+            with self._lock:
+                self.telescopes[row['telescopeId']] = dict(row)
+
+    def removed(self, telescope_id):
+        with self._lock:
+            self.telescopes.pop(telescope_id, None)
+            self.dirty.pop(telescope_id, None)
+
+    def flush(self):
+        """Write pending heartbeats in one executemany UPDATE and commit, returns how many were written"""
+        from sqlalchemy import text
+        from db import db
+
+        with self._lock:
+            pending, self.dirty = self.dirty, {}
+        if not pending:
+            return 0
+        try:
+            db.session.execute(
+                text("UPDATE telescopes SET lastSeen = :lastSeen WHERE telescopeId = :telescopeId"),
+                [{'telescopeId': telescope_id, 'lastSeen': last_seen} for telescope_id, last_seen in pending.items()]
+            )
+            db.session.commit()
+        except Exception:
+            db.session.rollback()
+            with self._lock:
+                # Put them back unless a newer heartbeat arrived meanwhile
+                for telescope_id, last_seen in pending.items():
+                    self.dirty.setdefault(telescope_id, last_seen)
+            raise
+        return len(pending)
+
+    # Background flushing
+
+    def start(self):
+        """Start the flush thread if it is not already running"""
+        if self._thread and self._thread.is_alive():
+            return
+        with self._lock:
+            if self._thread and self._thread.is_alive():
+                return
+            self._stop.clear()
+            self._thread = threading.Thread(target=self._run, name="TelescopeRegistry", daemon=True)
+            self._thread.start()
+            atexit.register(self.stop)
+
+    def stop(self):
+        """Stop the flush thread, writing any heartbeats still pending"""
+        self._stop.set()
+        if self._thread and self._thread is not threading.current_thread():
+            self._thread.join(timeout=5)
+
+    def _run(self):
+        from models.tables import get_app
+        app = get_app()
+        while True:
+            stopping = self._stop.wait(self.flush_interval)
+            try:
+                with app.app_context():
+                    self.flush()
+            except Exception as e:
+                print(f"[Telescopes] Failed to write heartbeats: {e}")
+            if stopping:
+                break
+
+
+# Global telescope registry, loaded on first use
+telescope_registry = TelescopeRegistry()
@@ -1,6 +1,7 @@
 from db import db
-from models.tables import HDSTARtable
+from models.tables import CrossIdTable, HDSTARtable
 from Server import app
+from plateSolver.starDetection import detectStars
 import cv2
 import math
 
@@ -33,67 +34,24 @@ class plateSolver:
         original = cv2.imread(imagePath, cv2.IMREAD_GRAYSCALE)
         if original is None:
             raise ValueError(f"Could not read image from: {imagePath}")
-        img = original.copy()
-
-        # Blur image
-        blurred = cv2.GaussianBlur(img, blurKernel, 0)
-
-        # Enhance contrast
-        if useCLAHE:
-            clahe = cv2.createCLAHE(clipLimit=clipLimit, tileGridSize=tileGridSize)
-            enhanced = clahe.apply(blurred)
-        else:
-            enhanced = cv2.equalizeHist(blurred)
-
-        # Flatten background (nebulosity suppression)
-        background = cv2.medianBlur(enhanced, 21)
-        flattened = cv2.subtract(enhanced, background)
-
-        # Threshold
-        if useAdaptive:
-            thresholded = cv2.adaptiveThreshold(
-                flattened, 255,
-                cv2.ADAPTIVE_THRESH_MEAN_C,
-                cv2.THRESH_BINARY,
-                31, 2
-            )
-        else:
-            _, thresholded = cv2.threshold(flattened, thresholdValue, 255, cv2.THRESH_BINARY)
-
-        # Find contours
-        contours, _ = cv2.findContours(thresholded, cv2.RETR_EXTERNAL, cv2.CHAIN_APPROX_SIMPLE)
-        starPositions = []
-
-        for contour in contours:
-            area = cv2.contourArea(contour)
-            if area < minArea:
-                continue
-
-            perimeter = cv2.arcLength(contour, True)
-            circularity = 4 * math.pi * (area / (perimeter * perimeter)) if perimeter > 0 else 0
-            moments = cv2.moments(contour)
-            if moments["m00"] != 0:
-                cx = int(moments["m10"] / moments["m00"])
-                cy = int(moments["m01"] / moments["m00"])
-
-                if rejectArtifacts:
-                    if circularity < 0.5:
-                        continue
-                    if flattened[cy, cx] < 100:
-                        continue
-
-                starPositions.append((cx, cy))
-                if annotate:
-                    cv2.circle(flattened, (cx, cy), 1, 255, -1)
+
+        result = detectStars(
+            original,
+            blurKernel=blurKernel,
+            useCLAHE=useCLAHE,
+            clipLimit=clipLimit,
+            tileGridSize=tileGridSize,
+            minArea=minArea,
+            useAdaptive=useAdaptive,
+            thresholdValue=thresholdValue,
+            annotate=annotate,
+            rejectArtifacts=rejectArtifacts
+        )
 
         if saveAs:
-            cv2.imwrite(saveAs, flattened)
+            cv2.imwrite(saveAs, result["enhancedImage"])
 
-        return {
-            "count": len(starPositions),
-            "centroids": starPositions,
-            "enhancedImage": flattened
-        }
+        return result
 
     @staticmethod
     def displayImage():
@@ -110,6 +68,27 @@ class plateSolver:
         for i, (x, y) in enumerate(result["centroids"]):
             print(f"{i+1}. Star at ({x}, {y})")
 
+    @staticmethod
+    def getLabel(name):
+        return plateSolver.getLabels([name])[name]
+
+    @staticmethod
+    def getLabels(names):
+        # Prefer a well known alias (Messier number or common name) over the catalogue number.
+        # A name need not be the canonical one of its object, so it is resolved through the alias
+        # column first; both steps look up every name at once.
+        with app.app_context():
+            canonical = {name: result["Name"] for name, result in CrossIdTable.resolve_many(names).items()}
+            aliases = CrossIdTable.get_aliases_many(canonical.values())
+        labels = {}
+        for name in names:
+            labels[name] = next(
+                (alias for alias in aliases.get(canonical.get(name), [])
+                 if alias != name and not alias.upper().startswith(("HD", "NGC", "IC"))),
+                name
+            )
+        return labels
+
     @staticmethod
     def identifyStars(detectedCentroids, tolerance=3):
         # Image metadata for coordinate transform
@@ -166,6 +145,10 @@ class plateSolver:
                 unmatchedCentroids.append((dx, dy))
                 print("❌ No match found")
 
+        labels = plateSolver.getLabels([match["Name"] for match in matchedStars])
+        for match in matchedStars:
+            match["Label"] = labels[match["Name"]]
+
         print(f"\n🔧 Summary:")
         print(f"✔️ Matched {len(matchedStars)} stars")
         print(f"❌ Unmatched: {len(unmatchedCentroids)}")
@@ -0,0 +1,92 @@
+"""
+Star detection on image arrays, shared by the plate solver and live stacking.
+
+Works on a grayscale uint8 array and imports nothing from the server or the
+database, so it can run in worker threads or processes.
+"""
+
+import math
+
+import cv2
+
+
+def detectStars(
+    image,
+    blurKernel=(3, 3),
+    useCLAHE=True,
+    clipLimit=2.0,
+    tileGridSize=(8, 8),
+    minArea=5,
+    useAdaptive=False,
+    thresholdValue=40,
+    annotate=True,
+    rejectArtifacts=True
+):
+    """
+    Stars in a grayscale image. Returns the count, integer centroids in detection order,
+    sub-pixel stars as (x, y, area) largest first, and the flattened image they were found in.
+    """
+    img = image.copy()
+
+    # Blur image
+    blurred = cv2.GaussianBlur(img, blurKernel, 0)
+
+    # Enhance contrast
+    if useCLAHE:
+        clahe = cv2.createCLAHE(clipLimit=clipLimit, tileGridSize=tileGridSize)
+        enhanced = clahe.apply(blurred)
+    else:
+        enhanced = cv2.equalizeHist(blurred)
+
+    # Flatten background (nebulosity suppression)
+    background = cv2.medianBlur(enhanced, 21)
+    flattened = cv2.subtract(enhanced, background)
+
+    # Threshold
+    if useAdaptive:
+        thresholded = cv2.adaptiveThreshold(
+            flattened, 255,
+            cv2.ADAPTIVE_THRESH_MEAN_C,
+            cv2.THRESH_BINARY,
+            31, 2
+        )
+    else:
+        _, thresholded = cv2.threshold(flattened, thresholdValue, 255, cv2.THRESH_BINARY)
+
+    # Find contours
+    contours, _ = cv2.findContours(thresholded, cv2.RETR_EXTERNAL, cv2.CHAIN_APPROX_SIMPLE)
+    starPositions = []
+    stars = []
+
+    for contour in contours:
+        area = cv2.contourArea(contour)
+        if area < minArea:
+            continue
+
+        perimeter = cv2.arcLength(contour, True)
+        circularity = 4 * math.pi * (area / (perimeter * perimeter)) if perimeter > 0 else 0
+        moments = cv2.moments(contour)
+        if moments["m00"] != 0:
+            x = moments["m10"] / moments["m00"]
+            y = moments["m01"] / moments["m00"]
+            cx, cy = int(x), int(y)
+
+            if rejectArtifacts:
+                if circularity < 0.5:
+                    continue
+                if flattened[cy, cx] < 100:
+                    continue
+
+            starPositions.append((cx, cy))
+            stars.append((x, y, area))
+            if annotate:
+                cv2.circle(flattened, (cx, cy), 1, 255, -1)
+
+    stars.sort(key=lambda star: star[2], reverse=True)
+
+    return {
+        "count": len(starPositions),
+        "centroids": starPositions,
+        "stars": stars,
+        "enhancedImage": flattened
+    }
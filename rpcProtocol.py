@@ -0,0 +1,117 @@
+"""
+Wire encodings for the telescope command protocol (see WebsocketServer.py).
+
+Messages are handled as dicts everywhere else; a codec turns them into
+websocket frames and back. JSON is the default and what every client speaks.
+A client can ask for MessagePack in its hello, which sends binary frames with
+integer message ids and a positional envelope instead of named keys:
+
+    call         [0, id, function, args, kwargs]
+    result       [1, id, result]
+    error        [2, id, error]
+    batch        [3, id, [call, ...]]
+    batch reply  [4, id, [result or error, ...]]
+    progress     [5, id, progress]
+    cancel       [6, id]
+
+Anything else (e.g. log lines from the client) is sent as a plain map.
+"""
+
+import itertools
+import uuid
+
+import ujson as json
+
+try:
+    import msgpack
+except ImportError:  # Optional, clients fall back to JSON
+    msgpack = None
+
+CALL, RESULT, ERROR, BATCH, BATCH_REPLY, PROGRESS, CANCEL = range(7)
+
+# Integer ids are unique for the life of the process, so they can share the pending table with UUIDs
+_message_ids = itertools.count(1)
+
+
+class JsonCodec:
+    name = "json"
+
+    @staticmethod
+    def new_id():
+        return str(uuid.uuid4())
+
+    @staticmethod
+    def encode(message):
+        return json.dumps(message)
+
+    @staticmethod
+    def decode(frame):
+        return json.loads(frame)
+
+
+class MsgpackCodec:
+    name = "msgpack"
+
+    @staticmethod
+    def new_id():
+        return next(_message_ids)
+
+    @staticmethod
+    def _pack(message):
+        kind = message.get("type")
+        if kind == "call":
+            return [CALL, message["id"], message["function"], message["args"], message["kwargs"]]
+        if kind == "batch":
+            return [BATCH, message["id"], [MsgpackCodec._pack(call) for call in message["calls"]]]
+        if kind == "cancel":
+            return [CANCEL, message["id"]]
+        if "progress" in message and "id" in message:
+            return [PROGRESS, message["id"], message["progress"]]
+        if "results" in message:
+            return [BATCH_REPLY, message["id"], [MsgpackCodec._pack(result) for result in message["results"]]]
+        if "result" in message and "id" in message:
+            return [RESULT, message["id"], message["result"]]
+        if "error" in message and "id" in message:
+            return [ERROR, message["id"], message["error"]]
+        return message
+
+    @staticmethod
+    def _unpack(data):
+        if not isinstance(data, list):
+            return data
+        kind = data[0]
+        if kind == CALL:
+            return {"type": "call", "id": data[1], "function": data[2], "args": data[3], "kwargs": data[4]}
+        if kind == RESULT:
+            return {"id": data[1], "result": data[2]}
+        if kind == ERROR:
+            return {"id": data[1], "error": data[2]}
+        if kind == BATCH:
+            return {"type": "batch", "id": data[1], "calls": [MsgpackCodec._unpack(call) for call in data[2]]}
+        if kind == BATCH_REPLY:
+            return {"id": data[1], "results": [MsgpackCodec._unpack(result) for result in data[2]]}
+        if kind == PROGRESS:
+            return {"id": data[1], "progress": data[2]}
+        if kind == CANCEL:
+            return {"type": "cancel", "id": data[1]}
+        raise ValueError(f"Unknown message kind {kind}")
+
+    @staticmethod
+    def encode(message):
+        return msgpack.packb(MsgpackCodec._pack(message), use_bin_type=True)
+
+    @staticmethod
+    def decode(frame):
+        return MsgpackCodec._unpack(msgpack.unpackb(frame, raw=False))
+
+
+# Codecs this server can speak (the client's hello lists them in its order of preference)
+CODECS = {codec.name: codec for codec in ([MsgpackCodec] if msgpack else []) + [JsonCodec]}
+
+
+def negotiate_codec(requested):
+    """The first codec in the client's list that the server also supports, JSON if none"""
+    for name in requested or []:
+        if name in CODECS:
+            return CODECS[name]
+    return JsonCodec
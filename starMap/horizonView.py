@@ -0,0 +1,145 @@
+"""
+Horizon view for the star map.
+
+Returns only the catalogue objects that are above the horizon (or the site's
+horizon mask) for a telescope site, with altitude and azimuth precomputed.
+Alt/az is computed for the whole catalogue at once with NumPy and cached per
+local sidereal time bucket, so every viewer of a site inside the same bucket
+shares one computation.
+"""
+
+import threading
+from collections import OrderedDict
+from datetime import datetime
+
+import numpy as np
+
+from algorithms.convert import convert
+from algorithms.timeUtils import SpaceTime
+from config.sites import SITES, DEFAULT_SITE, HORIZON_CONFIG
+
+
+def getSite(telescope_id=None, latitude=None, longitude=None):
+    """Resolve a site config, allowing the latitude/longitude to be overridden"""
+    site = dict(SITES.get(telescope_id) or SITES[DEFAULT_SITE])
+    site['id'] = telescope_id if telescope_id in SITES else DEFAULT_SITE
+    if latitude is not None and longitude is not None:
+        site['latitude'] = float(latitude)
+        site['longitude'] = float(longitude)
+        site['id'] = f"{site['id']}@{site['latitude']:.3f},{site['longitude']:.3f}"
+    return site
+
+
+def getLST(longitude, when=None):
+    """Local sidereal time in decimal hours"""
+    when = when or datetime.utcnow()
+    julianDate = SpaceTime.getJD(when.year, when.month, when.day)
+    GST = SpaceTime.getGST(julianDate, when.hour, when.minute, when.second + when.microsecond / 1e6)
+    return SpaceTime.getLST(longitude, GST)
+
+
+def horizonAltitudes(horizon_mask, azimuths):
+    """Minimum visible altitude for each azimuth, interpolated around the mask"""
+    if not horizon_mask:
+        return np.full_like(azimuths, HORIZON_CONFIG['min_altitude'])
+    points = sorted(horizon_mask)
+    maskAz = np.array([az for az, _ in points], dtype=np.float64)
+    maskAlt = np.array([alt for _, alt in points], dtype=np.float64)
+    return np.interp(azimuths, maskAz, maskAlt, period=360)
+
+
+def toMagnitude(value):
+    try:
+        return float(value)
+    except (TypeError, ValueError):
+        return np.nan
+
+
+class CatalogArrays:
+    """Catalogue objects held as NumPy columns for vectorised transforms"""
+
+    def __init__(self):
+        self.objects = []
+        self.ra = np.empty(0)
+        self.dec = np.empty(0)
+        self.mag = np.empty(0)
+        self._lock = threading.Lock()
+        self._loaded = False
+
+    def load(self):
+        with self._lock:
+            if self._loaded:
+                return self
+            from controllers.star_map import loadStarsFromTables
+            from models.tables import HDSTARtable, IndexTable, NGCtable
+
+            self.objects = loadStarsFromTables([HDSTARtable, IndexTable, NGCtable])
+            self.ra = np.array([obj["ra"] for obj in self.objects], dtype=np.float64)
+            self.dec = np.array([obj["dec"] for obj in self.objects], dtype=np.float64)
+            self.mag = np.array([toMagnitude(obj["mag"]) for obj in self.objects], dtype=np.float64)
+            self._loaded = True
+            print(f"[HorizonView] Loaded {len(self.objects)} catalogue objects")
+            return self
+
+
+class HorizonView:
+    def __init__(self, catalog=None):
+        self.catalog = catalog or CatalogArrays()
+        self.bucket_hours = HORIZON_CONFIG['lst_bucket_hours']
+        self.max_cached = HORIZON_CONFIG['max_cached_buckets']
+        self._cache = OrderedDict()
+        self._lock = threading.Lock()
+
+    def _bucket(self, lst):
+        bucket = int(lst / self.bucket_hours)
+        return bucket, (bucket + 0.5) * self.bucket_hours  # Evaluate at the bucket centre
+
+    def _compute(self, site, lst):
+        catalog = self.catalog.load()
+        az, alt = convert.EquatorialToHorizonArrays(catalog.ra, catalog.dec, site['latitude'], lst)
+        visible = np.nonzero(alt > horizonAltitudes(site.get('horizon_mask'), az))[0]
+
+        objects = []
+        for index, objAz, objAlt in zip(visible.tolist(), az[visible].tolist(), alt[visible].tolist()):
+            obj = dict(catalog.objects[index])
+            obj["az"] = round(objAz, 3)
+            obj["alt"] = round(objAlt, 3)
+            objects.append(obj)
+        return objects
+
+    def getVisibleStars(self, site, when=None):
+        """Catalogue objects above the site's horizon for the current LST bucket"""
+        bucket, lst = self._bucket(getLST(site['longitude'], when))
+        key = (site['id'], bucket)
+        with self._lock:
+            if key in self._cache:
+                self._cache.move_to_end(key)
+                return self._cache[key]
+
+        objects = self._compute(site, lst)
+
+        with self._lock:
+            self._cache[key] = objects
+            while len(self._cache) > self.max_cached:
+                self._cache.popitem(last=False)
+        return objects
+
+    def getVisiblePlanets(self, site, planets, when=None):
+        """Planets move, so they are transformed per request rather than cached"""
+        if not planets:
+            return []
+        lst = getLST(site['longitude'], when)
+        az, alt = convert.EquatorialToHorizonArrays(
+            [obj["ra"] for obj in planets], [obj["dec"] for obj in planets], site['latitude'], lst
+        )
+        minimum = horizonAltitudes(site.get('horizon_mask'), az)
+        visible = []
+        for obj, objAz, objAlt, objMin in zip(planets, az.tolist(), alt.tolist(), minimum.tolist()):
+            if objAlt > objMin:
+                visible.append(dict(obj, az=round(objAz, 3), alt=round(objAlt, 3)))
+        return visible
+
+
+# Global catalogue arrays and horizon view shared by all requests
+catalog_arrays = CatalogArrays()
+horizon_view = HorizonView(catalog_arrays)
@@ -0,0 +1,139 @@
+"""
+Live solar-system position feed for the star map.
+
+A single background thread recomputes the Sun, Moon and planet positions at a
+fixed cadence and publishes them as a numbered update. Every open star map
+subscribes over Server-Sent Events and receives only the bodies whose
+position changed since the last update it saw, so each tick is computed once
+no matter how many viewers are connected.
+"""
+
+import threading
+import time
+from datetime import datetime
+
+import ujson as json
+
+FEED_INTERVAL = 30  # Seconds between position updates
+POSITION_PRECISION = 4  # Decimal places sent to clients (~0.4 arcsec)
+KEEPALIVE_INTERVAL = 15  # Seconds between SSE comments so proxies keep the stream open
+
+
+def getFractionalDay(when):
+    """Day of month including the time of day, so positions move within a day"""
+    return when.day + (when.hour + when.minute / 60 + when.second / 3600) / 24
+
+
+class PlanetFeed:
+    def __init__(self, interval=FEED_INTERVAL):
+        self.interval = interval
+        self.version = 0
+        self.positions = {}  # name -> [ra, dec, mag]
+        self.changes = {}  # version -> {name: [ra, dec, mag]} for the latest tick
+        self._condition = threading.Condition()
+        self._thread = None
+        self._stop = threading.Event()
+
+    def start(self):
+        """Start the background ticker if it is not already running"""
+        with self._condition:
+            if self._thread and self._thread.is_alive():
+                return
+            self._stop.clear()
+            self._thread = threading.Thread(target=self._run, name="PlanetFeed", daemon=True)
+            self._thread.start()
+            print(f"[PlanetFeed] Started with a {self.interval}s interval")
+
+    def stop(self):
+        self._stop.set()
+        with self._condition:
+            self._condition.notify_all()
+
+    def _run(self):
+        from models.tables import get_app
+        app = get_app()
+        while not self._stop.is_set():
+            try:
+                with app.app_context():
+                    self.tick()
+            except Exception as e:
+                print(f"[PlanetFeed] Failed to compute positions: {e}")
+            self._stop.wait(self.interval)
+
+    def computePositions(self, when=None):
+        """Compute compact [ra, dec, mag] entries for every solar-system body"""
+        from controllers.star_map import celestialDataToObjects
+        from algorithms2 import getAllCelestialData
+
+        when = when or datetime.utcnow()
+        celestial_data = getAllCelestialData(when.year, when.month, getFractionalDay(when))
+        positions = {}
+        for obj in celestialDataToObjects(celestial_data):
+            mag = obj["mag"]
+            try:
+                mag = round(float(mag), 2)
+            except (TypeError, ValueError):
+                mag = None
+            positions[obj["name"].lower()] = [
+                round(obj["ra"], POSITION_PRECISION),
+                round(obj["dec"], POSITION_PRECISION),
+                mag
+            ]
+        return positions
+
+    def tick(self, when=None):
+        """Compute one update and wake every subscriber if anything moved"""
+        positions = self.computePositions(when)
+        changed = {name: value for name, value in positions.items() if self.positions.get(name) != value}
+        if not changed:
+            return
+        with self._condition:
+            self.positions = positions
+            self.version += 1
+            self.changes = {self.version: changed}
+            self._condition.notify_all()
+
+    def snapshot(self):
+        with self._condition:
+            return self.version, dict(self.positions)
+
+    def waitForUpdate(self, seen_version, timeout):
+        """
+        Block until an update newer than seen_version exists.
+
+        Returns (version, bodies) where bodies is only the delta when the
+        subscriber is exactly one update behind, otherwise the full position set.
+        """
+        with self._condition:
+            self._condition.wait_for(lambda: self.version != seen_version or self._stop.is_set(), timeout)
+            if self.version == seen_version:
+                return seen_version, None
+            if seen_version + 1 == self.version and self.version in self.changes:
+                return self.version, self.changes[self.version]
+            return self.version, dict(self.positions)
+
+    def stream(self):
+        """SSE generator: a full snapshot first, then deltas as they are published"""
+        self.start()
+        version, positions = self.snapshot()
+        if not positions:
+            version, positions = self.waitForUpdate(version, self.interval)
+        yield self._formatEvent("snapshot", version, positions or {})
+
+        while not self._stop.is_set():
+            new_version, bodies = self.waitForUpdate(version, KEEPALIVE_INTERVAL)
+            if bodies is None:
+                yield ": keepalive\n\n"
+                continue
+            event = "delta" if new_version == version + 1 else "snapshot"
+            version = new_version
+            yield self._formatEvent(event, version, bodies)
+
+    @staticmethod
+    def _formatEvent(event, version, bodies):
+        payload = json.dumps({"v": version, "t": int(time.time()), "b": bodies})
+        return f"event: {event}\nid: {version}\ndata: {payload}\n\n"
+
+
+# Global feed shared by every star map viewer
+planet_feed = PlanetFeed()
@@ -0,0 +1,195 @@
+"""
+Server-side rendered star map tiles.
+
+Renders the sky in an equirectangular projection (RA across, DEC down) as
+fixed-size PNG/WebP tiles at several zoom levels, so phones and the Pi
+touchscreen can show the star map as plain images instead of drawing every
+star on a canvas. Stars are rasterised with NumPy, sized and brightened by
+V-Mag, and planet icons from static/icons/planets are composited on top.
+
+Tiles are cached on disk under a time bucket directory. Planets move, so a
+new bucket is started every TILE_TIME_BUCKET seconds and older buckets are
+deleted.
+"""
+
+import os
+import shutil
+import threading
+import time
+
+import cv2
+import numpy as np
+
+from starMap.horizonView import catalog_arrays
+
+BASE_DIR = os.path.abspath(os.path.join(os.path.dirname(__file__), ".."))
+TILE_CACHE_DIR = os.path.join(BASE_DIR, "tile_cache")
+PLANET_ICON_DIR = os.path.join(BASE_DIR, "static", "icons", "planets")
+
+TILE_SIZE = 256
+MAX_ZOOM = 4  # Zoom z has 2^(z+1) x 2^z tiles
+TILE_TIME_BUCKET = 600  # Seconds before planets are redrawn
+TILE_FORMATS = {"png": (".png", [cv2.IMWRITE_PNG_COMPRESSION, 6]), "webp": (".webp", [cv2.IMWRITE_WEBP_QUALITY, 80])}
+
+# Faintest magnitude drawn at each zoom level, so wide tiles are not a white smear
+ZOOM_MAG_LIMITS = {0: 5.0, 1: 6.0, 2: 7.0, 3: 8.5, 4: 10.0}
+PLANET_ICON_SIZE = 20
+
+
+def getTimeBucket(now=None):
+    return int((now or time.time()) // TILE_TIME_BUCKET)
+
+
+def getTileGrid(zoom):
+    """Number of (columns, rows) at a zoom level"""
+    return 2 ** (zoom + 1), 2 ** zoom
+
+
+def getTileBounds(zoom, x, y):
+    """(ra_max, ra_min, dec_max, dec_min) in degrees covered by a tile"""
+    columns, rows = getTileGrid(zoom)
+    raSpan, decSpan = 360 / columns, 180 / rows
+    raMax = 360 - x * raSpan  # RA increases to the left, as seen on the sky
+    decMax = 90 - y * decSpan
+    return raMax, raMax - raSpan, decMax, decMax - decSpan
+
+
+class TileRenderer:
+    def __init__(self, cache_dir=TILE_CACHE_DIR, catalog=None):
+        self.cache_dir = cache_dir
+        self.catalog = catalog or catalog_arrays
+        self._icons = {}
+        self._lock = threading.Lock()
+        self._current_bucket = None
+
+    def _loadIcon(self, name):
+        if name not in self._icons:
+            icon = cv2.imread(os.path.join(PLANET_ICON_DIR, f"{name}.png"), cv2.IMREAD_UNCHANGED)
+            if icon is not None:
+                if icon.ndim == 2:
+                    icon = cv2.cvtColor(icon, cv2.COLOR_GRAY2BGRA)
+                elif icon.shape[2] == 3:
+                    icon = cv2.cvtColor(icon, cv2.COLOR_BGR2BGRA)
+                icon = cv2.resize(icon, (PLANET_ICON_SIZE, PLANET_ICON_SIZE), interpolation=cv2.INTER_AREA)
+            self._icons[name] = icon
+        return self._icons[name]
+
+    @staticmethod
+    def _project(ra, dec, zoom, x, y):
+        """Pixel coordinates of RA/DEC arrays inside tile (x, y)"""
+        columns, rows = getTileGrid(zoom)
+        scaleX = columns * TILE_SIZE / 360
+        scaleY = rows * TILE_SIZE / 180
+        px = (360 - np.asarray(ra)) * scaleX - x * TILE_SIZE
+        py = (90 - np.asarray(dec)) * scaleY - y * TILE_SIZE
+        return px, py
+
+    def _drawStars(self, image, zoom, x, y):
+        catalog = self.catalog.load()
+        if not len(catalog.ra):
+            return
+        magLimit = ZOOM_MAG_LIMITS.get(zoom, ZOOM_MAG_LIMITS[MAX_ZOOM])
+        mags = np.where(np.isnan(catalog.mag), magLimit, catalog.mag)
+        bright = mags <= magLimit
+
+        px, py = self._project(catalog.ra[bright], catalog.dec[bright], zoom, x, y)
+        mags = mags[bright]
+        radius = np.clip((magLimit - mags) * 0.6 + 0.5, 0.5, 6.0) * (1 + zoom * 0.15)
+        intensity = np.clip(1.0 - (mags - magLimit + 6) / 8, 0.35, 1.0)
+
+        # Keep stars whose disc touches the tile
+        margin = radius + 1
+        inside = (px > -margin) & (px < TILE_SIZE + margin) & (py > -margin) & (py < TILE_SIZE + margin)
+        px, py, radius, intensity = px[inside], py[inside], radius[inside], intensity[inside]
+
+        # Sub-pixel stars are accumulated in one vectorised pass. They land on a single pixel,
+        # so only those on this tile count; the ones in the margin belong to the neighbour.
+        small = radius < 1.0
+        on_tile = small & (px >= 0) & (px < TILE_SIZE) & (py >= 0) & (py < TILE_SIZE)
+        np.add.at(image, (py[on_tile].astype(np.int32), px[on_tile].astype(np.int32)), intensity[on_tile])
+
+        # Larger stars get an anti-aliased disc drawn from a local window
+        for cx, cy, r, level in zip(px[~small], py[~small], radius[~small], intensity[~small]):
+            x0, x1 = max(int(cx - r - 1), 0), min(int(cx + r + 2), TILE_SIZE)
+            y0, y1 = max(int(cy - r - 1), 0), min(int(cy + r + 2), TILE_SIZE)
+            if x0 >= x1 or y0 >= y1:
+                continue
+            gy, gx = np.mgrid[y0:y1, x0:x1]
+            distance = np.hypot(gx + 0.5 - cx, gy + 0.5 - cy)
+            image[y0:y1, x0:x1] += level * np.clip(r + 0.5 - distance, 0.0, 1.0)
+
+    def _drawPlanets(self, tile, planets, zoom, x, y):
+        if not planets:
+            return
+        px, py = self._project([obj["ra"] for obj in planets], [obj["dec"] for obj in planets], zoom, x, y)
+        half = PLANET_ICON_SIZE // 2
+        for obj, cx, cy in zip(planets, px.tolist(), py.tolist()):
+            icon = self._loadIcon(obj["name"].lower())
+            if icon is None:
+                continue
+            x0, y0 = int(cx) - half, int(cy) - half
+            tx0, ty0 = max(x0, 0), max(y0, 0)
+            tx1, ty1 = min(x0 + PLANET_ICON_SIZE, TILE_SIZE), min(y0 + PLANET_ICON_SIZE, TILE_SIZE)
+            if tx0 >= tx1 or ty0 >= ty1:
+                continue
+            crop = icon[ty0 - y0:ty1 - y0, tx0 - x0:tx1 - x0].astype(np.float32)
+            alpha = crop[:, :, 3:4] / 255.0
+            region = tile[ty0:ty1, tx0:tx1].astype(np.float32)
+            tile[ty0:ty1, tx0:tx1] = (crop[:, :, :3] * alpha + region * (1 - alpha)).astype(np.uint8)
+
+    def render(self, zoom, x, y, planets=(), fmt="png"):
+        """Render one tile and return the encoded image bytes"""
+        image = np.zeros((TILE_SIZE, TILE_SIZE), dtype=np.float32)
+        self._drawStars(image, zoom, x, y)
+        tile = cv2.cvtColor((np.clip(image, 0.0, 1.0) * 255).astype(np.uint8), cv2.COLOR_GRAY2BGR)
+        self._drawPlanets(tile, list(planets), zoom, x, y)
+
+        extension, params = TILE_FORMATS[fmt]
+        ok, encoded = cv2.imencode(extension, tile, params)
+        if not ok:
+            raise ValueError(f"Could not encode tile as {fmt}")
+        return encoded.tobytes()
+
+    def _pruneBuckets(self, bucket):
+        # The previous bucket is kept, requests that started before the change may still write to it
+        if not os.path.isdir(self.cache_dir):
+            return
+        for name in os.listdir(self.cache_dir):
+            if not name.isdigit() or int(name) < bucket - 1:
+                shutil.rmtree(os.path.join(self.cache_dir, name), ignore_errors=True)
+
+    def getTile(self, zoom, x, y, planets_loader, fmt="png"):
+        """
+        Return (bytes, bucket) for a tile, rendering it into the disk cache if needed.
+
+        planets_loader is only called on a cache miss.
+        """
+        columns, rows = getTileGrid(zoom)
+        if not (0 <= zoom <= MAX_ZOOM and 0 <= x < columns and 0 <= y < rows) or fmt not in TILE_FORMATS:
+            raise ValueError("Tile out of range")
+
+        bucket = getTimeBucket()
+        path = os.path.join(self.cache_dir, str(bucket), str(zoom), str(x), f"{y}.{fmt}")
+        if os.path.isfile(path):
+            with open(path, "rb") as f:
+                return f.read(), bucket
+
+        with self._lock:
+            if self._current_bucket != bucket:
+                self._pruneBuckets(bucket)
+                self._current_bucket = bucket
+
+        data = self.render(zoom, x, y, planets_loader(), fmt)
+        try:
+            os.makedirs(os.path.dirname(path), exist_ok=True)
+            tmp_path = f"{path}.{threading.get_ident()}.tmp"
+            with open(tmp_path, "wb") as f:
+                f.write(data)
+            os.replace(tmp_path, path)  # Atomic so concurrent readers never see half a tile
+        except FileNotFoundError:
+            pass  # The bucket was pruned meanwhile, the tile is still served, just not cached
+        return data, bucket
+
+
+# Global tile renderer
+tile_renderer = TileRenderer()
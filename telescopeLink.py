@@ -3,11 +3,11 @@ import ujson
 import asyncio
 import websockets
 import subprocess
-from WebsocketServer import clients
-from time import sleep
 
 flaskLinkIp = "localhost"
 url = f"http://{flaskLinkIp}:25566/sendCommand" # Url for sending flask server commands
+asyncUrl = f"http://{flaskLinkIp}:25566/sendCommand/async" # Url for starting long commands in the background
+batchUrl = f"http://{flaskLinkIp}:25566/sendBatch" # Url for sending several commands in one round trip
 
 # Example
 # payload = {"client_id": client_id, "command": "add", "args": [5, 7]}
@@ -48,6 +48,17 @@ class Cameralink:
         extracted_data = data["result"] 
         
         return extracted_data  
+
+    def setSettingsBatch(settings):
+        # One round trip for several settings, returns a {"status", "result"/"error"} per setting
+        payload = {"client_id": client_id, "calls": [{"command": "setCameraSetting", "args": args} for args in settings]}
+        response = requests.post(batchUrl, json=payload).text
+
+        data = ujson.loads(response)
+        if data.get("status") != "success":
+            raise Exception(data.get("error"))
+
+        return data["results"]
     
     def capturePhoto(currentid):
         payload = {"client_id": client_id, "command": "capturePhoto", "args": currentid}
@@ -59,6 +70,17 @@ class Cameralink:
         
         return data
 
+    def capturePhotoAsync(currentid):
+        # Returns a job id, poll /command/<job id> for progress and the result
+        payload = {"client_id": client_id, "command": "capturePhoto", "args": currentid}
+        response = requests.post(asyncUrl, json=payload).text
+
+        data = ujson.loads(response)
+        if data.get("status") != "success":
+            raise Exception(data.get("error"))
+
+        return data["jobId"]
+
     def start_liveview_client(server_ip, client_id):
         async def send_frames():
             uri = f"ws://{server_ip}:8002"
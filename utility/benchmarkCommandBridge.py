@@ -0,0 +1,103 @@
+import sys
+import os
+import asyncio
+import threading
+import time
+from concurrent.futures import ThreadPoolExecutor
+
+import websockets
+import ujson as json
+
+# Ensure the root project directory is in sys.path
+sys.path.append(os.path.abspath(os.path.join(os.path.dirname(__file__), '..')))
+
+import WebsocketServer
+
+# Round-trip benchmark for the Flask -> websocket loop bridge (WebsocketServer.submit_command).
+# Starts the command server on a local port, connects simulated telescopes that answer every
+# call after an optional device delay, then sends commands from many threads at once, the way
+# concurrent Flask requests do. Also times asyncio.run() on an empty coroutine, the per-request
+# cost of the old "new event loop per request" approach.
+#
+# Usage: python utility/benchmarkCommandBridge.py [threads] [commands per thread] [telescopes] [device delay ms]
+
+BENCH_PORT = 4999
+
+
+async def fake_telescope(client_id, delay):
+    async with websockets.connect(f"ws://127.0.0.1:{BENCH_PORT}") as ws:
+        await ws.send(client_id)
+
+        async def reply(data):
+            if delay:
+                await asyncio.sleep(delay)
+            await ws.send(json.dumps({"id": data["id"], "result": data["args"]}))
+
+        async for message in ws:
+            data = json.loads(message)
+            if data.get("type") == "call":
+                asyncio.ensure_future(reply(data))  # Answer out of order like a busy device
+
+
+def start_fake_telescopes(count, delay):
+    loop = asyncio.new_event_loop()
+
+    def run():
+        asyncio.set_event_loop(loop)
+        loop.run_until_complete(asyncio.gather(*(fake_telescope(f"bench-{i}", delay) for i in range(count))))
+
+    threading.Thread(target=run, daemon=True).start()
+    client_ids = [f"bench-{i}" for i in range(count)]
+    while not all(client_id in WebsocketServer.client_manager.clients for client_id in client_ids):
+        time.sleep(0.05)
+    return client_ids
+
+
+def percentile(values, fraction):
+    return values[min(len(values) - 1, int(len(values) * fraction))] * 1000
+
+
+def run(threads, per_thread, telescopes, delay_ms):
+    WebsocketServer.WS_IP = "127.0.0.1"
+    WebsocketServer.WS_PORT = BENCH_PORT
+    WebsocketServer.LIVEVIEW_WS_PORT = BENCH_PORT + 1
+    WebsocketServer.runtime.start()
+    WebsocketServer.runtime.ready.wait(5)
+    client_ids = start_fake_telescopes(telescopes, delay_ms / 1000)
+
+    def worker(index):
+        latencies = []
+        for n in range(per_thread):
+            start = time.perf_counter()
+            result = WebsocketServer.submit_command(client_ids[(index + n) % len(client_ids)], "echo", [index, n])
+            latencies.append(time.perf_counter() - start)
+            assert result == [index, n], result
+        return latencies
+
+    start = time.perf_counter()
+    with ThreadPoolExecutor(threads) as pool:
+        latencies = sorted(latency for result in pool.map(worker, range(threads)) for latency in result)
+    elapsed = time.perf_counter() - start
+
+    print(f"{threads} threads x {per_thread} commands over {telescopes} telescopes, device delay {delay_ms} ms")
+    print(f"  throughput: {len(latencies) / elapsed:>8.0f} commands/s")
+    print(f"  latency   : p50 {percentile(latencies, 0.5):.2f} ms   p95 {percentile(latencies, 0.95):.2f} ms   "
+          f"p99 {percentile(latencies, 0.99):.2f} ms   max {latencies[-1] * 1000:.2f} ms")
+
+    async def nothing():
+        pass
+
+    samples = 2000
+    start = time.perf_counter()
+    for _ in range(samples):
+        asyncio.run(nothing())
+    print(f"  asyncio.run() per request (old bridge overhead alone): {(time.perf_counter() - start) / samples * 1000:.3f} ms")
+
+
+if __name__ == '__main__':
+    run(
+        int(sys.argv[1]) if len(sys.argv) > 1 else 32,
+        int(sys.argv[2]) if len(sys.argv) > 2 else 200,
+        int(sys.argv[3]) if len(sys.argv) > 3 else 4,
+        float(sys.argv[4]) if len(sys.argv) > 4 else 0
+    )
@@ -0,0 +1,82 @@
+import sys
+import os
+import time
+
+# Ensure the root project directory is in sys.path
+sys.path.append(os.path.abspath(os.path.join(os.path.dirname(__file__), '..')))
+
+from rpcProtocol import CODECS
+
+# Encode/decode cost and bytes on the wire for each command protocol codec (rpcProtocol.py),
+# using messages shaped like the camera and mount traffic between the server and a telescope.
+#
+# Usage: python utility/benchmarkRpcCodec.py [iterations]
+
+CAMERA_CHOICES = {
+    "/main/capturesettings/shutterspeed": ["bulb", "30", "25", "20", "15", "13", "10", "8", "6", "5", "4", "3.2", "2.5",
+                                           "2", "1.6", "1.3", "1", "0.8", "0.6", "0.5", "0.4", "0.3", "1/4", "1/5",
+                                           "1/6", "1/8", "1/10", "1/13", "1/15", "1/20", "1/25", "1/30", "1/40",
+                                           "1/50", "1/60", "1/80", "1/100", "1/125", "1/160", "1/200", "1/250"],
+    "/main/imgsettings/iso": ["Auto", "100", "200", "400", "800", "1600", "3200", "6400", "12800"],
+    "/main/imgsettings/whitebalance": ["Auto", "Daylight", "Shadow", "Cloudy", "Tungsten", "Fluorescent", "Flash"],
+    "/main/capturesettings/aperture": ["implicit auto"],
+}
+
+
+def sample_messages(codec):
+    def call(function, args, kwargs=None):
+        return {"type": "call", "function": function, "args": args, "kwargs": kwargs or {}, "id": codec.new_id()}
+
+    setting = call("setCameraSetting", ["/main/capturesettings/shutterspeed", "1/125"])
+    return {
+        "setCameraSetting call": setting,
+        "setCameraSetting reply": {"id": setting["id"], "result": True},
+        "getCameraChoices reply": {"id": codec.new_id(), "result": CAMERA_CHOICES},
+        "capturePhoto call": call("capturePhoto", ["a3f1c2d4"]),
+        "mount goto call": call("gotoEquatorial", [83.8221, -5.3911], {"tracking": True}),
+        "mount status reply": {"id": codec.new_id(), "result": {"ra": 83.82214, "dec": -5.39111, "alt": 41.25,
+                                                                 "az": 163.4, "tracking": True, "slewing": False}},
+        "2-setting batch": {"type": "batch", "id": codec.new_id(), "calls": [
+            call("setCameraSetting", ["/main/capturesettings/shutterspeed", "1/125"]),
+            call("setCameraSetting", ["/main/imgsettings/iso", "800"]),
+        ]},
+    }
+
+
+def measure(codec, message, iterations):
+    frame = codec.encode(message)
+    assert codec.decode(frame) == message, (codec.name, message)
+
+    start = time.perf_counter()
+    for _ in range(iterations):
+        codec.encode(message)
+    encode = (time.perf_counter() - start) / iterations
+
+    start = time.perf_counter()
+    for _ in range(iterations):
+        codec.decode(frame)
+    decode = (time.perf_counter() - start) / iterations
+
+    size = len(frame.encode() if isinstance(frame, str) else frame)
+    return size, encode * 1e6, decode * 1e6
+
+
+if __name__ == '__main__':
+    iterations = int(sys.argv[1]) if len(sys.argv) > 1 else 20000
+    if len(CODECS) < 2:
+        print("msgpack is not installed, only JSON is available")
+
+    print(f"{'message':<24} {'codec':<8} {'bytes':>6} {'encode us':>10} {'decode us':>10}")
+    totals = {}
+    for name, codec in CODECS.items():
+        for label, message in sample_messages(codec).items():
+            size, encode, decode = measure(codec, message, iterations)
+            print(f"{label:<24} {name:<8} {size:>6} {encode:>10.2f} {decode:>10.2f}")
+            total = totals.setdefault(name, [0, 0.0, 0.0])
+            total[0] += size
+            total[1] += encode
+            total[2] += decode
+        print()
+
+    for name, (size, encode, decode) in totals.items():
+        print(f"{'all messages':<24} {name:<8} {size:>6} {encode:>10.2f} {decode:>10.2f}")
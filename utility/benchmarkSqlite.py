@@ -0,0 +1,119 @@
+import sys
+import os
+import sqlite3
+import tempfile
+import threading
+import time
+import random
+
+# Ensure the root project directory is in sys.path
+sys.path.append(os.path.abspath(os.path.join(os.path.dirname(__file__), '..')))
+
+from config.database import SQLITE_PRAGMAS
+
+# Concurrent read/write benchmark for the SQLite settings in config/database.py.
+# Reader threads do indexed catalogue lookups (like search/star info) while writer
+# threads commit small updates (like telescope heartbeats and 2FA codes). Each profile
+# runs against its own scratch copy of the same data.
+#
+# Usage: python utility/benchmarkSqlite.py [seconds] [readers] [writers]
+
+DEFAULT_PRAGMAS = {
+    'journal_mode': 'DELETE',
+    'synchronous': 'FULL',
+}
+
+CATALOG_ROWS = 50000
+TELESCOPES = 20
+
+
+def create_database(path):
+    connection = sqlite3.connect(path)
+    connection.execute('CREATE TABLE catalog (Name TEXT PRIMARY KEY, RA REAL, DEC REAL, "V-Mag" REAL)')
+    connection.executemany(
+        'INSERT INTO catalog VALUES (?, ?, ?, ?)',
+        ((f'HD{i}', random.uniform(0, 360), random.uniform(-90, 90), random.uniform(-1, 12)) for i in range(CATALOG_ROWS))
+    )
+    connection.execute('CREATE TABLE telescopes (telescopeId TEXT PRIMARY KEY, lastSeen REAL)')
+    connection.executemany('INSERT INTO telescopes VALUES (?, ?)', ((f'pi-{i:03d}', 0.0) for i in range(TELESCOPES)))
+    connection.commit()
+    connection.close()
+
+
+def connect(path, pragmas):
+    connection = sqlite3.connect(path, timeout=SQLITE_PRAGMAS['busy_timeout'] / 1000, check_same_thread=False)
+    for name, value in pragmas.items():
+        connection.execute(f'PRAGMA {name} = {value}')
+    return connection
+
+
+def run_profile(name, pragmas, seconds, readers, writers):
+    directory = tempfile.mkdtemp()
+    path = os.path.join(directory, 'bench.db')
+    create_database(path)
+
+    stop = threading.Event()
+    counts = {'reads': 0, 'writes': 0, 'errors': 0}
+    write_latencies = []
+    lock = threading.Lock()
+
+    def reader():
+        connection = connect(path, pragmas)
+        done = 0
+        while not stop.is_set():
+            try:
+                connection.execute('SELECT * FROM catalog WHERE Name = ?', (f'HD{random.randrange(CATALOG_ROWS)}',)).fetchone()
+                done += 1
+            except sqlite3.OperationalError:
+                with lock:
+                    counts['errors'] += 1
+        connection.close()
+        with lock:
+            counts['reads'] += done
+
+    def writer():
+        connection = connect(path, pragmas)
+        done, latencies = 0, []
+        while not stop.is_set():
+            start = time.perf_counter()
+            try:
+                connection.execute('UPDATE telescopes SET lastSeen = ? WHERE telescopeId = ?',
+                                   (time.time(), f'pi-{random.randrange(TELESCOPES):03d}'))
+                connection.commit()
+                latencies.append(time.perf_counter() - start)
+                done += 1
+            except sqlite3.OperationalError:
+                connection.rollback()
+                with lock:
+                    counts['errors'] += 1
+        connection.close()
+        with lock:
+            counts['writes'] += done
+            write_latencies.extend(latencies)
+
+    threads = [threading.Thread(target=reader) for _ in range(readers)] + [threading.Thread(target=writer) for _ in range(writers)]
+    for thread in threads:
+        thread.start()
+    time.sleep(seconds)
+    stop.set()
+    for thread in threads:
+        thread.join()
+
+    write_latencies.sort()
+    p99 = write_latencies[int(len(write_latencies) * 0.99)] * 1000 if write_latencies else float('nan')
+    print(f"{name:<8} reads/s: {counts['reads'] / seconds:>10.0f}   writes/s: {counts['writes'] / seconds:>8.0f}   "
+          f"write p99: {p99:>7.2f} ms   lock errors: {counts['errors']}")
+
+    for suffix in ('', '-wal', '-shm'):
+        if os.path.exists(path + suffix):
+            os.remove(path + suffix)
+    os.rmdir(directory)
+
+
+if __name__ == '__main__':
+    seconds = float(sys.argv[1]) if len(sys.argv) > 1 else 5
+    readers = int(sys.argv[2]) if len(sys.argv) > 2 else 4
+    writers = int(sys.argv[3]) if len(sys.argv) > 3 else 2
+    print(f"SQLite {sqlite3.sqlite_version}: {readers} readers, {writers} writers, {seconds:.0f}s per profile")
+    run_profile('default', DEFAULT_PRAGMAS, seconds, readers, writers)
+    run_profile('tuned', SQLITE_PRAGMAS, seconds, readers, writers)
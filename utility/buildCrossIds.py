@@ -0,0 +1,156 @@
+import sys
+import os
+from sqlalchemy import create_engine, MetaData, Table, select, text
+
+# Ensure the root project directory is in sys.path
+sys.path.append(os.path.abspath(os.path.join(os.path.dirname(__file__), '..')))
+
+from models.catalogIndex import normalizeKey, splitCommonNames
+
+# Build step for CrossIdTable (see models/tables.py).
+# Every alias of every catalogue object (its Name, Messier number, common names and any
+# cross-reference columns) is mapped to one canonical object with its coordinates, so
+# lookups by any alias are a single indexed read. Run again whenever the catalogue changes.
+
+DATABASE_PATH = os.path.join(os.path.dirname(__file__), '..', 'Data.db')
+CATALOG_PATH = os.path.join(os.path.dirname(__file__), '..', 'Catalog.db')
+
+# Preferred catalogue for the canonical object when several rows describe the same object
+CATALOG_TABLES = [('NGCtable', 'NGC'), ('IndexTable', 'IC'), ('HDSTARTable', 'HD')]
+TABLE_PRIORITY = {table: priority for priority, (table, _) in enumerate(CATALOG_TABLES)}
+
+# Optional cross-reference columns (as found in OpenNGC-style exports) and the prefix their values need
+XREF_COLUMNS = {'NGC': 'NGC', 'IC': 'IC', 'M': 'M', 'Messier': '', 'Identifiers': '', 'Common names': ''}
+
+# Same layout as the CrossIdTable model
+CROSS_ID_SCHEMA = [
+    'CREATE TABLE IF NOT EXISTS "CrossIdTable" ('
+    'id INTEGER PRIMARY KEY, alias VARCHAR NOT NULL, displayName VARCHAR NOT NULL, '
+    'canonicalId VARCHAR NOT NULL, sourceTable VARCHAR NOT NULL, '
+    '"RA" REAL, "DEC" REAL, "V-Mag" REAL)',
+    'CREATE INDEX IF NOT EXISTS "ix_CrossIdTable_alias" ON "CrossIdTable" (alias)',
+    'CREATE INDEX IF NOT EXISTS "ix_CrossIdTable_canonicalId" ON "CrossIdTable" (canonicalId)',
+]
+
+
+def get_database_path():
+    """Catalog.db when utility/splitCatalog.py has been run, CrossIdTable is written next to the catalogue"""
+    return CATALOG_PATH if os.path.exists(CATALOG_PATH) else DATABASE_PATH
+
+
+def to_float(value):
+    try:
+        return float(value)
+    except (TypeError, ValueError):
+        return None
+
+
+def get_aliases(row):
+    """All names a catalogue row is known by, its own Name first"""
+    aliases = [row['Name']]
+    for column, prefix in XREF_COLUMNS.items():
+        value = row.get(column)
+        if not value:
+            continue
+        for alias in splitCommonNames(value):
+            aliases.append(f"{prefix}{alias}" if prefix and not alias.upper().startswith(prefix) else alias)
+    return aliases
+
+
+class UnionFind:
+    def __init__(self):
+        self.parent = {}
+
+    def find(self, item):
+        self.parent.setdefault(item, item)
+        while self.parent[item] != item:
+            self.parent[item] = self.parent[self.parent[item]]
+            item = self.parent[item]
+        return item
+
+    def union(self, a, b):
+        rootA, rootB = self.find(a), self.find(b)
+        if rootA != rootB:
+            self.parent[rootB] = rootA
+
+
+def load_objects(engine):
+    """Return {(table, Name): row dict} for every catalogue row"""
+    metadata = MetaData()
+    objects = {}
+    for table_name, _ in CATALOG_TABLES:
+        table = Table(table_name, metadata, autoload_with=engine)
+        with engine.connect() as connection:
+            for row in connection.execute(select(table)).mappings():
+                row = dict(row)
+                if row.get('Name'):
+                    row.setdefault('DEC', row.get('Dec'))
+                    objects[(table_name, row['Name'])] = row
+        print(f"Loaded {table_name}")
+    return objects
+
+
+def build_cross_ids(objects):
+    """Group rows that describe the same object and return the CrossIdTable rows"""
+    own_names = {normalizeKey(key[1]): key for key in objects}
+    groups = UnionFind()
+
+    # Link rows whose cross-references name another catalogue row (e.g. an IC duplicate of an NGC)
+    for key, row in objects.items():
+        groups.find(key)
+        for alias in get_aliases(row)[1:]:
+            other = own_names.get(normalizeKey(alias))
+            if other and other != key:
+                groups.union(key, other)
+
+    members = {}
+    for key in objects:
+        members.setdefault(groups.find(key), []).append(key)
+
+    rows = []
+    for group in members.values():
+        canonical = min(group, key=lambda key: (TABLE_PRIORITY[key[0]], len(key[1]), key[1]))
+        primary = objects[canonical]
+        magnitude = to_float(primary.get('V-Mag'))
+        if magnitude is None:
+            magnitudes = [to_float(objects[key].get('V-Mag')) for key in group]
+            magnitudes = [value for value in magnitudes if value is not None]
+            magnitude = min(magnitudes) if magnitudes else None
+
+        seen = set()
+        for key in sorted(group, key=lambda key: key != canonical):
+            for alias in get_aliases(objects[key]):
+                normalized = normalizeKey(alias)
+                if not normalized or normalized in seen:
+                    continue
+                seen.add(normalized)
+                rows.append({
+                    'alias': normalized,
+                    'displayName': alias,
+                    'canonicalId': canonical[1],
+                    'sourceTable': canonical[0],
+                    'RA': to_float(primary.get('RA')),
+                    'DEC': to_float(primary.get('DEC')),
+                    'VMag': magnitude
+                })
+    return rows
+
+
+def write_cross_ids(engine, rows):
+    with engine.begin() as connection:
+        for statement in CROSS_ID_SCHEMA:
+            connection.execute(text(statement))
+        connection.execute(text('DELETE FROM "CrossIdTable"'))
+        connection.execute(
+            text('INSERT INTO "CrossIdTable" (alias, displayName, canonicalId, sourceTable, "RA", "DEC", "V-Mag") '
+                 'VALUES (:alias, :displayName, :canonicalId, :sourceTable, :RA, :DEC, :VMag)'),
+            rows
+        )
+
+
+if __name__ == '__main__':
+    engine = create_engine(f'sqlite:///{os.path.abspath(get_database_path())}')
+    objects = load_objects(engine)
+    rows = build_cross_ids(objects)
+    write_cross_ids(engine, rows)
+    print(f"Finished building cross-identifications! {len(rows)} aliases for {len(objects)} catalogue rows.")
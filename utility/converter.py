@@ -9,6 +9,8 @@ sys.path.append(os.path.abspath(os.path.join(os.path.dirname(__file__), '..')))
 # Conversion functions with `None` handling
 def hms_to_decimal_hours(hms: str) -> float:
     """Convert HH:MM:SS.s format to decimal hours, but only if needed."""
+    if isinstance(hms, (int, float)):  # Already numeric (REAL column after utility/migrateCatalog.py)
+        return float(hms)
     if hms is None or hms.strip() == "":  # Handle None or empty strings
         return None
     if ":" not in hms:  # Already converted
@@ -19,6 +21,8 @@ def hms_to_decimal_hours(hms: str) -> float:
 
 def dms_to_decimal_degrees(dms: str) -> float:
     """Convert ±DD:MM:SS.s format to decimal degrees, but only if needed."""
+    if isinstance(dms, (int, float)):  # Already numeric (REAL column after utility/migrateCatalog.py)
+        return float(dms)
     if dms is None or dms.strip() == "":  # Handle None or empty strings
         return None
     if ":" not in dms:  # Already converted
@@ -44,12 +48,12 @@ def update_ngc_table():
         new_ra = hms_to_decimal_hours(record.RA)
         new_dec = dms_to_decimal_degrees(record.Dec)
 
-        if new_ra is not None and str(new_ra) != record.RA:
+        if new_ra is not None and new_ra != record.RA:
             print(f"Updating {record.Name}: RA {record.RA} -> {new_ra}")
-            record.RA = str(new_ra)
-        if new_dec is not None and str(new_dec) != record.Dec:
+            record.RA = new_ra
+        if new_dec is not None and new_dec != record.Dec:
             print(f"Updating {record.Name}: Dec {record.Dec} -> {new_dec}")
-            record.Dec = str(new_dec)
+            record.Dec = new_dec
 
     session.commit()
 
@@ -62,12 +66,12 @@ def update_index_table():
         new_ra = hms_to_decimal_hours(record.RA)
         new_dec = dms_to_decimal_degrees(record.DEC)
 
-        if new_ra is not None and str(new_ra) != record.RA:
+        if new_ra is not None and new_ra != record.RA:
             print(f"Updating {record.Name}: RA {record.RA} -> {new_ra}")
-            record.RA = str(new_ra)
-        if new_dec is not None and str(new_dec) != record.DEC:
+            record.RA = new_ra
+        if new_dec is not None and new_dec != record.DEC:
             print(f"Updating {record.Name}: Dec {record.DEC} -> {new_dec}")
-            record.DEC = str(new_dec)
+            record.DEC = new_dec
 
     session.commit()
 
@@ -0,0 +1,160 @@
+import sys
+import os
+import sqlite3
+
+# Migration for the catalogue tables.
+# The original import stored RA/DEC/V-Mag as text and nothing was indexed, so every
+# lookup and magnitude filter was a full table scan with a float() per row. This
+# rewrites each catalogue table with REAL numeric columns, adds the indexes the
+# queries in models/tables.py need and records the schema version in PRAGMA user_version.
+# Safe to run more than once: tables already at CATALOG_SCHEMA_VERSION are skipped.
+
+DATABASE_PATH = os.path.join(os.path.dirname(__file__), '..', 'Data.db')
+CATALOG_PATH = os.path.join(os.path.dirname(__file__), '..', 'Catalog.db')
+
+CATALOG_SCHEMA_VERSION = 1
+
+CATALOG_TABLES = ['HDSTARTable', 'IndexTable', 'NGCtable']
+
+# Columns converted to REAL (any sexagesimal text left in them is parsed first)
+NUMERIC_COLUMNS = {'RA', 'DEC', 'Dec', 'V-Mag', 'B-Mag', 'J-Mag', 'H-Mag', 'K-Mag'}
+
+# (index name suffix, column, collation) created on each table when the column exists
+INDEXES = [
+    ('Name', 'Name', None),
+    ('Messier', 'Messier', None),
+    ('VMag', 'V-Mag', None),
+    ('CommonNames', 'Common names', 'NOCASE'),  # Case-insensitive common name lookups
+]
+
+
+def quote(identifier):
+    return '"' + identifier.replace('"', '""') + '"'
+
+
+def sexagesimal_to_decimal(value):
+    """Convert [+-]HH:MM:SS.s / DD:MM:SS.s text to a decimal, the same way utility/converter.py does"""
+    sign = -1 if value.startswith('-') else 1
+    parts = [float(part) for part in value.lstrip('+-').split(':')]
+    parts += [0.0] * (3 - len(parts))
+    return sign * (parts[0] + parts[1] / 60 + parts[2] / 3600)
+
+
+def to_real(value):
+    if value is None:
+        return None
+    if isinstance(value, (int, float)):
+        return float(value)
+    value = str(value).strip()
+    if value == '':
+        return None
+    try:
+        if ':' in value:
+            return sexagesimal_to_decimal(value)
+        return float(value)
+    except ValueError:
+        return None
+
+
+def get_columns(connection, table):
+    # (cid, name, type, notnull, default, pk)
+    return connection.execute(f'PRAGMA table_info({quote(table)})').fetchall()
+
+
+def table_exists(connection, table):
+    return connection.execute(
+        "SELECT 1 FROM sqlite_master WHERE type = 'table' AND name = ?", (table,)
+    ).fetchone() is not None
+
+
+def migrate_table(connection, table):
+    columns = get_columns(connection, table)
+    names = [column[1] for column in columns]
+    primary_key = [column[1] for column in sorted(columns, key=lambda column: column[5]) if column[5]]
+
+    definitions = []
+    for _, name, declared_type, notnull, default, _ in columns:
+        column_type = 'REAL' if name in NUMERIC_COLUMNS else (declared_type or 'TEXT')
+        definition = f'{quote(name)} {column_type}'
+        if notnull:
+            definition += ' NOT NULL'
+        if default is not None:
+            definition += f' DEFAULT {default}'
+        definitions.append(definition)
+    if primary_key:
+        definitions.append(f'PRIMARY KEY ({", ".join(quote(name) for name in primary_key)})')
+
+    new_table = f'{table}__migrated'
+    connection.execute(f'DROP TABLE IF EXISTS {quote(new_table)}')
+    connection.execute(f'CREATE TABLE {quote(new_table)} ({", ".join(definitions)})')
+
+    numeric = [index for index, name in enumerate(names) if name in NUMERIC_COLUMNS]
+    column_list = ', '.join(quote(name) for name in names)
+    placeholders = ', '.join('?' for _ in names)
+    insert = f'INSERT INTO {quote(new_table)} ({column_list}) VALUES ({placeholders})'
+
+    cursor = connection.execute(f'SELECT {column_list} FROM {quote(table)}')
+    copied = 0
+    while True:
+        rows = cursor.fetchmany(10000)
+        if not rows:
+            break
+        converted = []
+        for row in rows:
+            row = list(row)
+            for index in numeric:
+                row[index] = to_real(row[index])
+            converted.append(row)
+        connection.executemany(insert, converted)
+        copied += len(converted)
+
+    connection.execute(f'DROP TABLE {quote(table)}')
+    connection.execute(f'ALTER TABLE {quote(new_table)} RENAME TO {quote(table)}')
+
+    for suffix, column, collation in INDEXES:
+        if column not in names or [column] == primary_key:
+            continue  # The primary key is already indexed
+        collate = f' COLLATE {collation}' if collation else ''
+        connection.execute(
+            f'CREATE INDEX IF NOT EXISTS {quote(f"ix_{table}_{suffix}")} ON {quote(table)} ({quote(column)}{collate})'
+        )
+
+    print(f"Migrated {table}: {copied} rows, numeric columns: {[names[index] for index in numeric]}")
+
+
+def get_database_path():
+    # Once the catalogue is split out it is migrated in place; the server opens it
+    # immutable, so it must not be running at the time
+    return CATALOG_PATH if os.path.exists(CATALOG_PATH) else DATABASE_PATH
+
+
+def migrate(database_path=DATABASE_PATH):
+    connection = sqlite3.connect(os.path.abspath(database_path), isolation_level=None)
+    try:
+        version = connection.execute('PRAGMA user_version').fetchone()[0]
+        if version >= CATALOG_SCHEMA_VERSION:
+            print(f"Catalogue schema already at version {version}, nothing to do.")
+            return version
+
+        connection.execute('BEGIN IMMEDIATE')
+        try:
+            for table in CATALOG_TABLES:
+                if table_exists(connection, table):
+                    migrate_table(connection, table)
+                else:
+                    print(f"Skipping {table}: table not found")
+            connection.execute(f'PRAGMA user_version = {CATALOG_SCHEMA_VERSION}')
+            connection.execute('COMMIT')
+        except Exception:
+            connection.execute('ROLLBACK')
+            raise
+
+        connection.execute('ANALYZE')  # Give the query planner statistics for the new indexes
+        print(f"Finished migrating! Catalogue schema is now version {CATALOG_SCHEMA_VERSION}.")
+        return CATALOG_SCHEMA_VERSION
+    finally:
+        connection.close()
+
+
+if __name__ == '__main__':
+    migrate(sys.argv[1] if len(sys.argv) > 1 else get_database_path())
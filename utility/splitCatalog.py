@@ -0,0 +1,108 @@
+import sys
+import os
+import re
+import sqlite3
+
+# Ensure the root project directory is in sys.path
+sys.path.append(os.path.abspath(os.path.join(os.path.dirname(__file__), '..')))
+
+from utility.buildCrossIds import CROSS_ID_SCHEMA
+
+# Moves the catalogue tables out of Data.db into their own read-only database, Catalog.db.
+# The server opens Catalog.db with mode=ro&immutable=1 (see SQLALCHEMY_BINDS in Server.py),
+# so catalogue reads take no locks and never wait on user/telescope writes to Data.db.
+# Run after utility/migrateCatalog.py and utility/buildCrossIds.py, with the server stopped:
+# an immutable database must not change while it is open. Catalog.db is rebuilt from scratch
+# each time, so running it again after updating the catalogue in Data.db is safe.
+#
+# Usage: python utility/splitCatalog.py [--drop]
+#   --drop  remove the catalogue tables from Data.db afterwards (and VACUUM it)
+
+DATABASE_PATH = os.path.join(os.path.dirname(__file__), '..', 'Data.db')
+CATALOG_PATH = os.path.join(os.path.dirname(__file__), '..', 'Catalog.db')
+
+CATALOG_TABLES = ['HDSTARTable', 'IndexTable', 'NGCtable', 'PlanetsTable', 'CrossIdTable']
+
+CREATE_STATEMENT = re.compile(r'^(CREATE\s+(?:UNIQUE\s+)?(?:TABLE|INDEX)\s+(?:IF\s+NOT\s+EXISTS\s+)?)', re.IGNORECASE)
+
+
+def quote(identifier):
+    return '"' + identifier.replace('"', '""') + '"'
+
+
+def in_catalog(sql):
+    """Rewrite a CREATE TABLE/INDEX statement from sqlite_master to create it in the attached catalog"""
+    return CREATE_STATEMENT.sub(r'\1catalog.', sql, count=1)
+
+
+def copy_table(connection, table):
+    schema = connection.execute(
+        "SELECT sql FROM main.sqlite_master WHERE type = 'table' AND name = ?", (table,)
+    ).fetchone()
+    if schema is None:
+        print(f"Skipping {table}: table not found")
+        return False
+
+    connection.execute(in_catalog(schema[0]))
+    connection.execute(f'INSERT INTO catalog.{quote(table)} SELECT * FROM main.{quote(table)}')
+
+    # Indexes are created after the copy, it is quicker than maintaining them row by row
+    indexes = connection.execute(
+        "SELECT sql FROM main.sqlite_master WHERE type = 'index' AND tbl_name = ? AND sql IS NOT NULL", (table,)
+    ).fetchall()
+    for (sql,) in indexes:
+        connection.execute(in_catalog(sql))
+
+    rows = connection.execute(f'SELECT COUNT(*) FROM catalog.{quote(table)}').fetchone()[0]
+    print(f"Copied {table}: {rows} rows, {len(indexes)} indexes")
+    return True
+
+
+def split(database_path=DATABASE_PATH, catalog_path=CATALOG_PATH, drop=False):
+    catalog_path = os.path.abspath(catalog_path)
+    building_path = catalog_path + '.building'
+    if os.path.exists(building_path):
+        os.remove(building_path)
+
+    connection = sqlite3.connect(os.path.abspath(database_path), isolation_level=None)
+    try:
+        connection.execute('ATTACH DATABASE ? AS catalog', (building_path,))
+        connection.execute('PRAGMA catalog.journal_mode = DELETE')  # A single file, no -wal/-shm beside it
+        connection.execute('BEGIN')
+        try:
+            copied = [table for table in CATALOG_TABLES if copy_table(connection, table)]
+            if 'CrossIdTable' not in copied:
+                # The catalogue is read-only once split, so create the (empty) table the model expects now
+                for statement in CROSS_ID_SCHEMA:
+                    connection.execute(in_catalog(statement))
+            version = connection.execute('PRAGMA main.user_version').fetchone()[0]
+            connection.execute(f'PRAGMA catalog.user_version = {version}')
+            connection.execute('COMMIT')
+        except Exception:
+            connection.execute('ROLLBACK')
+            raise
+
+        connection.execute('ANALYZE catalog')  # Statistics travel with the file, it is never written again
+        connection.execute('DETACH DATABASE catalog')
+
+        # Swap the finished file in whole so a half-built catalogue is never opened
+        os.replace(building_path, catalog_path)
+        print(f"Wrote {catalog_path}: {len(copied)} tables, schema version {version}")
+
+        if drop:
+            connection.execute('BEGIN')
+            for table in copied:
+                connection.execute(f'DROP TABLE main.{quote(table)}')
+            connection.execute('COMMIT')
+            connection.execute('VACUUM')
+            print(f"Dropped {len(copied)} catalogue tables from Data.db")
+    finally:
+        connection.close()
+        if os.path.exists(building_path):
+            os.remove(building_path)
+
+
+if __name__ == '__main__':
+    split(drop='--drop' in sys.argv[1:])
+    print("Finished splitting! Restart the server to use Catalog.db, then regenerate the schema snapshot:")
+    print("    python -m models.schemaSnapshot")
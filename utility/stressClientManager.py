@@ -0,0 +1,157 @@
+import sys
+import os
+import asyncio
+import random
+import threading
+import time
+from concurrent.futures import ThreadPoolExecutor
+
+import websockets
+import ujson as json
+
+# Ensure the root project directory is in sys.path
+sys.path.append(os.path.abspath(os.path.join(os.path.dirname(__file__), '..')))
+
+import WebsocketServer
+
+# Stress test for the command server's ClientManager. Connects hundreds of simulated telescopes,
+# sends commands to all of them from many threads, then drops some telescopes while they have
+# calls in flight and checks that those calls fail straight away instead of at their timeout.
+# Ends with the /clients/metrics summary and a check that registered ids are leased and expire.
+#
+# Usage: python utility/stressClientManager.py [telescopes] [threads] [commands per thread] [telescopes to drop]
+
+STRESS_PORT = 4998
+
+
+class FakeTelescopes:
+    """Simulated telescopes on their own event loop. 'echo' answers after a short delay, 'hang' never does."""
+
+    def __init__(self, count):
+        self.client_ids = [f"stress-{i}" for i in range(count)]
+        self.drop_events = {}
+        self.loop = asyncio.new_event_loop()
+
+    async def telescope(self, client_id):
+        self.drop_events[client_id] = drop = asyncio.Event()
+        async with websockets.connect(f"ws://127.0.0.1:{STRESS_PORT}", max_queue=None) as ws:
+            await ws.send(json.dumps({"type": "hello", "client_id": client_id, "capabilities": ["batch", "stream"]}))
+            await ws.recv()  # Welcome
+
+            async def reply(data):
+                await asyncio.sleep(random.uniform(0, 0.005))
+                await ws.send(json.dumps({"id": data["id"], "result": data["args"]}))
+
+            async def serve():
+                async for message in ws:
+                    data = json.loads(message)
+                    if data.get("type") == "call" and data["function"] == "echo":
+                        asyncio.ensure_future(reply(data))
+
+            server = asyncio.ensure_future(serve())
+            await drop.wait()
+            server.cancel()
+
+    def start(self):
+        def run():
+            asyncio.set_event_loop(self.loop)
+            self.loop.run_until_complete(asyncio.gather(*(self.telescope(client_id) for client_id in self.client_ids)))
+
+        threading.Thread(target=run, daemon=True).start()
+
+    def drop(self, client_id):
+        self.loop.call_soon_threadsafe(self.drop_events[client_id].set)
+
+
+def percentile(values, fraction):
+    return values[min(len(values) - 1, int(len(values) * fraction))] * 1000
+
+
+def run(telescopes, threads, per_thread, to_drop):
+    WebsocketServer.WS_IP = "127.0.0.1"
+    WebsocketServer.WS_PORT = STRESS_PORT
+    WebsocketServer.LIVEVIEW_WS_PORT = STRESS_PORT + 1
+    WebsocketServer.runtime.start()
+    WebsocketServer.runtime.ready.wait(5)
+    manager = WebsocketServer.client_manager
+
+    start = time.perf_counter()
+    fakes = FakeTelescopes(telescopes)
+    fakes.start()
+    while len(manager.clients) < telescopes:
+        time.sleep(0.01)
+    print(f"{telescopes} telescopes connected in {time.perf_counter() - start:.2f} s")
+
+    def worker(index):
+        latencies = []
+        for n in range(per_thread):
+            client_id = fakes.client_ids[random.randrange(telescopes)]
+            begin = time.perf_counter()
+            result = WebsocketServer.submit_command(client_id, "echo", [index, n])
+            latencies.append(time.perf_counter() - begin)
+            assert result == [index, n], result
+        return latencies
+
+    start = time.perf_counter()
+    with ThreadPoolExecutor(threads) as pool:
+        latencies = sorted(latency for result in pool.map(worker, range(threads)) for latency in result)
+    elapsed = time.perf_counter() - start
+    print(f"{threads} threads x {per_thread} commands to random telescopes")
+    print(f"  throughput: {len(latencies) / elapsed:>8.0f} commands/s")
+    print(f"  latency   : p50 {percentile(latencies, 0.5):.2f} ms   p99 {percentile(latencies, 0.99):.2f} ms   "
+          f"max {latencies[-1] * 1000:.2f} ms")
+
+    # Calls to telescopes that go away must fail at the disconnect, not after DEFAULT_COMMAND_TIMEOUT
+    dropped = fakes.client_ids[:to_drop]
+
+    def hung_call(client_id):
+        begin = time.perf_counter()
+        try:
+            WebsocketServer.submit_command(client_id, "hang")
+            return None
+        except ConnectionError:
+            return time.perf_counter() - begin
+
+    with ThreadPoolExecutor(len(dropped)) as pool:
+        calls = [pool.submit(hung_call, client_id) for client_id in dropped]
+        while manager.metrics()["pendingCalls"] < len(dropped):
+            time.sleep(0.01)
+        drop_time = time.perf_counter()
+        for client_id in dropped:
+            fakes.drop(client_id)
+        waits = [call.result() for call in calls]
+    failed_fast = [wait for wait in waits if wait is not None]
+    print(f"Dropped {len(dropped)} telescopes with a call in flight: {len(failed_fast)} calls failed on disconnect, "
+          f"last one {(time.perf_counter() - drop_time) * 1000:.0f} ms after the drop "
+          f"(timeout would be {WebsocketServer.DEFAULT_COMMAND_TIMEOUT} s)")
+
+    metrics = manager.metrics()
+    print(f"Metrics: connected {metrics['connected']}, connections {metrics['connections']}, "
+          f"disconnections {metrics['disconnections']}, pending {metrics['pendingCalls']}, "
+          f"failed on disconnect {metrics['callsFailedOnDisconnect']}")
+    busiest = max(metrics["clients"], key=lambda client: client["messagesReceived"])
+    print(f"Busiest telescope: {busiest['clientId']} {busiest['messagesReceived']} replies, "
+          f"{busiest['bytesSent']} bytes sent, ping latency {busiest['latency']}")
+
+    # Registered ids are leased, and dropped once the lease runs out without a connection
+    lease = WebsocketServer.REGISTRATION_LEASE
+    WebsocketServer.REGISTRATION_LEASE = 0.2
+    before = manager.metrics()["registrations"]
+    registrations = 50
+    for _ in range(registrations):
+        manager.register()
+    assert manager.metrics()["registrations"] == before + registrations, manager.metrics()["registrations"]
+    time.sleep(0.3)
+    manager.expire_leases()
+    assert manager.metrics()["registrations"] == before, manager.metrics()["registrations"]
+    WebsocketServer.REGISTRATION_LEASE = lease
+    print(f"Registered {registrations} telescopes: all counted, all expired after their lease")
+
+
+if __name__ == '__main__':
+    run(
+        int(sys.argv[1]) if len(sys.argv) > 1 else 300,
+        int(sys.argv[2]) if len(sys.argv) > 2 else 32,
+        int(sys.argv[3]) if len(sys.argv) > 3 else 200,
+        int(sys.argv[4]) if len(sys.argv) > 4 else 30
+    )